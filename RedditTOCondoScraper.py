@@ -1,29 +1,57 @@
 import os
 import json
+import hashlib
+import base64
+import functools
+import bisect
+import contextlib
+import zlib
 import time
+
+# Taken before the remaining imports so the startup report covers them
+STARTUP_STARTED = time.perf_counter()
+
 import sys
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
 import praw
+import prawcore
 import pymongo
-from pymongo.errors import BulkWriteError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from bson import ObjectId
 import logging
 from datetime import datetime, date, timedelta, timezone
 import re
 from calendar import month_name
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from rapidfuzz import fuzz
 import io
-import PyPDF2
-from bs4 import BeautifulSoup
+import copy
+import types
+import tempfile
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
-import spacy
 import dateutil.parser
 import random
-from urllib.parse import urlparse
+import threading
+import multiprocessing
+import socket
+import queue
+import signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import collections
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+import ahocorasick
+import numpy as np
+from rapidfuzz import fuzz
 load_dotenv()
 
 # --- Configuration from environment variables ---
@@ -31,6 +59,7 @@ MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = os.getenv("MONGO_DB", "brand_monitoring")
 RAW_COLLECTION = os.getenv("RAW_COLLECTION", "raw_articles")
 PROCESSED_COLLECTION = os.getenv("PROCESSED_COLLECTION", "processed_articles")
+SCRAPE_STATE_COLLECTION = os.getenv("SCRAPE_STATE_COLLECTION", "scrape_state")
 REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT")
@@ -39,6 +68,84 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+RECORD_DIR = os.getenv("RECORD_DIR") or None
+REPLAY_DIR = os.getenv("REPLAY_DIR") or None
+REPLAY_LATENCY_SECONDS = float(os.getenv("REPLAY_LATENCY_SECONDS", 0))
+REPLAY_STORE_ADDRESS = os.getenv("REPLAY_STORE_ADDRESS") or None
+WORK_QUEUE_COLLECTION = os.getenv("WORK_QUEUE_COLLECTION", "work_queue")
+WORK_LEASE_SECONDS = int(os.getenv("WORK_LEASE_SECONDS", 300))
+WORK_MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", 3))
+WORK_RETRY_SECONDS = float(os.getenv("WORK_RETRY_SECONDS", 30))
+WORK_POLL_SECONDS = float(os.getenv("WORK_POLL_SECONDS", 5))
+WORK_PDF_BATCH = int(os.getenv("WORK_PDF_BATCH", 4))
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", os.cpu_count() or 1))
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", 50))
+QUERY_MAX_PAGE_SIZE = int(os.getenv("QUERY_MAX_PAGE_SIZE", 500))
+SCRAPER_SOURCES = [name.strip() for name in os.getenv("SCRAPER_SOURCES", "").split(",") if name.strip()]
+REDDIT_FETCH_WORKERS = int(os.getenv("REDDIT_FETCH_WORKERS", 8))
+REDDIT_REQUESTS_PER_MINUTE = int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", 90))
+REDDIT_INCREMENTAL = os.getenv("REDDIT_INCREMENTAL", "true").lower() == "true"
+REDDIT_MAX_POSTS_PER_SUBREDDIT = int(os.getenv("REDDIT_MAX_POSTS_PER_SUBREDDIT", 1000))
+REDDIT_DISCOVERY = os.getenv("REDDIT_DISCOVERY", "new").lower()
+REDDIT_SEARCH_QUERY_CHARS = int(os.getenv("REDDIT_SEARCH_QUERY_CHARS", 500))
+REDDIT_SEARCH_LIMIT = int(os.getenv("REDDIT_SEARCH_LIMIT", 250))
+REDDIT_SCAN_COMMENTS = os.getenv("REDDIT_SCAN_COMMENTS", "false").lower() == "true"
+REDDIT_COMMENT_WORKERS = int(os.getenv("REDDIT_COMMENT_WORKERS", 4))
+REDDIT_COMMENT_MAX_CALLS = int(os.getenv("REDDIT_COMMENT_MAX_CALLS", 3))
+REDDIT_COMMENT_MAX_DEPTH = int(os.getenv("REDDIT_COMMENT_MAX_DEPTH", 3))
+REDDIT_COMMENT_RUN_CALLS = int(os.getenv("REDDIT_COMMENT_RUN_CALLS", 300))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 4))
+HTTP_HOST_MIN_RPS = float(os.getenv("HTTP_HOST_MIN_RPS", 0.2))
+HTTP_HOST_RATE_STEP = float(os.getenv("HTTP_HOST_RATE_STEP", 0.5))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", 1))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", 30))
+HTTP_RETRY_AFTER_MAX_SECONDS = float(os.getenv("HTTP_RETRY_AFTER_MAX_SECONDS", 120))
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", 5))
+HTTP_BREAKER_COOLDOWN_SECONDS = float(os.getenv("HTTP_BREAKER_COOLDOWN_SECONDS", 60))
+TOCONDO_PARSE_WORKERS = int(os.getenv("TOCONDO_PARSE_WORKERS", os.cpu_count() or 1))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+META_HEAD_MAX_BYTES = int(os.getenv("META_HEAD_MAX_BYTES", 64 * 1024))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+TOCONDO_RECHECK_STORED = os.getenv("TOCONDO_RECHECK_STORED", "false").lower() == "true"
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", 50 * 1024 * 1024))
+PDF_SPOOL_DIR = os.getenv("PDF_SPOOL_DIR") or None
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 3))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", 0))
+PDF_MAX_SECONDS = float(os.getenv("PDF_MAX_SECONDS", 20))
+PDF_STOP_AFTER_KEYWORDS = int(os.getenv("PDF_STOP_AFTER_KEYWORDS", 0))
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", 500))
+WRITER_FLUSH_SECONDS = float(os.getenv("WRITER_FLUSH_SECONDS", 5))
+WRITER_QUEUE_SIZE = int(os.getenv("WRITER_QUEUE_SIZE", 1000))
+ENRICH_AFTER_SCRAPE = os.getenv("ENRICH_AFTER_SCRAPE", "true").lower() == "true"
+ENRICH_CLAIM_SIZE = int(os.getenv("ENRICH_CLAIM_SIZE", 500))
+ENRICH_CLAIM_TIMEOUT_SECONDS = int(os.getenv("ENRICH_CLAIM_TIMEOUT_SECONDS", 3600))
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", 3))
+ENRICH_RETRY_SECONDS = int(os.getenv("ENRICH_RETRY_SECONDS", 900))
+NLP_PIPE_BATCH_SIZE = int(os.getenv("NLP_PIPE_BATCH_SIZE", 64))
+NLP_PROCESSES = int(os.getenv("NLP_PROCESSES", os.cpu_count() or 1))
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_LOOKBACK_DAYS = int(os.getenv("DEDUP_LOOKBACK_DAYS", 14))
+# 32 bands of 6 rows: shorter bands put unrelated articles sharing common
+# words in one bucket, and comparisons grow quadratically (see bench_dedup)
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", 192))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", 32))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 85))
+DEDUP_MAX_CHARS = int(os.getenv("DEDUP_MAX_CHARS", 2000))
+SCRAPE_START_DATE = os.getenv("SCRAPE_START_DATE", "2025-03-06")
+PUBLISHED_MAX_AGE_DAYS = int(os.getenv("PUBLISHED_MAX_AGE_DAYS", 30))
+# Published dates may be this far past the run's start (clock skew between hosts)
+PUBLISHED_CLOCK_SKEW_SECONDS = int(os.getenv("PUBLISHED_CLOCK_SKEW_SECONDS", 300))
+DATE_CACHE_SIZE = int(os.getenv("DATE_CACHE_SIZE", 4096))
+DAEMON_INTERVALS = os.getenv("DAEMON_INTERVALS", "reddit=900,tocondo=21600")
+DAEMON_DEFAULT_INTERVAL_SECONDS = int(os.getenv("DAEMON_DEFAULT_INTERVAL_SECONDS", 3600))
+DAEMON_ENRICH_SECONDS = int(os.getenv("DAEMON_ENRICH_SECONDS", 300))
+DAEMON_DEDUP_REFRESH_SECONDS = int(os.getenv("DAEMON_DEDUP_REFRESH_SECONDS", 86400))
+DAEMON_HTTP_HOST = os.getenv("DAEMON_HTTP_HOST", "127.0.0.1")
+DAEMON_HTTP_PORT = int(os.getenv("DAEMON_HTTP_PORT", 8089))
+DAEMON_UNHEALTHY_FAILURES = int(os.getenv("DAEMON_UNHEALTHY_FAILURES", 3))
+METRICS_REPORT_PATH = os.getenv("METRICS_REPORT_PATH", "run_metrics.json")
+KEYWORD_WORD_BOUNDARIES = os.getenv("KEYWORD_WORD_BOUNDARIES", "false").lower() == "true"
 
 # User agents for rotation to avoid blocking
 USER_AGENTS = [
@@ -69,6 +176,259 @@ SCRAPED_COUNT = {
     "tocondo": 0
 }
 
+WRITE_STATS = {
+    "reddit": {"inserted": 0, "updated": 0, "unchanged": 0},
+    "tocondo": {"inserted": 0, "updated": 0, "unchanged": 0}
+}
+# Writer threads of concurrent sources update SCRAPED_COUNT and WRITE_STATS
+WRITE_STATS_LOCK = threading.Lock()
+
+ENRICH_STATS = {
+    "processed": 0,
+    "failed": 0,
+    "seconds": 0.0
+}
+DEDUP_STATS = {
+    "checked": 0,
+    "duplicates": 0,
+    "comparisons": 0
+}
+# Writer threads of concurrent sources update DEDUP_STATS
+DEDUP_STATS_LOCK = threading.Lock()
+HTTP_CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0
+}
+# Fetch threads and concurrent sources update HTTP_CACHE_STATS
+HTTP_CACHE_STATS_LOCK = threading.Lock()
+
+# --- Run metrics ---
+# Upper bounds (seconds) of the latency histogram buckets; a last bucket catches the rest
+HISTOGRAM_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class RunMetrics:
+    """Thread-safe counters and latency histograms for one scraper run.
+
+    Each metric is keyed by a name plus labels, as in Prometheus. Histograms
+    count observations per HISTOGRAM_BUCKETS bucket and keep their count and
+    sum, so percentiles can be estimated without storing every sample.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = datetime.utcnow().isoformat()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items()))
+        bucket = bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * (len(HISTOGRAM_BUCKETS) + 1), "count": 0, "sum": 0.0}
+            histogram["buckets"][bucket] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def total(self, name, **labels):
+        """Sum of counter name over every label set that includes labels."""
+        with self.lock:
+            return sum(value for (key, key_labels), value in self.counters.items()
+                       if key == name and set(labels.items()) <= set(key_labels))
+
+    def merged(self, name):
+        """Histogram name with all of its label sets added together."""
+        merged = {"buckets": [0] * (len(HISTOGRAM_BUCKETS) + 1), "count": 0, "sum": 0.0}
+        with self.lock:
+            for (key, _), histogram in self.histograms.items():
+                if key == name:
+                    merged["buckets"] = [a + b for a, b in zip(merged["buckets"], histogram["buckets"])]
+                    merged["count"] += histogram["count"]
+                    merged["sum"] += histogram["sum"]
+        return merged
+
+METRICS = RunMetrics()
+
+def histogram_quantile(histogram, q):
+    """Estimate quantile q of a histogram by interpolating inside its bucket."""
+    if not histogram["count"]:
+        return 0.0
+    rank = q * histogram["count"]
+    seen = 0
+    for i, count in enumerate(histogram["buckets"]):
+        if count and seen + count >= rank:
+            if i == len(HISTOGRAM_BUCKETS):
+                return HISTOGRAM_BUCKETS[-1]
+            lower = HISTOGRAM_BUCKETS[i - 1] if i else 0.0
+            return lower + (HISTOGRAM_BUCKETS[i] - lower) * (rank - seen) / count
+        seen += count
+    return HISTOGRAM_BUCKETS[-1]
+
+def count_discarded(source, reason, count=1):
+    METRICS.inc("items_discarded_total", count, source=source, reason=reason)
+
+def count_http_cache(outcome, count=1):
+    with HTTP_CACHE_STATS_LOCK:
+        HTTP_CACHE_STATS[outcome] += count
+
+def count_downloaded(url, size):
+    METRICS.inc("http_downloaded_bytes_total", size, host=urlparse(url).netloc)
+
+def run_stats():
+    """The run's summary counters (scraped, writes, dedup, enrichment, cache, lazy loads)."""
+    with WRITE_STATS_LOCK:
+        scraped = dict(SCRAPED_COUNT)
+        writes = {source: dict(stats) for source, stats in WRITE_STATS.items()}
+    with DEDUP_STATS_LOCK:
+        dedup = dict(DEDUP_STATS)
+    with HTTP_CACHE_STATS_LOCK:
+        http_cache = dict(HTTP_CACHE_STATS)
+    return {
+        "scraped": scraped,
+        "writes": writes,
+        "dedup": dedup,
+        "enrichment": dict(ENRICH_STATS),
+        "http_cache": http_cache,
+        "lazy_load_seconds": dict(LAZY_LOAD_SECONDS)
+    }
+
+def metrics_report():
+    """All run metrics as a JSON-serializable dict."""
+    with METRICS.lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(METRICS.counters.items())]
+        histograms = [{"name": name, "labels": dict(labels), **copy.deepcopy(histogram)}
+                      for (name, labels), histogram in sorted(METRICS.histograms.items())]
+    for histogram in histograms:
+        histogram["p50"] = histogram_quantile(histogram, 0.5)
+        histogram["p95"] = histogram_quantile(histogram, 0.95)
+    return {
+        "run_started": METRICS.started,
+        "generated": datetime.utcnow().isoformat(),
+        "bucket_bounds": list(HISTOGRAM_BUCKETS),
+        "stats": run_stats(),
+        "counters": counters,
+        "histograms": histograms
+    }
+
+def prometheus_labels(labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}" if labels else ""
+
+def prometheus_text(report):
+    """A metrics_report() in the Prometheus text format, for node_exporter's textfile collector."""
+    lines = []
+    typed = set()
+    for counter in report["counters"]:
+        name = f"scraper_{counter['name']}"
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{prometheus_labels(counter['labels'])} {counter['value']}")
+    for histogram in report["histograms"]:
+        name = f"scraper_{histogram['name']}"
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(list(report["bucket_bounds"]) + ["+Inf"], histogram["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{prometheus_labels({**histogram['labels'], 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{prometheus_labels(histogram['labels'])} {histogram['sum']}")
+        lines.append(f"{name}_count{prometheus_labels(histogram['labels'])} {histogram['count']}")
+    lines.append("# TYPE scraper_run_stat gauge")
+    for group, stats in report["stats"].items():
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                for stat, number in value.items():
+                    lines.append(f"scraper_run_stat{prometheus_labels({'group': group, 'source': key, 'stat': stat})} {number}")
+            else:
+                lines.append(f"scraper_run_stat{prometheus_labels({'group': group, 'stat': key})} {value}")
+    return "\n".join(lines) + "\n"
+
+METRICS_REPORT_LOCK = threading.Lock()
+
+def write_metrics_report(path=None):
+    """Write the run report to path (METRICS_REPORT_PATH by default).
+
+    A path ending in .prom gets the Prometheus text format, anything else
+    JSON. The file is replaced atomically so collectors never read half of
+    it. Returns the path written, or None.
+    """
+    path = path or METRICS_REPORT_PATH
+    if not path:
+        return None
+    try:
+        report = metrics_report()
+        text = prometheus_text(report) if path.endswith(".prom") else json.dumps(report, indent=2)
+        with METRICS_REPORT_LOCK:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(f"{path}.tmp", path)
+        logging.info(f"Wrote run metrics to {path}")
+        return path
+    except Exception as e:
+        logging.error(f"Could not write run metrics to {path}: {e}")
+        return None
+
+# Histograms summarized in the run email, in pipeline order
+SUMMARY_HISTOGRAMS = [
+    ("reddit_api_seconds", "Reddit API requests"),
+    ("http_request_seconds", "HTTP requests"),
+    ("keyword_match_seconds", "Keyword matching"),
+    ("pdf_parse_seconds", "PDF parsing"),
+    ("mongo_write_seconds", "Mongo bulk writes"),
+    ("enrich_batch_seconds", "Enrichment batches")
+]
+
+def metrics_summary():
+    """Short plain-text summary of the run metrics for the email body."""
+    lines = ["Stage timings (count, p50 / p95, total):"]
+    for name, label in SUMMARY_HISTOGRAMS:
+        histogram = METRICS.merged(name)
+        if histogram["count"]:
+            lines.append(
+                f"  {label}: {histogram['count']}, {histogram_quantile(histogram, 0.5) * 1000:.2f}ms / "
+                f"{histogram_quantile(histogram, 0.95) * 1000:.2f}ms, {histogram['sum']:.1f}s"
+            )
+    lines.append(
+        f"HTTP: {METRICS.total('http_retries_total')} retries, "
+        f"{METRICS.total('http_responses_total', status='429')} rate limited (429), "
+        f"{METRICS.total('http_errors_total')} errors, "
+        f"{METRICS.total('http_downloaded_bytes_total') / 1e6:.1f} MB downloaded"
+    )
+    lines.append(
+        f"Reddit API: {METRICS.total('reddit_api_responses_total', status='429')} rate limited (429), "
+        f"{METRICS.total('reddit_budget_wait_seconds_total'):.1f}s waiting for the request budget"
+    )
+    discarded = {}
+    with METRICS.lock:
+        for (name, labels), value in METRICS.counters.items():
+            if name == "items_discarded_total":
+                labels = dict(labels)
+                discarded.setdefault(labels["source"], []).append((labels["reason"], value))
+    if discarded:
+        lines.append("Discarded items:")
+        for source, reasons in sorted(discarded.items()):
+            lines.append(f"  {source}: " + ", ".join(f"{reason} {value}" for reason, value in sorted(reasons)))
+    return "\n".join(lines)
+
 ONTARIO_TERMS = {
     "ontario", 
     "toronto",
@@ -230,15 +590,31 @@ SUBREDDITS = [
 ]
 
 def get_collection(collection_name):
+    if REPLAY_DIR:
+        import replay_store
+        if REPLAY_STORE_ADDRESS:
+            return replay_store.get_shared_memory_collection(collection_name, REPLAY_STORE_ADDRESS)
+        return replay_store.get_memory_collection(collection_name)
     if not hasattr(get_collection, "client"):
         get_collection.client = pymongo.MongoClient(MONGO_URI)
     return get_collection.client[MONGO_DB][collection_name]
 
+def start_shared_memory_store():
+    """Start a replay store process (see replay_store) and point this process and its children at it."""
+    global REPLAY_STORE_ADDRESS
+    import replay_store
+    manager = replay_store.start_shared_memory_store()
+    REPLAY_STORE_ADDRESS = os.environ["REPLAY_STORE_ADDRESS"]
+    return manager
+
 def validate_db_connection():
     """Validate MongoDB connection.
     
     Checks if the database connection is working and raises an exception if not.
     """
+    if REPLAY_DIR:
+        logging.info("Replay mode: using the in-memory store instead of MongoDB.")
+        return
     try:
         client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
         client.server_info()
@@ -247,63 +623,149 @@ def validate_db_connection():
         logging.error(f"MongoDB connection failed: {e}")
         sys.exit(1)
 
-def is_within_scrape_window(timestamp_str):
-    try:
-        timestamp = datetime.fromisoformat(timestamp_str)
-        today = datetime.utcnow()
-        
-        if today.day < 6:
-            end_date = datetime(today.year, today.month, 6)
-            if today.month == 1:
-                start_date = datetime(today.year - 1, 12, 6)
+class RunContext:
+    """Dates fixed once per scraping run so every item is filtered the same way.
+
+    now is taken when the run starts. Published dates are accepted between
+    SCRAPE_START_DATE and now. Reddit posts must also be no older than
+    PUBLISHED_MAX_AGE_DAYS. The window is the monthly scrape window from
+    the 6th to the 6th. Bounds are kept as POSIX timestamps as well, so
+    per-item checks are float comparisons.
+    """
+
+    def __init__(self, now=None, recent_cutoff=None):
+        self.now = normalize_datetime(now or datetime.utcnow())
+        self.now_iso = self.now.replace(tzinfo=None).isoformat()
+        self.start_date = normalize_datetime(datetime.fromisoformat(SCRAPE_START_DATE))
+        self.recent_cutoff = (normalize_datetime(recent_cutoff) if recent_cutoff
+                              else self.now - timedelta(days=PUBLISHED_MAX_AGE_DAYS))
+        self.start_ts = self.start_date.timestamp()
+        self.recent_ts = self.recent_cutoff.timestamp()
+        self.now_ts = self.now.timestamp()
+        self.latest_ts = self.now_ts + PUBLISHED_CLOCK_SKEW_SECONDS
+
+        if self.now.day < 6:
+            self.window_end = datetime(self.now.year, self.now.month, 6, tzinfo=timezone.utc)
+            if self.now.month == 1:
+                self.window_start = datetime(self.now.year - 1, 12, 6, tzinfo=timezone.utc)
             else:
-                start_date = datetime(today.year, today.month - 1, 6)
+                self.window_start = datetime(self.now.year, self.now.month - 1, 6, tzinfo=timezone.utc)
         else:
-            start_date = datetime(today.year, today.month, 6)
-            if today.month == 12:
-                end_date = datetime(today.year + 1, 1, 6)
+            self.window_start = datetime(self.now.year, self.now.month, 6, tzinfo=timezone.utc)
+            if self.now.month == 12:
+                self.window_end = datetime(self.now.year + 1, 1, 6, tzinfo=timezone.utc)
             else:
-                end_date = datetime(today.year, today.month + 1, 6)
-                
-        return start_date <= timestamp < end_date
-    except ValueError:
-        return False
+                self.window_end = datetime(self.now.year, self.now.month + 1, 6, tzinfo=timezone.utc)
 
-def is_relevant_location(text):
-    text_lower = text.lower()
-    return any(term.lower() in text_lower for term in ONTARIO_TERMS)
+    def published_ok(self, timestamp, recent_only=False, upper_bound=True):
+        """True if a POSIX timestamp falls between the start date (or the
+        recency cutoff when recent_only) and now plus
+        PUBLISHED_CLOCK_SKEW_SECONDS. Without upper_bound, later timestamps
+        pass too."""
+        if timestamp < (self.recent_ts if recent_only else self.start_ts):
+            return False
+        return not upper_bound or timestamp <= self.latest_ts
 
-def get_valid_date(date_str):
-    if not date_str:
-        return datetime.utcnow().isoformat()
-    
-    date_formats = [
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d",
-        "%d-%m-%Y",
-        "%a, %d %b %Y %H:%M:%S %z",
-        "%a, %d %b %Y %H:%M:%S %Z",
-        "%d %b %Y %H:%M:%S %Z",
-        "%B %d, %Y",
-        "%b %d, %Y",
-    ]
-    
-    for fmt in date_formats:
+    def published_date_ok(self, published_date, recent_only=False):
+        """published_ok for an ISO date string; unparseable dates are rejected."""
+        dt = parse_iso_datetime(published_date)
+        return dt is not None and self.published_ok(dt.timestamp(), recent_only)
+
+def make_run_context(now=None, recent_cutoff=None):
+    """A RunContext for a run starting now, without making it current.
+
+    Concurrent runs in one process (daemon jobs, queue units) each make
+    their own and pass it to run_source. recent_cutoff overrides the
+    PUBLISHED_MAX_AGE_DAYS lower bound (a work unit passes its batch's).
+    Replays reuse the recording's run time so the same items pass the date
+    filters; recordings store theirs in the fixture manifest.
+    """
+    if now is None and REPLAY_DIR:
+        now = replay_recorded_at()
+    ctx = RunContext(now, recent_cutoff)
+    if RECORD_DIR:
+        record_manifest(ctx)
+    return ctx
+
+def new_run_context(now=None, recent_cutoff=None):
+    """Start a run: fix its dates in a new RunContext and make it current (see make_run_context)."""
+    get_run_context.current = make_run_context(now, recent_cutoff)
+    return get_run_context.current
+
+def get_run_context():
+    """Return the current run's RunContext, starting one if none is active."""
+    if not hasattr(get_run_context, "current"):
+        new_run_context()
+    return get_run_context.current
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_iso_datetime(value):
+    """Parse an ISO date string into an aware UTC datetime, or None if invalid."""
+    try:
+        return normalize_datetime(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return None
+
+def is_within_scrape_window(timestamp_str):
+    ctx = get_run_context()
+    timestamp = parse_iso_datetime(timestamp_str)
+    return timestamp is not None and ctx.window_start <= timestamp < ctx.window_end
+
+def is_relevant_location(text, found=None):
+    """Check if text mentions any of ONTARIO_TERMS.
+
+    Pass the result of TERM_MATCHER.scan(text) as found to reuse a scan.
+    """
+    if found is None:
+        found = TERM_MATCHER.scan(text)
+    return any(term in found for term in ONTARIO_TERMS_LOWER)
+
+ISO_DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2})?")
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d-%m-%Y",
+    "%a, %d %b %Y %H:%M:%S %z",
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%d %b %Y %H:%M:%S %Z",
+    "%B %d, %Y",
+    "%b %d, %Y",
+]
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date_string(date_str):
+    """Return date_str as an ISO string, or None if no known format matches.
+
+    ISO dates take a fromisoformat fast path; all-digit strings are read
+    as Unix timestamps; the rest (and ISO-shaped dates fromisoformat
+    rejects) fall back to DATE_FORMATS in order.
+    """
+    if ISO_DATE_PATTERN.fullmatch(date_str):
         try:
-            dt = datetime.strptime(date_str, fmt)
-            return dt.isoformat()
+            return datetime.fromisoformat(date_str).isoformat()
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).isoformat()
         except ValueError:
             continue
-    
-    try:
-        if date_str.isdigit():
+    if date_str.isdigit():
+        try:
             return datetime.utcfromtimestamp(int(date_str)).isoformat()
-    except:
-        pass
-    
-    return datetime.utcnow().isoformat()
+        except (OverflowError, OSError, ValueError):
+            pass
+    return None
+
+def get_valid_date(date_str):
+    if not date_str:
+        return get_run_context().now_iso
+    return parse_date_string(date_str) or get_run_context().now_iso
 
 def send_email(subject, body):
+    if REPLAY_DIR:
+        logging.info(f"Replay mode: not sending email.\n{subject}\n{body}")
+        return
     try:
         msg = MIMEMultipart()
         msg["From"] = EMAIL_SENDER
@@ -320,25 +782,288 @@ def send_email(subject, body):
     except Exception as e:
         logging.error(f"Failed to send email alert: {e}")
 
-nlp = spacy.load("en_core_web_sm")
+# Heavy NLP/PDF libraries are imported on first use so the scrape path starts fast
+LAZY_LOAD_SECONDS = {}
 
-def lemmatize(text):
-    doc = nlp(text)
+def record_lazy_load(name, started):
+    LAZY_LOAD_SECONDS[name] = time.perf_counter() - started
+    logging.info(f"Loaded {name} in {LAZY_LOAD_SECONDS[name]:.2f}s")
+
+def get_nlp():
+    """Return the spaCy en_core_web_sm pipeline, loading it on first use."""
+    if not hasattr(get_nlp, "model"):
+        started = time.perf_counter()
+        import spacy
+        get_nlp.model = spacy.load("en_core_web_sm")
+        record_lazy_load("spaCy en_core_web_sm", started)
+    return get_nlp.model
+
+def get_sentiment_analyzer():
+    """Return an NLTK VADER SentimentIntensityAnalyzer, loading it on first use."""
+    if not hasattr(get_sentiment_analyzer, "analyzer"):
+        started = time.perf_counter()
+        import nltk
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        try:
+            get_sentiment_analyzer.analyzer = SentimentIntensityAnalyzer()
+        except LookupError:
+            nltk.download("vader_lexicon", quiet=True)
+            get_sentiment_analyzer.analyzer = SentimentIntensityAnalyzer()
+        record_lazy_load("NLTK VADER", started)
+    return get_sentiment_analyzer.analyzer
+
+def startup_report():
+    """Summarize module import time and any heavy libraries loaded since."""
+    lines = [f"Startup: module imported in {IMPORT_SECONDS:.2f}s"]
+    for name, seconds in LAZY_LOAD_SECONDS.items():
+        lines.append(f"Lazy load: {name} in {seconds:.2f}s")
+    return "\n".join(lines)
+
+def lemmas_from_doc(doc):
     return " ".join([token.lemma_.lower() for token in doc if not token.is_punct and not token.is_space])
 
+def lemmatize(text):
+    return lemmas_from_doc(get_nlp()(text))
+
 def normalize_datetime(dt):
     if dt.tzinfo is None:
         return dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
-def get_matched_keywords(text, keywords, max_tags=10):
-    text_lower = (text or "").lower()
-    matched = [kw for kw in keywords if kw.lower() in text_lower]
-    return matched[:max_tags]
+def is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+class TermMatcher:
+    """Precompiled case-insensitive multi-pattern matcher.
+
+    All terms go into one Aho-Corasick automaton, so every occurrence of every
+    term is found in a single pass over the text. With word_boundaries=True a
+    term only counts when it is not part of a longer word, so "CAT" no longer
+    matches inside "location".
+    """
+
+    def __init__(self, terms, word_boundaries=False):
+        self.terms = frozenset(term.lower() for term in terms)
+        self.word_boundaries = word_boundaries
+        self.automaton = ahocorasick.Automaton()
+        for term in self.terms:
+            self.automaton.add_word(term, term)
+        self.automaton.make_automaton()
+        self._lowered = {}
+
+    def scan(self, text):
+        """Return the set of lower-cased terms found in text."""
+        text_lower = (text or "").lower()
+        if not self.word_boundaries:
+            return {term for _, term in self.automaton.iter(text_lower)}
+
+        found = set()
+        last = len(text_lower) - 1
+        for end, term in self.automaton.iter(text_lower):
+            start = end - len(term) + 1
+            if start > 0 and is_word_char(text_lower[start - 1]):
+                continue
+            if end < last and is_word_char(text_lower[end + 1]):
+                continue
+            found.add(term)
+        return found
+
+    def select(self, found, keywords, max_tags=None):
+        """Return keywords (original spelling, list order) present in found."""
+        key = tuple(keywords)
+        lowered = self._lowered.get(key)
+        if lowered is None:
+            lowered = self._lowered[key] = [kw.lower() for kw in keywords]
+        matched = [kw for kw, kw_lower in zip(keywords, lowered) if kw_lower in found]
+        return matched if max_tags is None else matched[:max_tags]
+
+ONTARIO_TERMS_LOWER = frozenset(term.lower() for term in ONTARIO_TERMS)
+
+# One matcher for every keyword list and location term, built once at import
+TERM_MATCHER = TermMatcher(
+    list(REDDIT_KEYWORDS) + list(TOCONDO_KEYWORDS) + list(ONTARIO_TERMS),
+    word_boundaries=KEYWORD_WORD_BOUNDARIES
+)
+
+def get_term_matcher(keywords):
+    """Return a matcher covering keywords, compiling one for unknown lists."""
+    if keywords is REDDIT_KEYWORDS or keywords is TOCONDO_KEYWORDS:
+        return TERM_MATCHER
+    if not hasattr(get_term_matcher, "cache"):
+        get_term_matcher.cache = {}
+    key = tuple(keywords)
+    if key not in get_term_matcher.cache:
+        if all(kw.lower() in TERM_MATCHER.terms for kw in keywords):
+            get_term_matcher.cache[key] = TERM_MATCHER
+        else:
+            get_term_matcher.cache[key] = TermMatcher(keywords, word_boundaries=KEYWORD_WORD_BOUNDARIES)
+    return get_term_matcher.cache[key]
+
+def get_matched_keywords(text, keywords, max_tags=10, found=None):
+    """Return up to max_tags keywords found in text, in keyword list order.
+
+    Pass the result of TERM_MATCHER.scan(text) as found to reuse a scan.
+    """
+    matcher = get_term_matcher(keywords)
+    if found is None or matcher is not TERM_MATCHER:
+        found = matcher.scan(text)
+    return matcher.select(found, keywords, max_tags)
+
+def get_http_session():
+    """Return the shared requests.Session.
+
+    One session keeps a pool of keep-alive connections per host, so repeated
+    fetches from the same site reuse TCP/TLS connections.
+    """
+    if not hasattr(get_http_session, "session"):
+        session = requests.Session()
+        if REPLAY_DIR:
+            adapter_class = ReplayAdapter
+        elif RECORD_DIR:
+            adapter_class = RecordingAdapter
+        else:
+            adapter_class = HTTPAdapter
+        adapter = adapter_class(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        get_http_session.session = session
+    return get_http_session.session
+
+class HostLimiter:
+    """Adaptive rate limit and circuit breaker for requests to one host.
+
+    A host is unlimited until it throttles (429 or 503). The limit then
+    becomes half the rate requests were actually being sent at, and grows by
+    HTTP_HOST_RATE_STEP requests/second on each success after that. A throttle
+    also pauses the host for its Retry-After (or the backoff delay). After
+    HTTP_BREAKER_FAILURES consecutive failures (timeouts, connection errors,
+    5xx) the breaker opens and acquire() refuses requests for
+    HTTP_BREAKER_COOLDOWN_SECONDS. The next request after that is a trial:
+    one more failure reopens the breaker, and a success closes it.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.rate = None
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.open_until = 0.0
+        self.failures = 0
+        self.sent = collections.deque(maxlen=32)
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request may be sent; False if the breaker is open."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.open_until:
+                    return False
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate is None:
+                    self.sent.append(now)
+                    return True
+                else:
+                    self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.sent.append(now)
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def sending_rate(self):
+        if len(self.sent) < 2 or self.sent[-1] <= self.sent[0]:
+            return 1.0
+        return (len(self.sent) - 1) / (self.sent[-1] - self.sent[0])
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            if self.rate is not None:
+                self.rate += HTTP_HOST_RATE_STEP
+
+    def throttled(self, pause):
+        """Halve the rate and pause the host for pause seconds.
+
+        Throttles arriving during a pause answer requests sent before it, so
+        they only extend the pause instead of halving the rate again.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.paused_until:
+                current = self.sending_rate() if self.rate is None else min(self.rate, self.sending_rate())
+                self.rate = max(HTTP_HOST_MIN_RPS, current / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, now + pause)
+            self.updated = self.paused_until
+        logging.warning(f"{self.host} is throttling: pausing {pause:.1f}s, then at most {self.rate:.2f} requests/s")
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures < HTTP_BREAKER_FAILURES:
+                return
+            self.open_until = time.monotonic() + HTTP_BREAKER_COOLDOWN_SECONDS
+        METRICS.inc("http_breaker_opened_total", host=self.host)
+        logging.warning(f"Circuit breaker open for {self.host} after {self.failures} consecutive failures; "
+                        f"skipping it for {HTTP_BREAKER_COOLDOWN_SECONDS:.0f}s")
+
+HOST_LIMITERS = {}
+HOST_LIMITERS_LOCK = threading.Lock()
+
+def get_host_limiter(host):
+    with HOST_LIMITERS_LOCK:
+        if host not in HOST_LIMITERS:
+            HOST_LIMITERS[host] = HostLimiter(host)
+        return HOST_LIMITERS[host]
 
-def robust_fetch_url(url, max_retries=3, timeout=10):
-    """Robustly fetch URL with retries and error handling."""
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt], capped."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def retry_after_seconds(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (normalize_datetime(retry_at) - datetime.now(timezone.utc)).total_seconds()
+    return min(max(0.0, seconds), HTTP_RETRY_AFTER_MAX_SECONDS)
+
+def robust_fetch_url(url, max_retries=3, timeout=10, headers=None, stream=False):
+    """Robustly fetch URL with retries and error handling.
+
+    Requests go through the host's HostLimiter. 429/503 answers slow the
+    host down and wait out Retry-After; timeouts, connection errors and
+    5xx are retried after a jittered exponential backoff; other 4xx answers
+    are not retried. Returns None when retries run out or the host's
+    circuit breaker is open.
+
+    Extra headers are added to each attempt; a 304 answer to conditional
+    headers counts as success and is returned like a 200. With stream=True
+    the body is not read; the caller must consume and close the response
+    (and count the bytes it reads with count_downloaded).
+    """
+    extra_headers = headers or {}
+    host = urlparse(url).netloc
+    limiter = get_host_limiter(host)
     for attempt in range(max_retries):
+        if attempt > 0:
+            METRICS.inc("http_retries_total", host=host)
+        if not limiter.acquire():
+            METRICS.inc("http_breaker_rejected_total", host=host)
+            logging.warning(f"Circuit breaker open for {host}; not fetching {url}")
+            return None
         try:
             headers = {
                 'User-Agent': random.choice(USER_AGENTS),
@@ -347,47 +1072,375 @@ def robust_fetch_url(url, max_retries=3, timeout=10):
                 'Accept-Encoding': 'gzip, deflate',
                 'Connection': 'keep-alive',
                 'Upgrade-Insecure-Requests': '1',
+                **extra_headers,
             }
             
-            # Add delay between retries
-            if attempt > 0:
-                time.sleep(random.uniform(2, 5))
+            with METRICS.timer("http_request_seconds", host=host):
+                response = get_http_session().get(url, timeout=timeout, headers=headers, stream=stream)
+            METRICS.inc("http_responses_total", host=host, status=str(response.status_code))
             
-            response = requests.get(url, timeout=timeout, headers=headers)
-            
-            if response.status_code == 200:
+            if response.status_code == 200 or (response.status_code == 304 and extra_headers):
+                limiter.success()
+                if response.status_code == 200 and not stream:
+                    count_downloaded(url, len(response.content))
                 return response
-            elif response.status_code == 429:  # Rate limited
-                logging.warning(f"Rate limited on {url}, waiting longer...")
-                time.sleep(random.uniform(10, 20))
-                continue
-            else:
-                logging.warning(f"HTTP {response.status_code} for {url}")
+            response.close()
+            if response.status_code in (429, 503):  # Rate limited or overloaded
+                retry_after = retry_after_seconds(response)
+                if retry_after is None:
+                    retry_after = min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                limiter.throttled(retry_after)
+                if response.status_code == 503:
+                    limiter.failed()
                 continue
+            logging.warning(f"HTTP {response.status_code} for {url}")
+            if response.status_code < 500 and response.status_code != 408:
+                # Other client errors will not change on retry
+                limiter.success()
+                return None
+            limiter.failed()
                 
         except requests.exceptions.Timeout:
+            METRICS.inc("http_errors_total", host=host, error="timeout")
+            limiter.failed()
             logging.warning(f"Timeout on attempt {attempt + 1} for {url}")
-            continue
         except requests.exceptions.RequestException as e:
+            METRICS.inc("http_errors_total", host=host, error=type(e).__name__)
+            limiter.failed()
             logging.warning(f"Request error on attempt {attempt + 1} for {url}: {e}")
-            continue
+        if attempt + 1 < max_retries:
+            time.sleep(backoff_delay(attempt))
     
     return None
 
+def fetch_urls(urls, max_per_host=None, max_workers=None, headers=None, fetch_func=None, **kwargs):
+    """Fetch many URLs concurrently with robust_fetch_url (or fetch_func).
+
+    Yields (url, response) pairs as each fetch finishes; response is None if
+    every retry failed. At most max_per_host requests (HTTP_MAX_PER_HOST by
+    default) are in flight to any one host. headers maps a URL to extra
+    request headers for it; other kwargs go to the fetch function. Closing
+    the generator early cancels the fetches that have not started.
+    """
+    headers = headers or {}
+    fetch_func = fetch_func or robust_fetch_url
+    max_per_host = max_per_host or HTTP_MAX_PER_HOST
+    max_workers = max_workers or HTTP_POOL_SIZE
+    host_slots = {}
+    for url in urls:
+        host_slots.setdefault(urlparse(url).netloc, threading.Semaphore(max_per_host))
+
+    def fetch(url):
+        with host_slots[urlparse(url).netloc]:
+            return url, fetch_func(url, headers=headers.get(url), **kwargs)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch, url) for url in urls]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+# --- Record/replay ---
+# With RECORD_DIR set, a live run also writes every HTTP response and Reddit
+# listing it reads to that directory. With REPLAY_DIR set, a run reads them
+# back instead of going to the network, and MongoDB is replaced by an
+# in-memory store. Recording with REDDIT_INCREMENTAL=false captures full listings.
+
+def fixture_path(directory, kind, key, suffix=".json"):
+    return os.path.join(directory, kind, hashlib.sha256(key.encode("utf-8")).hexdigest() + suffix)
+
+def write_fixture(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def record_manifest(ctx):
+    path = os.path.join(RECORD_DIR, "manifest.json")
+    write_fixture(path, json.dumps({"recorded_at": ctx.now.isoformat()}).encode("utf-8"))
+
+def replay_recorded_at():
+    try:
+        with open(os.path.join(REPLAY_DIR, "manifest.json"), encoding="utf-8") as f:
+            return datetime.fromisoformat(json.load(f)["recorded_at"])
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"No usable replay manifest in {REPLAY_DIR}, using the current time: {e}")
+        return None
+
+# Headers describing the wire encoding; recorded bodies are stored decoded
+UNRECORDED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that saves each 200 response under RECORD_DIR/http.
+
+    Conditional headers are dropped so every recording holds a full body.
+    """
+
+    def send(self, request, **kwargs):
+        request.headers.pop("If-None-Match", None)
+        request.headers.pop("If-Modified-Since", None)
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in UNRECORDED_HEADERS}
+            write_fixture(fixture_path(RECORD_DIR, "http", request.url, ".body"), response.content)
+            write_fixture(fixture_path(RECORD_DIR, "http", request.url),
+                          json.dumps({"url": request.url, "headers": headers}).encode("utf-8"))
+        return response
+
+class ReplayAdapter(HTTPAdapter):
+    """HTTPAdapter that answers from REPLAY_DIR/http without touching the network.
+
+    URLs that were not recorded get an empty 404. Each answer is delayed by
+    REPLAY_LATENCY_SECONDS to stand in for network time in benchmarks.
+    """
+
+    def send(self, request, **kwargs):
+        if REPLAY_LATENCY_SECONDS:
+            time.sleep(REPLAY_LATENCY_SECONDS)
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        try:
+            with open(fixture_path(REPLAY_DIR, "http", request.url), encoding="utf-8") as f:
+                meta = json.load(f)
+            response.status_code = 200
+            response.headers = CaseInsensitiveDict(meta["headers"])
+            with open(fixture_path(REPLAY_DIR, "http", request.url, ".body"), "rb") as f:
+                response.raw = io.BytesIO(f.read())
+        except (OSError, ValueError):
+            logging.debug(f"No recorded response for {request.url}")
+            response.status_code = 404
+            response.raw = io.BytesIO(b"")
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+REDDIT_POST_FIELDS = ("title", "permalink", "created_utc", "fullname", "selftext", "score", "num_comments")
+
+class RecordingReddit:
+    """Wraps a praw.Reddit so the listings and searches read are saved under RECORD_DIR/reddit."""
+
+    def __init__(self, reddit, directory):
+        self.reddit = reddit
+        self.directory = directory
+
+    def __getattr__(self, name):
+        return getattr(self.reddit, name)
+
+    def subreddit(self, name):
+        return RecordingSubreddit(self.reddit.subreddit(name), self.directory, name)
+
+def reddit_search_key(name, query, sort, time_filter):
+    return "\n".join((name, query, sort, time_filter))
+
+class RecordingSubreddit:
+    def __init__(self, subreddit, directory, name):
+        self.subreddit = subreddit
+        self.directory = directory
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(self.subreddit, name)
+
+    def record(self, listing, path):
+        posts = []
+        try:
+            for post in listing:
+                fields = {field: getattr(post, field, None) for field in REDDIT_POST_FIELDS}
+                fields["subreddit"] = str(getattr(post, "subreddit", self.name))
+                posts.append(fields)
+                yield post
+        finally:
+            write_fixture(path, json.dumps(posts).encode("utf-8"))
+
+    def new(self, limit=None):
+        return self.record(self.subreddit.new(limit=limit), fixture_path(self.directory, "reddit", self.name))
+
+    def search(self, query, sort="relevance", time_filter="all", limit=None):
+        return self.record(
+            self.subreddit.search(query, sort=sort, time_filter=time_filter, limit=limit),
+            fixture_path(self.directory, "reddit-search", reddit_search_key(self.name, query, sort, time_filter))
+        )
+
+class ReplayReddit:
+    """Stands in for praw.Reddit, serving listings and searches recorded by RecordingReddit."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def subreddit(self, name):
+        return ReplaySubreddit(self.directory, name)
+
+class ReplaySubreddit:
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return [types.SimpleNamespace(**post) for post in json.load(f)]
+        except (OSError, ValueError):
+            logging.debug(f"No recorded listing at {path} for r/{self.name}")
+            return []
+
+    def listing(self, posts):
+        """Yield posts, sleeping REPLAY_LATENCY_SECONDS per 100 (one Reddit API page)."""
+        for i, post in enumerate(posts):
+            if REPLAY_LATENCY_SECONDS and i % 100 == 0:
+                time.sleep(REPLAY_LATENCY_SECONDS)
+            yield post
+
+    def new(self, limit=None):
+        return self.listing(self.load(fixture_path(self.directory, "reddit", self.name))[:limit])
+
+    def search(self, query, sort="relevance", time_filter="all", limit=None):
+        path = fixture_path(self.directory, "reddit-search", reddit_search_key(self.name, query, sort, time_filter))
+        return self.listing(self.load(path)[:limit])
+
+def http_cache_path(url):
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+def http_cache_get(url):
+    """Return the cached entry for url, or None.
+
+    Entries hold the URL's ETag/Last-Modified validators plus its extracted
+    text and/or the path of its stored body. Reading an entry marks it as
+    recently used for eviction.
+    """
+    if not HTTP_CACHE_DIR:
+        return None
+    path = http_cache_path(url)
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("has_body") and not os.path.exists(f"{path}.body"):
+            return None
+        os.utime(f"{path}.json")
+        return entry
+    except (OSError, ValueError):
+        return None
+
+def http_cache_put(url, response, text=None, body=None):
+    """Store response's validators for url, with extracted text and/or raw body."""
+    if not HTTP_CACHE_DIR:
+        return
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        path = http_cache_path(url)
+        if body is not None:
+            with open(f"{path}.body.tmp", "wb") as f:
+                f.write(body)
+            os.replace(f"{path}.body.tmp", f"{path}.body")
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "text": text,
+            "has_body": body is not None,
+            "stored_at": datetime.utcnow().isoformat()
+        }
+        with open(f"{path}.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+    except OSError as e:
+        logging.warning(f"Failed to write HTTP cache entry for {url}: {e}")
+
+def http_cache_read_body(url):
+    with open(f"{http_cache_path(url)}.body", "rb") as f:
+        return f.read()
+
+def conditional_headers(entry):
+    """Return If-None-Match/If-Modified-Since headers for a cached entry."""
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+HTTP_CACHE_EVICT_LOCK = threading.Lock()
+
+def evict_http_cache():
+    """Delete least recently used entries until the cache fits HTTP_CACHE_MAX_BYTES.
+
+    Runs at the end of every run (see run_reddit_tocondo_scrapers, the
+    daemon's source jobs and run_queue_worker), whatever the sources fetched.
+    """
+    if not HTTP_CACHE_DIR or not os.path.isdir(HTTP_CACHE_DIR):
+        return
+    # Daemon jobs may finish at the same time; one eviction at a time
+    with HTTP_CACHE_EVICT_LOCK:
+        evicted = evict_http_cache_entries()
+    count_http_cache("evictions", evicted)
+    if evicted:
+        logging.info(f"Evicted {evicted} HTTP cache entries to fit HTTP_CACHE_MAX_BYTES")
+
+def evict_http_cache_entries():
+    entries = {}
+    for name in os.listdir(HTTP_CACHE_DIR):
+        key = name.split(".", 1)[0]
+        path = os.path.join(HTTP_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        size, last_used = entries.get(key, (0, 0))
+        last_used = max(last_used, stat.st_mtime) if name.endswith(".json") else last_used
+        entries[key] = (size + stat.st_size, last_used)
+
+    total = sum(size for size, _ in entries.values())
+    evicted = 0
+    for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= HTTP_CACHE_MAX_BYTES:
+            break
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(os.path.join(HTTP_CACHE_DIR, key + suffix))
+            except OSError:
+                pass
+        total -= size
+        evicted += 1
+    return evicted
+
+def fetch_cached_page(url, timeout=10):
+    """Return the text of url, revalidating a cached copy with a conditional GET."""
+    entry = http_cache_get(url)
+    response = robust_fetch_url(url, timeout=timeout, headers=conditional_headers(entry))
+    if response is None:
+        return None
+    if response.status_code == 304:
+        count_http_cache("hits")
+        return http_cache_read_body(url).decode("utf-8", errors="replace")
+    count_http_cache("misses")
+    http_cache_put(url, response, body=response.content)
+    return response.text
+
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(month_name) if name}
+MONTH_YEAR_PATTERN = re.compile(rf"({'|'.join(month_name[1:])})[_\s-]?(\d{{4}})", re.IGNORECASE)
+YEAR_MONTH_PATTERN = re.compile(r"(\d{4})[_\s-](\d{1,2})")
+MONTH_YEAR_NUMERIC_PATTERN = re.compile(r"(\d{1,2})[_\s-](\d{4})")
+YEAR_PATTERN = re.compile(r"(\d{4})")
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
 def extract_pdf_publish_date(title):
     """Enhanced PDF date extraction with multiple patterns."""
     try:
         # Pattern 1: Month-Year format (e.g., "May-2023-Toronto-Condo-News.pdf")
-        match = re.search(rf"({'|'.join(month_name[1:])})[_\s-]?(\d{{4}})", title, re.IGNORECASE)
+        match = MONTH_YEAR_PATTERN.search(title)
         if match:
-            month_str = match.group(1).capitalize()
-            year = int(match.group(2))
-            month_num = list(month_name).index(month_str)
-            dt = datetime(year, month_num, 1, tzinfo=timezone.utc)
+            dt = datetime(int(match.group(2)), MONTH_NUMBERS[match.group(1).lower()], 1, tzinfo=timezone.utc)
             return dt.isoformat()
         
         # Pattern 2: YYYY-MM format
-        match = re.search(r"(\d{4})[_\s-](\d{1,2})", title)
+        match = YEAR_MONTH_PATTERN.search(title)
         if match:
             year = int(match.group(1))
             month = int(match.group(2))
@@ -396,7 +1449,7 @@ def extract_pdf_publish_date(title):
                 return dt.isoformat()
         
         # Pattern 3: MM-YYYY format
-        match = re.search(r"(\d{1,2})[_\s-](\d{4})", title)
+        match = MONTH_YEAR_NUMERIC_PATTERN.search(title)
         if match:
             month = int(match.group(1))
             year = int(match.group(2))
@@ -405,7 +1458,7 @@ def extract_pdf_publish_date(title):
                 return dt.isoformat()
         
         # Pattern 4: Just year (fallback to January)
-        match = re.search(r"(\d{4})", title)
+        match = YEAR_PATTERN.search(title)
         if match:
             year = int(match.group(1))
             if 2020 <= year <= 2030:  # Sanity check
@@ -417,336 +1470,2627 @@ def extract_pdf_publish_date(title):
 
     return None  # Return None instead of current date to properly discard articles without dates
 
-def safe_get_published_date(parsed_date):
-    try:
-        if parsed_date:
-            if isinstance(parsed_date, str):
-                try:
-                    dt = datetime.fromisoformat(parsed_date)
-                    return dt.isoformat()
-                except Exception:
-                    return parsed_date  # Already ISO or fallback
-            elif isinstance(parsed_date, datetime):
-                return parsed_date.isoformat()
-        return datetime.utcnow().isoformat()
-    except Exception:
-        return datetime.utcnow().isoformat()
+def safe_get_published_date(parsed_date, ctx=None):
+    if isinstance(parsed_date, datetime):
+        return parsed_date.isoformat()
+    if parsed_date and isinstance(parsed_date, str):
+        try:
+            return datetime.fromisoformat(parsed_date).isoformat()
+        except ValueError:
+            return parsed_date  # Already ISO or fallback
+    return (ctx or get_run_context()).now_iso
 
 def is_within_date_range(published_date_str):
-    """Check if published date is within acceptable range (not older than 30 days from run date)."""
-    try:
-        # Parse the published date
-        pub_dt = datetime.fromisoformat(published_date_str)
-        pub_dt = normalize_datetime(pub_dt)
-        
-        # Get current run date (today)
-        run_date = datetime.utcnow().replace(tzinfo=timezone.utc)
-        
-        # Calculate 30 days ago from run date
-        thirty_days_ago = run_date - timedelta(days=30)
-        
-        # Check if published date is within the last 30 days
-        return thirty_days_ago <= pub_dt <= run_date
-    except Exception as e:
-        logging.debug(f"Error checking date range for {published_date_str}: {e}")
-        return False
+    """Check if published date is within acceptable range (not older than PUBLISHED_MAX_AGE_DAYS from run date)."""
+    return get_run_context().published_date_ok(published_date_str, recent_only=True)
+
+# Indexes kept on RAW_COLLECTION, as (keys, options). The article accessors
+# sort by (published_date, _id) descending, so the compound indexes end in
+# those fields and each page is read straight off the index.
+RAW_INDEXES = [
+    ("link", {"name": "link_unique", "unique": True}),
+    ("scraped_date", {"name": "scraped_date"}),
+    ([("source", pymongo.ASCENDING), ("published_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+     {"name": "source_published_date"}),
+    # Multikey: one entry per tag
+    ([("tags", pymongo.ASCENDING), ("published_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+     {"name": "tags_published_date"}),
+    ([("title", pymongo.TEXT), ("content", pymongo.TEXT)],
+     {"name": "title_content_text", "weights": {"title": 5, "content": 1}, "default_language": "english"}),
+    # Partial indexes stay as small as the enrichment backlog, not the collection
+    ([("processing_status", pymongo.ASCENDING), ("scraped_date", pymongo.ASCENDING)],
+     {"name": "pending_scraped_date", "partialFilterExpression": {"processing_status": "pending"}}),
+    ([("processing_status", pymongo.ASCENDING), ("claimed_at", pymongo.ASCENDING)],
+     {"name": "processing_claimed_at", "partialFilterExpression": {"processing_status": "processing"}}),
+]
+# Indexes earlier versions created on RAW_COLLECTION that RAW_INDEXES replaces
+RETIRED_RAW_INDEXES = ("processing_status",)
+
+RAW_INDEXES_LOCK = threading.Lock()
+
+def duplicate_raw_links(collection):
+    """Groups {"_id": link, "ids": [...], "count": n} for links stored more than once.
+
+    Older versions saved without the unique link index, so a link may
+    appear more than once.
+    """
+    return collection.aggregate([
+        {"$group": {"_id": "$link", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+def dedupe_raw_links(collection):
+    """Delete extra documents sharing a link, so the unique link index can be built.
+
+    Only run on request (--dedupe-links). Per link, a processed copy is kept
+    over an unprocessed one, then the earliest scraped. Returns the number
+    of documents deleted.
+    """
+    deleted = 0
+    for group in duplicate_raw_links(collection):
+        copies = list(collection.find({"_id": {"$in": group["ids"]}}, {"processing_status": 1, "scraped_date": 1}))
+        copies.sort(key=lambda doc: (doc.get("processing_status") != "processed", doc.get("scraped_date") or ""))
+        extra = [doc["_id"] for doc in copies[1:]]
+        deleted += collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    return deleted
+
+def ensure_raw_indexes():
+    """Create RAW_INDEXES on RAW_COLLECTION and drop RETIRED_RAW_INDEXES (at most once per process).
+
+    Runs at startup and before the first save. If the unique link index is
+    missing and duplicate links left by older versions are found, they are
+    logged and left alone, and that index is skipped until they are removed
+    with --dedupe-links (see dedupe_raw_links). Each index is created on its
+    own, so one that fails (say a conflicting text index made by hand) is
+    logged without blocking the rest. Failures are not retried until the
+    next process starts.
+    """
+    with RAW_INDEXES_LOCK:
+        if getattr(ensure_raw_indexes, "done", False):
+            return
+        ensure_raw_indexes.done = True
+        collection = get_collection(RAW_COLLECTION)
+        skip = set()
+        try:
+            existing = collection.index_information()
+            for name in RETIRED_RAW_INDEXES:
+                if name in existing:
+                    collection.drop_index(name)
+                    logging.info(f"Dropped retired index {name} on {RAW_COLLECTION}")
+            if "link_unique" not in existing and collection.find_one({}, {"_id": 1}) is not None:
+                groups = list(duplicate_raw_links(collection))
+                if groups:
+                    skip.add("link_unique")
+                    examples = ", ".join(group["_id"] for group in groups[:5])
+                    logging.warning(
+                        f"{len(groups)} links appear more than once in {RAW_COLLECTION} "
+                        f"({sum(group['count'] - 1 for group in groups)} extra documents, e.g. {examples}); "
+                        f"not creating link_unique until they are removed with --dedupe-links"
+                    )
+        except Exception as e:
+            logging.warning(f"Could not prepare {RAW_COLLECTION} for its indexes: {e}")
+        for keys, options in RAW_INDEXES:
+            if options["name"] in skip:
+                continue
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                logging.error(f"Could not create index {options['name']} on {RAW_COLLECTION}: {e}")
+
+class ArticleSaveError(Exception):
+    """Some articles in a save_scraped_data call were not saved; stored and failed count each kind."""
+
+    def __init__(self, message, stored, failed):
+        super().__init__(message)
+        self.stored = stored
+        self.failed = failed
+
+def save_scraped_data(source, data, batch_size=None, ctx=None):
+    """Upsert articles into RAW_COLLECTION keyed on link.
 
-def save_scraped_data(source, data):
+    Content fields are refreshed on every run; scraped_date and the
+    processing fields are only set when a link is first inserted, so reruns
+    leave unchanged articles untouched. Articles flagged reprocess (their
+    content changed) go back to "pending" even when they already exist.
+    Articles whose canonical_id points at another link are inserted as
+    "duplicate" and skipped by enrichment. Writes go out in batches of
+    batch_size (MONGO_BATCH_SIZE by default). New articles get ctx's (the
+    current run's) start as scraped_date. Returns the number of articles
+    stored (inserted, updated or already up to date). If any article was not
+    saved (a write error, a write concern error for its batch, or a failed
+    batch), the other batches are still written and ArticleSaveError is
+    raised at the end.
+    """
     if not data:
         logging.info(f"No {source} articles to save.")
         return 0
 
+    ensure_raw_indexes()
     collection = get_collection(RAW_COLLECTION)
+    batch_size = batch_size or MONGO_BATCH_SIZE
+    insert_only_fields = ("scraped_date", "processing_status", "processed_at", "reprocess", "_id")
+    scraped_date = (ctx or get_run_context()).now_iso
 
+    operations = []
     for item in data:
-        item.update({
-            "source": source,
-            "scraped_date": datetime.utcnow().isoformat(),
-            "processing_status": "pending",
-            "processed_at": None
-        })
+        item["source"] = source
+        fields = {key: value for key, value in item.items() if key not in insert_only_fields}
+        duplicate = item.get("canonical_id") not in (None, item["link"])
+        status = {"processing_status": "duplicate" if duplicate else "pending", "processed_at": None}
+        if item.get("reprocess"):
+            update = {
+                "$set": {**fields, **status},
+                "$setOnInsert": {"scraped_date": scraped_date},
+                "$unset": {"enrich_attempts": "", "processing_error": "", "retry_after": ""}
+            }
+        else:
+            update = {"$set": fields, "$setOnInsert": {"scraped_date": scraped_date, **status}}
+        operations.append(UpdateOne({"link": item["link"]}, update, upsert=True))
 
-    try:
-        result = collection.insert_many(data, ordered=False)
-        count = len(result.inserted_ids)
-        SCRAPED_COUNT[source] += count
-        logging.info(f"Saved {count} {source} articles to {RAW_COLLECTION}")
-        return count
-    except BulkWriteError as e:
-        inserted = len(e.details['nInserted'])
-        SCRAPED_COUNT[source] += inserted
-        logging.info(f"Saved {inserted} {source} articles to {RAW_COLLECTION} (some duplicates skipped)")
-        return inserted
+    inserted = updated = matched = failed = 0
+    for start in range(0, len(operations), batch_size):
+        batch = operations[start:start + batch_size]
+        try:
+            with METRICS.timer("mongo_write_seconds", source=source):
+                result = collection.bulk_write(batch, ordered=False)
+            inserted += result.upserted_count
+            updated += result.modified_count
+            matched += result.matched_count
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors") or []
+            concern_errors = e.details.get("writeConcernErrors") or []
+            # Without the write concern the whole batch is unconfirmed, so none of it counts as stored
+            if concern_errors:
+                batch_failed = len(batch)
+            else:
+                batch_failed = len(write_errors)
+                inserted += e.details.get("nUpserted", 0)
+                updated += e.details.get("nModified", 0)
+                matched += e.details.get("nMatched", 0)
+            failed += batch_failed
+            METRICS.inc("mongo_write_errors_total", batch_failed, source=source)
+            first_error = (write_errors or concern_errors or [{}])[0]
+            logging.warning(f"{batch_failed} {source} articles failed to save: {first_error.get('errmsg')}")
+        except Exception as e:
+            failed += len(batch)
+            METRICS.inc("mongo_write_errors_total", len(batch), source=source)
+            logging.error(f"Failed to save {len(batch)} {source} articles: {e}")
 
-META_DATE_PRIORITY = [
-    'article:published_time', 'datePublished', 'pubdate', 'publishdate', 'date', 'og:published_time'
-]
+    unchanged = matched - updated
+    with WRITE_STATS_LOCK:
+        SCRAPED_COUNT[source] = SCRAPED_COUNT.get(source, 0) + inserted
+        source_stats = WRITE_STATS.setdefault(source, {"inserted": 0, "updated": 0, "unchanged": 0})
+        for key, value in (("inserted", inserted), ("updated", updated), ("unchanged", unchanged)):
+            source_stats[key] += value
+    logging.info(f"Saved {source} articles to {RAW_COLLECTION}: {inserted} inserted, {updated} updated, {unchanged} unchanged")
+    if failed:
+        raise ArticleSaveError(f"{failed} of {len(operations)} {source} articles were not saved",
+                               inserted + updated + unchanged, failed)
+    return inserted + updated + unchanged
 
-def extract_published_date_from_entry(entry):
-    """Extract published date from entry with robust error handling."""
-    # Try all likely fields for Reddit and TOCondo
-    for key in ['created_utc', 'published', 'updated', 'created', 'date']:
-        if key in entry and entry[key]:
-            try:
-                if key == 'created_utc':
-                    return datetime.utcfromtimestamp(float(entry[key])).replace(tzinfo=timezone.utc).isoformat()
-                dt = dateutil.parser.parse(entry[key], fuzzy=True)
-                dt = normalize_datetime(dt)
-                return dt.isoformat()
+# Mersenne prime 2**31 - 1: with coefficients below it and 32-bit shingle
+# hashes, a * x + b stays under 2**64, so the uint64 arithmetic never wraps
+MINHASH_PRIME = np.uint64((1 << 31) - 1)
+
+def dedup_text(article):
+    """Normalized title and leading content used to compare articles."""
+    text = f"{article.get('title') or ''} {(article.get('content') or '')[:DEDUP_MAX_CHARS]}"
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+class NearDuplicateIndex:
+    """MinHash/LSH index grouping near-duplicate articles under a canonical id.
+
+    Each article's dedup_text is reduced to a MinHash signature of its
+    character 5-grams. The signature is split into `bands` bands, and only
+    articles that share a band bucket are compared, so the work grows with
+    the number of likely matches rather than with every pair. A candidate
+    counts as a duplicate when rapidfuzz's ratio reaches `threshold`. The
+    canonical id is the link of the first article of the group that the
+    index saw. Stored articles are seeded first, so they keep that role.
+    """
+
+    def __init__(self, num_perm=None, bands=None, threshold=None, seed=1):
+        num_perm = num_perm or DEDUP_NUM_PERM
+        self.bands = bands or DEDUP_BANDS
+        self.rows = num_perm // self.bands
+        self.threshold = threshold or DEDUP_THRESHOLD
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MINHASH_PRIME, size=self.bands * self.rows, dtype=np.uint64)
+        self.b = rng.randint(0, MINHASH_PRIME, size=self.bands * self.rows, dtype=np.uint64)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.texts = {}
+        self.canonical = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def signature(self, text):
+        shingles = {text[i:i + 5] for i in range(max(1, len(text) - 4))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(hashes, self.a) + self.b) % MINHASH_PRIME).min(axis=0)
+
+    def band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, link, text, canonical=None):
+        """Index link and return its canonical id (its own link when it is not a duplicate)."""
+        with self.lock:
+            if link in self.canonical:
+                return self.canonical[link]
+            if not text:
+                self.canonical[link] = canonical or link
+                return self.canonical[link]
+
+            keys = self.band_keys(self.signature(text))
+            if canonical is None:
+                canonical = link
+                seen = set()
+                for band, key in enumerate(keys):
+                    for other in self.buckets[band].get(key, ()):
+                        if other in seen:
+                            continue
+                        seen.add(other)
+                        if fuzz.ratio(text, self.texts[other], score_cutoff=self.threshold):
+                            canonical = self.canonical[other]
+                            break
+                    if canonical != link:
+                        break
+                with DEDUP_STATS_LOCK:
+                    DEDUP_STATS["comparisons"] += len(seen)
+
+            self.texts[link] = text
+            self.canonical[link] = canonical
+            for band, key in enumerate(keys):
+                self.buckets[band].setdefault(key, []).append(link)
+            return canonical
+
+    def assign(self, articles):
+        """Set canonical_id on each new article; returns how many are duplicates."""
+        duplicates = 0
+        for article in articles:
+            article["canonical_id"] = self.add(article["link"], dedup_text(article))
+            if article["canonical_id"] != article["link"]:
+                duplicates += 1
+        with DEDUP_STATS_LOCK:
+            DEDUP_STATS["checked"] += len(articles)
+            DEDUP_STATS["duplicates"] += duplicates
+        return duplicates
+
+def load_dedup_index(lookback_days=None, ctx=None):
+    """Build a NearDuplicateIndex seeded with articles stored in the last lookback_days before ctx's start."""
+    lookback_days = lookback_days or DEDUP_LOOKBACK_DAYS
+    index = NearDuplicateIndex()
+    cutoff = ((ctx or get_run_context()).now - timedelta(days=lookback_days)).replace(tzinfo=None).isoformat()
+    started = time.perf_counter()
+    try:
+        stored = get_collection(RAW_COLLECTION).find(
+            {"scraped_date": {"$gte": cutoff}},
+            {"link": 1, "title": 1, "content": 1, "canonical_id": 1}
+        ).sort("scraped_date", 1)
+        for article in stored:
+            index.add(article["link"], dedup_text(article), article.get("canonical_id") or article["link"])
+    except Exception as e:
+        logging.warning(f"Could not seed duplicate index from {RAW_COLLECTION}: {e}")
+    logging.info(f"Seeded duplicate index with {len(index)} articles from the last {lookback_days} days "
+                 f"in {time.perf_counter() - started:.2f}s")
+    return index
+
+class ArticleWriter:
+    """Save articles with save_scraped_data from a background thread.
+
+    put() only queues the article, so scraping carries on while Mongo writes.
+    The queue holds at most WRITER_QUEUE_SIZE articles; beyond that put()
+    blocks, slowing producers down to Mongo's pace. A batch is flushed when it
+    reaches batch_size (MONGO_BATCH_SIZE) or its first article has waited
+    WRITER_FLUSH_SECONDS. close(), or leaving a with block, drains the queue
+    and returns the number of articles stored. With a NearDuplicateIndex as
+    dedup, each batch gets its canonical_id values just before it is saved.
+    ctx is the RunContext passed on to save_scraped_data.
+    """
+
+    _STOP = object()
+
+    def __init__(self, source, batch_size=None, flush_seconds=None, max_queue=None, dedup=None, ctx=None):
+        self.source = source
+        self.dedup = dedup
+        self.ctx = ctx
+        self.batch_size = batch_size or MONGO_BATCH_SIZE
+        self.flush_seconds = flush_seconds or WRITER_FLUSH_SECONDS
+        self.queue = queue.Queue(maxsize=max_queue or WRITER_QUEUE_SIZE)
+        self.received = 0
+        self.stored = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name=f"{source}-writer", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def put(self, article):
+        self.queue.put(article)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+            if not self.received:
+                logging.info(f"No {self.source} articles to save.")
+        return self.stored
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+                self.received += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if len(batch) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            if self.dedup is not None:
+                self.dedup.assign(batch)
+            self.stored += save_scraped_data(self.source, batch, batch_size=self.batch_size, ctx=self.ctx)
+        except ArticleSaveError as e:
+            self.stored += e.stored
+            self.failed += e.failed
+        except Exception as e:
+            self.failed += len(batch)
+            logging.error(f"Failed to save {len(batch)} {self.source} articles: {e}")
+
+class Source:
+    """A scraping source run through the shared pipeline in run_source.
+
+    Subclasses set name and keywords, decorate themselves with
+    register_source, and implement items(ctx). items is a generator of raw
+    item dicts. Each dict needs title, link, published_date (an ISO string
+    or a POSIX timestamp) and text, which is what keywords are matched
+    against. Optional subreddit, upvotes, comments and content are copied
+    onto the article. Date filtering, keyword matching, the article layout
+    and saving all happen in the pipeline. With require_location, an
+    ONTARIO_TERMS mention is also needed. With recent_only, items must be
+    no older than PUBLISHED_MAX_AGE_DAYS. With server_timestamps, dates
+    come from the source's own clock (like Reddit's created_utc), so items
+    created after the run started are accepted instead of being treated as
+    bogus future dates. An item with reprocess set is returned to
+    processing_status "pending" when it is saved over a stored article.
+    rejected(item) is called for items dropped for lacking the location or
+    keywords, and finish(writer) runs after the writer has drained.
+    run_source records a fatal exception in error and the number of
+    articles that could not be saved in failed_writes.
+    """
+
+    name = None
+    keywords = STANDARD_KEYWORDS
+    require_location = False
+    recent_only = False
+    server_timestamps = False
+    error = None
+    failed_writes = 0
+
+    def items(self, ctx):
+        raise NotImplementedError
+
+    def rejected(self, item):
+        pass
+
+    def finish(self, writer):
+        pass
+
+SOURCES = {}
+
+def register_source(cls):
+    """Class decorator adding a Source subclass to SOURCES under its name."""
+    SOURCES[cls.name] = cls
+    return cls
+
+def published_timestamp(published_date):
+    if isinstance(published_date, (int, float)):
+        return float(published_date)
+    dt = parse_iso_datetime(published_date)
+    return dt.timestamp() if dt is not None else None
+
+def date_accepted(source, published_date, ctx):
+    """True if published_date is inside the run's window for source."""
+    timestamp = published_timestamp(published_date)
+    upper_bound = not source.server_timestamps
+    if timestamp is None or not ctx.published_ok(timestamp, upper_bound=upper_bound):
+        return False
+    return not source.recent_only or ctx.published_ok(timestamp, recent_only=True, upper_bound=upper_bound)
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest() if content else None
+
+def build_article(source, item, ctx):
+    """Return the article document for a raw source item, or None if it is filtered out."""
+    title = item.get("title")
+    if not title or not item.get("link") or not item.get("published_date"):
+        count_discarded(source.name, "missing_fields")
+        return None
+
+    if not date_accepted(source, item["published_date"], ctx):
+        count_discarded(source.name, "outside_date_range")
+        logging.debug(f"Discarding {source.name} item (outside date range): {title[:50]}...")
+        return None
+
+    # Check relevance and keywords
+    text = item.get("text") or title
+    match_started = time.perf_counter()
+    found_terms = TERM_MATCHER.scan(text)
+    relevant = not source.require_location or is_relevant_location(text, found_terms)
+    matched_keywords = get_matched_keywords(text, source.keywords, found=found_terms) if relevant else []
+    METRICS.observe("keyword_match_seconds", time.perf_counter() - match_started, source=source.name)
+    if not relevant:
+        count_discarded(source.name, "no_location")
+        source.rejected(item)
+        return None
+    if not matched_keywords:
+        count_discarded(source.name, "no_keywords")
+        logging.debug(f"Discarding {source.name} item (no tags): {title[:50]}...")
+        source.rejected(item)
+        return None
+
+    published_date = item["published_date"]
+    if isinstance(published_date, (int, float)):
+        published_date = datetime.fromtimestamp(published_date, timezone.utc).isoformat()
+    else:
+        published_date = safe_get_published_date(published_date, ctx)
+
+    article = {
+        "title": title,
+        "link": item["link"],
+        "published_date": published_date,
+        "scraped_date": ctx.now_iso,
+        "tags": matched_keywords,
+        "source": source.name,
+        "subreddit": item.get("subreddit"),
+        "upvotes": item.get("upvotes"),
+        "comments": item.get("comments"),
+        "content": item.get("content") or None,
+        "content_hash": content_hash(item.get("content"))
+    }
+    if item.get("reprocess"):
+        article["reprocess"] = True
+    return article
+
+def merge_generators(generators, workers, max_buffer=None):
+    """Drain generators on up to `workers` threads, yielding items as they arrive.
+
+    Items from different generators interleave in arrival order. If the
+    consumer stops early, the remaining generators are stopped at their next
+    item.
+    """
+    generators = list(generators)
+    if workers <= 1 or len(generators) <= 1:
+        for generator in generators:
+            yield from generator
+        return
+
+    out = queue.Queue(maxsize=max_buffer or WRITER_QUEUE_SIZE)
+    finished = object()
+    stop = threading.Event()
+
+    def drain(generator):
+        try:
+            for item in generator:
+                if stop.is_set():
+                    break
+                out.put(item)
+        except Exception as e:
+            logging.error(f"Source generator failed: {e}")
+        finally:
+            out.put(finished)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(drain, generator) for generator in generators]
+        remaining = len(futures)
+        try:
+            while remaining:
+                item = out.get()
+                if item is finished:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+            while remaining:
+                if out.get() is finished:
+                    remaining -= 1
+
+# Set when a daemon is shutting down; long loops stop at their next item
+SHUTDOWN = threading.Event()
+
+def run_source(source, dedup=None, ctx=None):
+    """Run one source through the shared filter, match and write pipeline.
+
+    Articles are queued on an ArticleWriter as items arrive. ctx is the
+    run's RunContext (the current one by default). Returns the number
+    stored; errors are logged and count as 0. On SHUTDOWN the source stops
+    taking items, and what it already queued is still saved.
+    """
+    ctx = ctx or get_run_context()
+    seen = kept = 0
+    fetch_s = match_s = 0.0
+    started = time.perf_counter()
+    try:
+        with ArticleWriter(source.name, dedup=dedup, ctx=ctx) as writer:
+            items = iter(source.items(ctx))
+            while True:
+                if SHUTDOWN.is_set():
+                    logging.info(f"{source.name}: stopping early for shutdown")
+                    getattr(items, "close", lambda: None)()
+                    break
+                fetch_started = time.perf_counter()
+                item = next(items, None)
+                fetch_s += time.perf_counter() - fetch_started
+                if item is None:
+                    break
+                seen += 1
+                match_started = time.perf_counter()
+                try:
+                    article = build_article(source, item, ctx)
+                    if article:
+                        writer.put(article)
+                        kept += 1
+                except Exception as e:
+                    count_discarded(source.name, "error")
+                    logging.warning(f"Error processing {source.name} item {item.get('link')}: {e}")
+                match_s += time.perf_counter() - match_started
+            save_started = time.perf_counter()
+        save_s = time.perf_counter() - save_started
+        source.failed_writes = writer.failed
+        source.finish(writer)
+        METRICS.observe("source_seconds", time.perf_counter() - started, source=source.name)
+        METRICS.inc("items_seen_total", seen, source=source.name)
+        logging.info(
+            f"{source.name}: {seen} items, {kept} relevant, {writer.stored} stored in "
+            f"{time.perf_counter() - started:.2f}s | fetch {fetch_s:.2f}s | match {match_s:.2f}s | save wait {save_s:.2f}s"
+        )
+        return writer.stored
+    except Exception as e:
+        source.error = e
+        logging.error(f"Fatal {source.name} scraping error: {str(e)}")
+        return 0
+
+def run_sources(sources, dedup=None):
+    """Run independent sources concurrently, one thread each; returns {name: stored}."""
+    if not sources:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="source") as executor:
+        futures = {source.name: executor.submit(run_source, source, dedup) for source in sources}
+    return {name: future.result() for name, future in futures.items()}
+
+META_DATE_PRIORITY = [
+    'article:published_time', 'datePublished', 'pubdate', 'publishdate', 'date', 'og:published_time'
+]
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_fuzzy_date(value):
+    """dateutil fuzzy parse of value to a UTC ISO string, or None; cached per value."""
+    try:
+        return normalize_datetime(dateutil.parser.parse(str(value), fuzzy=True)).isoformat()
+    except (ValueError, OverflowError, TypeError):
+        return None
+
+def extract_structured_published_date(entry):
+    """Return the published date from an entry's own date fields, if any."""
+    # Try all likely fields for Reddit and TOCondo
+    for key in ['created_utc', 'published', 'updated', 'created', 'date']:
+        if key in entry and entry[key]:
+            try:
+                if key == 'created_utc':
+                    return datetime.utcfromtimestamp(float(entry[key])).replace(tzinfo=timezone.utc).isoformat()
+                published_date = parse_fuzzy_date(entry[key])
+                if published_date:
+                    return published_date
             except Exception:
                 continue
+    return None
+
+# Only <meta> tags are parsed, with lxml when it is installed
+META_PARSER = "lxml" if builder_registry.lookup("lxml") else "html.parser"
+META_STRAINER = SoupStrainer("meta")
+HEAD_END_PATTERN = re.compile(rb"</head\s*>", re.IGNORECASE)
+# url -> published date (or None) for pages whose <head> was read
+META_DATE_CACHE = {}
+META_DATE_CACHE_LOCK = threading.Lock()
+
+def extract_meta_published_date(html):
+    """Return the published date from a page's META_DATE_PRIORITY meta tags, if any."""
+    soup = BeautifulSoup(html, META_PARSER, parse_only=META_STRAINER)
+    by_property, by_name = {}, {}
+    for meta in soup.find_all("meta"):
+        if meta.get("property"):
+            by_property.setdefault(meta["property"], meta.get("content"))
+        if meta.get("name"):
+            by_name.setdefault(meta["name"], meta.get("content"))
+    for meta_name in META_DATE_PRIORITY:
+        content = by_property[meta_name] if meta_name in by_property else by_name.get(meta_name)
+        if content:
+            published_date = parse_fuzzy_date(content)
+            if published_date:
+                return published_date
+    return None
+
+def fetch_page_head(url, timeout=10, headers=None):
+    """Return the <head> of an HTML page as text, or None if it could not be fetched.
+
+    The body is streamed and reading stops at </head> or after
+    META_HEAD_MAX_BYTES, so the rest of the page is never downloaded.
+    """
+    response = robust_fetch_url(url, timeout=timeout, headers=headers, stream=True)
+    if response is None:
+        return None
+    try:
+        head = bytearray()
+        for chunk in response.iter_content(chunk_size=8192):
+            search_from = max(0, len(head) - 8)
+            head += chunk
+            match = HEAD_END_PATTERN.search(head, search_from)
+            if match:
+                del head[match.end():]
+                break
+            if len(head) >= META_HEAD_MAX_BYTES:
+                del head[META_HEAD_MAX_BYTES:]
+                break
+        count_downloaded(url, len(head))
+        logging.debug(f"Read {len(head)} bytes of <head> from {url}")
+        return head.decode(response.encoding or "utf-8", errors="replace")
+    except requests.exceptions.RequestException as e:
+        logging.debug(f"Failed to read <head> of {url}: {e}")
+        return None
+    finally:
+        response.close()
+
+def fetch_meta_published_date(url, timeout=5, headers=None):
+    """Published date from the meta tags in url's <head>, memoized per URL.
+
+    Failed fetches are not memoized, so a later call can retry them.
+    """
+    if url in META_DATE_CACHE:
+        return META_DATE_CACHE[url]
+    head = fetch_page_head(url, timeout=timeout, headers=headers)
+    if head is None:
+        return None
+    published_date = extract_meta_published_date(head)
+    with META_DATE_CACHE_LOCK:
+        if len(META_DATE_CACHE) >= DATE_CACHE_SIZE:
+            META_DATE_CACHE.clear()
+        META_DATE_CACHE[url] = published_date
+    return published_date
+
+def extract_published_date_from_entry(entry):
+    """Extract published date from entry with robust error handling."""
+    published_date = extract_structured_published_date(entry)
+    if published_date:
+        return published_date
     
     # Try canonical/original link if present
     if 'link' in entry and entry['link']:
         try:
-            response = robust_fetch_url(entry['link'], timeout=5)
-            if response:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                for meta_name in META_DATE_PRIORITY:
-                    meta = soup.find('meta', attrs={'property': meta_name}) or soup.find('meta', attrs={'name': meta_name})
-                    if meta and meta.get('content'):
-                        try:
-                            dt = dateutil.parser.parse(meta['content'], fuzzy=True)
-                            dt = normalize_datetime(dt)
-                            return dt.isoformat()
-                        except Exception:
-                            continue
+            return fetch_meta_published_date(entry['link'])
         except Exception as e:
             logging.debug(f"Failed to fetch canonical/original link for date extraction: {e}")
     
     return None
 
+def extract_published_dates_from_entries(entries):
+    """Batch version of extract_published_date_from_entry.
+
+    Returns a list of dates in entry order. The <head> of each linked page
+    for entries without date fields is fetched concurrently with fetch_urls.
+    """
+    dates = [extract_structured_published_date(entry) for entry in entries]
+    links = {entry['link'] for entry, published_date in zip(entries, dates)
+             if not published_date and entry.get('link')}
+    link_dates = {}
+    try:
+        for link, published_date in fetch_urls(list(links), fetch_func=fetch_meta_published_date, timeout=5):
+            link_dates[link] = published_date
+    except Exception as e:
+        logging.debug(f"Failed to extract dates from canonical/original links: {e}")
+    return [published_date or link_dates.get(entry.get('link'))
+            for entry, published_date in zip(entries, dates)]
+
 def extract_published_date_from_pdf_title(title):
     """Wrapper function for PDF date extraction to maintain compatibility."""
     return extract_pdf_publish_date(title)
 
-def fetch_reddit_posts():
-    """Fetch Reddit posts with robust error handling."""
+class RequestBudget:
+    """Thread-safe token bucket shared by every caller of one API.
+
+    acquire() blocks until a request may be sent, so concurrent workers
+    together never exceed requests_per_minute (after an initial burst).
+    """
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.interval = 60.0 / requests_per_minute
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Reserve a slot under the lock, then wait for it outside, so waiting
+        # threads are served in order instead of racing for each new token
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens * self.interval if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+class SharedRequestBudget:
+    """RequestBudget for requests from several processes or hosts.
+
+    The processes count their requests in one document per calendar minute
+    in SCRAPE_STATE_COLLECTION (removed by a TTL index), and acquire() waits
+    for the next minute once requests_per_minute are used. If MongoDB
+    cannot be reached, requests fall back to a local bucket at the rate
+    divided by fallback_share.
+    """
+
+    def __init__(self, name, requests_per_minute, fallback_share=1):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.fallback = RequestBudget(requests_per_minute / max(1, fallback_share))
+
+    def acquire(self):
+        while True:
+            minute = int(time.time() // 60)
+            try:
+                counter = get_collection(SCRAPE_STATE_COLLECTION).find_one_and_update(
+                    {"_id": f"budget:{self.name}:{minute}"},
+                    {"$inc": {"requests": 1},
+                     "$setOnInsert": {"expires_at": datetime.fromtimestamp((minute + 2) * 60, timezone.utc)}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except Exception as e:
+                logging.warning(f"Could not use the shared {self.name} request budget: {e}")
+                self.fallback.acquire()
+                return
+            if counter["requests"] <= self.requests_per_minute:
+                return
+            time.sleep(max(0.0, (minute + 1) * 60 - time.time()) + random.uniform(0, 1))
+
+# Reddit allows 100 OAuth requests per minute per client id across all threads,
+# averaged over 10 minutes, so a minute's worth of requests may go out at once.
+# Queue workers replace it with a SharedRequestBudget (see run_queue_worker).
+REDDIT_BUDGET = RequestBudget(REDDIT_REQUESTS_PER_MINUTE, burst=REDDIT_REQUESTS_PER_MINUTE)
+
+class BudgetedRequestor(prawcore.Requestor):
+    """prawcore requestor that draws every HTTP request from REDDIT_BUDGET.
+
+    Also records the budget wait, API latency and response statuses in METRICS.
+    """
+
+    def request(self, *args, **kwargs):
+        started = time.perf_counter()
+        REDDIT_BUDGET.acquire()
+        METRICS.inc("reddit_budget_wait_seconds_total", time.perf_counter() - started)
+        try:
+            with METRICS.timer("reddit_api_seconds"):
+                response = super().request(*args, **kwargs)
+        except Exception as e:
+            METRICS.inc("reddit_api_errors_total", error=type(e).__name__)
+            raise
+        METRICS.inc("reddit_api_responses_total", status=str(response.status_code))
+        return response
+
+def get_reddit():
+    """Return a praw.Reddit client for the current thread.
+
+    PRAW is not thread safe, so each worker thread gets its own instance.
+    """
+    if not hasattr(get_reddit, "local"):
+        get_reddit.local = threading.local()
+    if not hasattr(get_reddit.local, "reddit"):
+        if REPLAY_DIR:
+            get_reddit.local.reddit = ReplayReddit(REPLAY_DIR)
+        else:
+            reddit = praw.Reddit(
+                client_id=REDDIT_CLIENT_ID,
+                client_secret=REDDIT_CLIENT_SECRET,
+                user_agent=REDDIT_USER_AGENT,
+                requestor_class=BudgetedRequestor
+            )
+            get_reddit.local.reddit = RecordingReddit(reddit, RECORD_DIR) if RECORD_DIR else reddit
+    return get_reddit.local.reddit
+
+def load_reddit_checkpoints():
+    """Load the per-subreddit high-water marks left by previous runs.
+
+    Returns {subreddit_name: checkpoint_doc}; an unreachable state collection
+    just means a full scan this run.
+    """
+    try:
+        collection = get_collection(SCRAPE_STATE_COLLECTION)
+        return {doc["subreddit"]: doc for doc in collection.find({"source": "reddit"})}
+    except Exception as e:
+        logging.warning(f"Could not load Reddit checkpoints, scanning without them: {e}")
+        return {}
+
+def keywords_fingerprint(keywords):
+    return hashlib.sha256("\n".join(sorted(keywords)).encode("utf-8")).hexdigest()
+
+def load_rejected_links(source_name, links, keywords):
+    """{link: content_hash} for links a previous run rejected under the same keywords.
+
+    A failed lookup returns {}, so the links are fetched again.
+    """
+    if not links:
+        return {}
     try:
-        reddit = praw.Reddit(
-            client_id=REDDIT_CLIENT_ID,
-            client_secret=REDDIT_CLIENT_SECRET,
-            user_agent=REDDIT_USER_AGENT
+        cursor = get_collection(SCRAPE_STATE_COLLECTION).find(
+            {"_id": {"$in": [f"{source_name}:rejected:{link}" for link in links]},
+             "keywords": keywords_fingerprint(keywords)},
+            {"link": 1, "content_hash": 1}
         )
-        
-        articles = []
-        total_processed = 0
-        
-        logging.info(f"Fetching Reddit posts from {len(SUBREDDITS)} subreddits")
-        
-        for subreddit_name in SUBREDDITS:
+        return {doc["link"]: doc.get("content_hash") for doc in cursor}
+    except Exception as e:
+        logging.warning(f"Could not load rejected {source_name} links: {e}")
+        return {}
+
+def save_rejected_links(source_name, rejected, keywords):
+    """Record {link: content_hash} of items rejected for lacking keywords in one bulk write."""
+    if not rejected:
+        return
+    fingerprint = keywords_fingerprint(keywords)
+    now_iso = datetime.utcnow().isoformat()
+    operations = [
+        UpdateOne(
+            {"_id": f"{source_name}:rejected:{link}"},
+            {"$set": {"source": f"{source_name}_rejected", "link": link, "content_hash": digest,
+                      "keywords": fingerprint, "updated_at": now_iso}},
+            upsert=True
+        )
+        for link, digest in rejected.items()
+    ]
+    try:
+        get_collection(SCRAPE_STATE_COLLECTION).bulk_write(operations, ordered=False)
+        logging.info(f"Recorded {len(operations)} rejected {source_name} links")
+    except Exception as e:
+        logging.error(f"Failed to record rejected {source_name} links: {e}")
+
+def save_reddit_checkpoints(checkpoints):
+    """Store the newest post seen per subreddit in one bulk write."""
+    if not checkpoints:
+        return
+    operations = [
+        UpdateOne(
+            {"_id": f"reddit:{name}"},
+            {"$set": {
+                "source": "reddit",
+                "subreddit": name,
+                "last_created_utc": checkpoint["last_created_utc"],
+                "last_fullname": checkpoint["last_fullname"],
+                "updated_at": datetime.utcnow().isoformat()
+            }},
+            upsert=True
+        )
+        for name, checkpoint in checkpoints.items()
+    ]
+    try:
+        get_collection(SCRAPE_STATE_COLLECTION).bulk_write(operations, ordered=False)
+        logging.info(f"Updated Reddit checkpoints for {len(operations)} subreddits")
+    except Exception as e:
+        logging.error(f"Failed to save Reddit checkpoints: {e}")
+
+def reddit_time_filter(days):
+    """Smallest Reddit search time_filter that covers the last `days` days."""
+    for name, limit in (("day", 1), ("week", 7), ("month", 31), ("year", 365)):
+        if days <= limit:
+            return name
+    return "all"
+
+def reddit_search_queries(keywords, max_chars=None):
+    """OR-combine keywords into as few Reddit search queries as fit max_chars each.
+
+    Reddit search ignores case, so keywords differing only in case are sent
+    once, and a phrase containing a shorter keyword is left out because
+    that keyword's results already include it. Phrases are quoted so their
+    words must appear together. Tags are still matched locally.
+    """
+    max_chars = max_chars or REDDIT_SEARCH_QUERY_CHARS
+    kept = []
+    for key in sorted({keyword.lower() for keyword in keywords}, key=len):
+        if not any(f" {shorter} " in f" {key} " for shorter in kept):
+            kept.append(key)
+    kept = set(kept)
+    terms = []
+    for keyword in keywords:
+        key = keyword.lower()
+        if key in kept:
+            kept.discard(key)
+            terms.append(f'"{keyword}"' if " " in keyword else keyword)
+    queries = []
+    current = ""
+    for term in terms:
+        candidate = f"{current} OR {term}" if current else term
+        if current and len(candidate) > max_chars:
+            queries.append(current)
+            candidate = term
+        current = candidate
+    if current:
+        queries.append(current)
+    return queries
+
+@register_source
+class RedditSource(Source):
+    """New posts from SUBREDDITS that mention Ontario and match REDDIT_KEYWORDS.
+
+    Subreddits are read by up to `workers` threads (REDDIT_FETCH_WORKERS by
+    default). With REDDIT_INCREMENTAL each subreddit is only read back to
+    the newest post seen by the last run. Checkpoints advance once every
+    article has been saved.
+
+    REDDIT_DISCOVERY picks how posts are found: "new" reads each
+    subreddit's /new listing, "search" runs the keywords as a few OR queries
+    over all subreddits at once (see reddit_search_queries), and "both"
+    merges the two, dropping posts seen twice. queries replaces the search
+    queries built from the keywords.
+
+    With REDDIT_SCAN_COMMENTS, posts that mention Ontario but match no
+    keyword also have their comments scanned (see comment_match) on
+    REDDIT_COMMENT_WORKERS threads. They are yielded once their scan finishes.
+    """
+
+    name = "reddit"
+    keywords = REDDIT_KEYWORDS
+    require_location = True
+    recent_only = True
+    server_timestamps = True
+
+    def __init__(self, workers=None, subreddits=None, scan_comments=None, discovery=None, queries=None):
+        self.workers = workers or REDDIT_FETCH_WORKERS
+        self.subreddits = subreddits or SUBREDDITS
+        self.discovery = discovery or REDDIT_DISCOVERY
+        if self.discovery not in ("new", "search", "both"):
+            logging.warning(f"Unknown REDDIT_DISCOVERY {self.discovery!r}; using new")
+            self.discovery = "new"
+        self.queries = queries
+        self.scan_comments = REDDIT_SCAN_COMMENTS if scan_comments is None else scan_comments
+        self.new_checkpoints = {}
+        self.failed_subreddits = []
+        self.failed_queries = []
+        self.comment_executor = None
+        self.comment_calls_left = REDDIT_COMMENT_RUN_CALLS
+        self.comment_lock = threading.Lock()
+
+    def items(self, ctx):
+        logging.info(f"Fetching Reddit posts from {len(self.subreddits)} subreddits with {self.workers} worker(s), "
+                     f"discovery: {self.discovery}")
+        generators = []
+        if self.discovery in ("new", "both"):
+            checkpoints = load_reddit_checkpoints() if REDDIT_INCREMENTAL else {}
+            generators += [self.subreddit_items(name, checkpoints.get(name), ctx) for name in self.subreddits]
+        if self.discovery in ("search", "both"):
+            queries = reddit_search_queries(self.keywords) if self.queries is None else self.queries
+            generators += [self.search_items(query, ctx) for query in queries]
+        if not self.scan_comments:
+            yield from self.unique_items(merge_generators(generators, self.workers))
+            return
+        with ThreadPoolExecutor(max_workers=REDDIT_COMMENT_WORKERS, thread_name_prefix="comments") as executor:
+            self.comment_executor = executor
+            yield from self.unique_items(merge_generators(generators, self.workers))
+        logging.info(f"Comment scanning used {REDDIT_COMMENT_RUN_CALLS - self.comment_calls_left} "
+                     f"of {REDDIT_COMMENT_RUN_CALLS} API calls")
+
+    def unique_items(self, items):
+        """Drop posts already yielded by another listing or search query."""
+        seen = set()
+        for item in items:
+            if item["link"] in seen:
+                count_discarded(self.name, "seen_in_other_listing")
+                continue
+            seen.add(item["link"])
+            yield item
+
+    def wants_comment_scan(self, item, num_comments):
+        """True for posts that pass the location filter but match no keyword on their own."""
+        if not self.scan_comments or not num_comments:
+            return False
+        found = TERM_MATCHER.scan(item["text"])
+        return is_relevant_location(item["text"], found) and not get_matched_keywords(item["text"], self.keywords, found=found)
+
+    def take_comment_call(self):
+        with self.comment_lock:
+            if self.comment_calls_left <= 0:
+                return False
+            self.comment_calls_left -= 1
+            return True
+
+    def comment_match(self, fullname):
+        """Body of the first comment on a post that matches keywords, or None.
+
+        The comment tree is walked breadth first to REDDIT_COMMENT_MAX_DEPTH
+        levels. "More comments" stubs are only expanded (one batched
+        /api/morechildren call each) while the post has some of its
+        REDDIT_COMMENT_MAX_CALLS API calls left, and the run some of
+        REDDIT_COMMENT_RUN_CALLS. The walk stops at the first match.
+        Results are recorded and replayed like listings.
+        """
+        if REPLAY_DIR:
             try:
-                logging.debug(f"Processing subreddit: r/{subreddit_name}")
-                sub = reddit.subreddit(subreddit_name)
-                subreddit_count = 0
-                
-                for post in sub.new(limit=50):
-                    total_processed += 1
-                    try:
-                        # Check if post has required fields
-                        if not hasattr(post, 'title') or not post.title:
-                            continue
-                        if not hasattr(post, 'permalink') or not post.permalink:
-                            continue
-                        if not hasattr(post, 'created_utc') or not post.created_utc:
-                            continue
-                        
-                        # Extract and validate date
-                        published_date = None
-                        try:
-                            published_date = datetime.utcfromtimestamp(post.created_utc).replace(tzinfo=timezone.utc).isoformat()
-                        except Exception as e:
-                            logging.debug(f"Failed to parse Reddit post date: {e}")
-                            continue
-                        
-                        # Restrict to articles published between March 6, 2025 and today
-                        start_date = datetime(2025, 3, 6, tzinfo=timezone.utc)
-                        end_date = datetime.utcnow().replace(tzinfo=timezone.utc)
-                        try:
-                            pub_dt = datetime.fromisoformat(published_date)
-                            pub_dt = normalize_datetime(pub_dt)
-                        except Exception:
-                            continue
-                        if not (start_date <= pub_dt <= end_date):
-                            continue
-                        
-                        # Check if published date is within 30 days of run date
-                        if not is_within_date_range(published_date):
-                            logging.debug(f"Discarding Reddit post (published more than 30 days ago): {post.title[:50]}...")
-                            continue
-                        
-                        # Check relevance and keywords
-                        text = f"{post.title} {getattr(post, 'selftext', '')}"
-                        
-                        if not is_relevant_location(text):
-                            continue
-                        
-                        matched_keywords = get_matched_keywords(text, REDDIT_KEYWORDS)
-                        if not matched_keywords:
-                            logging.debug(f"Discarding Reddit post (no tags): {post.title[:50]}...")
-                            continue
-                        
-                        articles.append({
-                            "title": post.title,
-                            "link": f"https://reddit.com{post.permalink}",
-                            "published_date": published_date,
-                            "scraped_date": datetime.utcnow().isoformat(),
-                            "tags": matched_keywords,
-                            "source": "reddit",
-                            "subreddit": subreddit_name,
-                            "upvotes": getattr(post, 'score', None),
-                            "comments": getattr(post, 'num_comments', None),
-                            "content": getattr(post, 'selftext', None) or None
-                        })
-                        subreddit_count += 1
-                        
-                    except Exception as e:
-                        logging.warning(f"Error processing Reddit post in r/{subreddit_name}: {e}")
+                with open(fixture_path(REPLAY_DIR, "comments", fullname), encoding="utf-8") as f:
+                    return json.load(f)
+            except OSError:
+                return None
+
+        started = time.perf_counter()
+        match = None
+        calls = 0
+        try:
+            if self.take_comment_call():
+                calls += 1
+                submission = get_reddit().submission(id=fullname.split("_", 1)[-1])
+                pending = collections.deque((comment, 0) for comment in submission.comments)
+                while pending:
+                    comment, depth = pending.popleft()
+                    if isinstance(comment, praw.models.MoreComments):
+                        if calls < REDDIT_COMMENT_MAX_CALLS and self.take_comment_call():
+                            calls += 1
+                            pending.extend((child, depth) for child in comment.comments())
                         continue
-                
-                logging.debug(f"Found {subreddit_count} relevant posts in r/{subreddit_name}")
+                    body = getattr(comment, "body", None) or ""
+                    if get_matched_keywords(body, self.keywords, max_tags=1):
+                        match = body
+                        break
+                    if depth + 1 < REDDIT_COMMENT_MAX_DEPTH:
+                        pending.extend((reply, depth + 1) for reply in comment.replies)
+        except Exception as e:
+            logging.warning(f"Error scanning comments of {fullname}: {e}")
+        METRICS.observe("reddit_comment_scan_seconds", time.perf_counter() - started)
+        METRICS.inc("reddit_comment_calls_total", calls)
+        METRICS.inc("reddit_comment_scans_total", result="matched" if match else "no_match")
+        if RECORD_DIR:
+            write_fixture(fixture_path(RECORD_DIR, "comments", fullname), json.dumps(match).encode("utf-8"))
+        return match
 
-            except Exception as e:
-                logging.error(f"Error accessing subreddit r/{subreddit_name}: {str(e)}")
-                continue
+    def with_comment_match(self, item, fullname):
+        match = self.comment_match(fullname)
+        if match:
+            item["text"] = f"{item['text']} {match}"
+        return item
 
-        logging.info(f"Processed {total_processed} Reddit posts, found {len(articles)} relevant articles")
-        count = save_scraped_data("reddit", articles)
-        return count
-        
-    except Exception as e:
-        logging.error(f"Fatal Reddit scraping error: {str(e)}")
-        return 0
+    def subreddit_items(self, subreddit_name, checkpoint=None, ctx=None):
+        """Yield raw items for the posts of one subreddit that are new since checkpoint.
+
+        /new is paged newest first until the post recorded in checkpoint, a
+        post older than PUBLISHED_MAX_AGE_DAYS, or REDDIT_MAX_POSTS_PER_SUBREDDIT
+        is reached. The new checkpoint is the newest post created by the
+        run's start (posts made during the run are read again next time), and
+        is only recorded if the listing completed. Errors are logged, not
+        raised; the subreddit is added to failed_subreddits.
+        """
+        processed = 0
+        new_checkpoint = None
+        scans = []
+        last_created_utc = checkpoint["last_created_utc"] if checkpoint else None
+        last_fullname = checkpoint.get("last_fullname") if checkpoint else None
+        ctx = ctx or get_run_context()
+        oldest_wanted = ctx.recent_ts
+        try:
+            logging.debug(f"Processing subreddit: r/{subreddit_name}")
+            sub = get_reddit().subreddit(subreddit_name)
+
+            for post in sub.new(limit=REDDIT_MAX_POSTS_PER_SUBREDDIT):
+                created_utc = getattr(post, 'created_utc', None)
+                fullname = getattr(post, 'fullname', None)
+                if created_utc:
+                    if fullname and fullname == last_fullname:
+                        break
+                    if last_created_utc is not None and created_utc < last_created_utc:
+                        break
+                    if created_utc < oldest_wanted:
+                        break
+                    if new_checkpoint is None and created_utc <= ctx.now_ts:
+                        new_checkpoint = {"last_created_utc": created_utc, "last_fullname": fullname}
+
+                processed += 1
+                item = self.post_item(post, subreddit_name)
+                if item is None:
+                    continue
+                if fullname and self.comment_executor and self.wants_comment_scan(item, item["comments"]):
+                    scans.append(self.comment_executor.submit(self.with_comment_match, item, fullname))
+                else:
+                    yield item
+                while scans and scans[0].done():
+                    yield scans.pop(0).result()
+
+            logging.debug(f"Read {processed} new posts in r/{subreddit_name}")
+            if new_checkpoint:
+                self.new_checkpoints[subreddit_name] = new_checkpoint
+
+        except Exception as e:
+            self.failed_subreddits.append(subreddit_name)
+            logging.error(f"Error accessing subreddit r/{subreddit_name}: {str(e)}")
+
+        for scan in scans:
+            yield scan.result()
+
+    def post_item(self, post, subreddit_name):
+        """Raw item for a PRAW post, or None if it lacks a date or permalink."""
+        created_utc = getattr(post, 'created_utc', None)
+        permalink = getattr(post, 'permalink', None)
+        if not created_utc or not permalink:
+            count_discarded(self.name, "missing_fields")
+            return None
+        selftext = getattr(post, 'selftext', None)
+        return {
+            "title": getattr(post, 'title', None),
+            "link": f"https://reddit.com{permalink}",
+            "published_date": float(created_utc),
+            "text": f"{getattr(post, 'title', '')} {selftext or ''}",
+            "subreddit": subreddit_name,
+            "upvotes": getattr(post, 'score', None),
+            "comments": getattr(post, 'num_comments', None),
+            "content": selftext
+        }
+
+    def search_items(self, query, ctx=None):
+        """Yield raw items for the newest posts matching one search query across all subreddits.
+
+        The search runs once over the multireddit r/a+b+c, sorted by new and
+        limited to the smallest Reddit time filter covering
+        PUBLISHED_MAX_AGE_DAYS. It stops at the first older post or after
+        REDDIT_SEARCH_LIMIT results. Errors are logged, not raised; the query
+        is added to failed_queries.
+        """
+        oldest_wanted = (ctx or get_run_context()).recent_ts
+        found = 0
+        try:
+            multireddit = get_reddit().subreddit("+".join(self.subreddits))
+            results = multireddit.search(query, sort="new", time_filter=reddit_time_filter(PUBLISHED_MAX_AGE_DAYS),
+                                         limit=REDDIT_SEARCH_LIMIT)
+            for post in results:
+                created_utc = getattr(post, 'created_utc', None)
+                if created_utc and created_utc < oldest_wanted:
+                    break
+                found += 1
+                item = self.post_item(post, str(getattr(post, 'subreddit', '')) or None)
+                if item is not None:
+                    yield item
+        except Exception as e:
+            self.failed_queries.append(query)
+            logging.error(f"Error searching Reddit for {query[:80]}...: {str(e)}")
+        METRICS.inc("reddit_search_results_total", found)
+        logging.debug(f"Search returned {found} posts for {query[:80]}...")
+
+    def finish(self, writer):
+        if not REDDIT_INCREMENTAL:
+            return
+        if writer.failed:
+            logging.warning("Not advancing Reddit checkpoints because some articles failed to save")
+        else:
+            save_reddit_checkpoints(self.new_checkpoints)
+
+def fetch_reddit_posts(workers=None, dedup=None):
+    """Fetch Reddit posts through the shared pipeline; returns the number stored."""
+    return run_source(RedditSource(workers), dedup)
 
-def fetch_tocondo_pdfs():
-    """Fetch TOCondo PDFs with robust error handling."""
-    articles = []
+def extract_pdf_links(page, base_url):
+    """Absolute URLs of the .pdf links on an HTML page, in page order."""
+    soup = BeautifulSoup(page, META_PARSER, parse_only=SoupStrainer("a", href=True))
+    pdf_links = []
+    for link in soup.find_all("a", href=True):
+        href = link["href"]
+        if href.endswith(".pdf"):
+            pdf_links.append(urljoin(base_url, href))
+    return pdf_links
+
+def page_pdf_links(page, base_url):
+    """extract_pdf_links, cached in HTTP_CACHE_DIR by a hash of the page text.
+
+    An unchanged home page (including one served from the HTTP cache after
+    a 304) is then never parsed again.
+    """
+    if not HTTP_CACHE_DIR:
+        return extract_pdf_links(page, base_url)
+    path = os.path.join(HTTP_CACHE_DIR, f"links-{hashlib.sha256(page.encode('utf-8')).hexdigest()}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            links = json.load(f)
+        os.utime(path)
+        METRICS.inc("link_list_cache_total", result="hit")
+        return links
+    except (OSError, ValueError):
+        pass
+    METRICS.inc("link_list_cache_total", result="miss")
+    links = extract_pdf_links(page, base_url)
     try:
-        logging.info("Fetching TOCondo PDFs from https://tocondonews.com/")
-        response = robust_fetch_url("https://tocondonews.com/", timeout=15)
-        if not response:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(links, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logging.warning(f"Failed to cache link list for {base_url}: {e}")
+    return links
+
+def stored_content_hashes(links):
+    """{link: content_hash} for the links already in RAW_COLLECTION.
+
+    One query on the unique link index. If it fails, nothing counts as
+    stored, so the links are fetched as before.
+    """
+    if not links:
+        return {}
+    ensure_raw_indexes()
+    try:
+        cursor = get_collection(RAW_COLLECTION).find(
+            {"link": {"$in": list(links)}}, {"_id": 0, "link": 1, "content_hash": 1}
+        )
+        return {doc["link"]: doc.get("content_hash") for doc in cursor}
+    except Exception as e:
+        logging.error(f"Could not look up stored links in {RAW_COLLECTION}: {e}")
+        return {}
+
+@register_source
+class TOCondoSource(Source):
+    """TOCondo News PDFs linked from the home page that match TOCONDO_KEYWORDS.
+
+    The publish date comes from the PDF file name, so PDFs outside the date
+    window are never downloaded, and neither are links already in
+    RAW_COLLECTION or rejected by an earlier run for matching no keywords
+    (recorded in SCRAPE_STATE_COLLECTION). With TOCONDO_RECHECK_STORED those
+    are revalidated instead, and only yielded if their text's content_hash
+    changed; changed stored articles are flagged for reprocessing. The
+    rest go through pipeline_pdf_texts and are yielded as soon as their
+    text is extracted.
+
+    links replaces the home page's link list (a work queue unit passes its
+    share), and parse_workers overrides TOCONDO_PARSE_WORKERS. PDFs that
+    fail to download or parse are collected in failed_links.
+    """
+
+    name = "tocondo"
+    keywords = TOCONDO_KEYWORDS
+    base_url = "https://tocondonews.com/"
+
+    def __init__(self, links=None, parse_workers=None):
+        self.links = links
+        self.parse_workers = parse_workers or TOCONDO_PARSE_WORKERS
+        self.failed_links = []
+        self.rejected_links = {}
+
+    def discover_links(self):
+        """PDF links on the home page, or None if it could not be fetched."""
+        logging.info(f"Fetching TOCondo PDFs from {self.base_url}")
+        page = fetch_cached_page(self.base_url, timeout=15)
+        if not page:
             logging.error("Failed to fetch TOCondo main page")
-            return 0
-            
-        soup = BeautifulSoup(response.text, "html.parser")
-        pdf_links = []
-        
-        # Find all PDF links
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            if href.endswith(".pdf"):
-                # Handle relative URLs
-                if href.startswith("http"):
-                    pdf_links.append(href)
-                else:
-                    pdf_links.append(f"https://tocondonews.com{href}" if href.startswith("/") else f"https://tocondonews.com/{href}")
-        
+            return None
+        pdf_links = page_pdf_links(page, self.base_url)
         logging.info(f"Found {len(pdf_links)} PDF links")
+        return pdf_links
 
+    def candidates(self, pdf_links, ctx):
+        """{link: (title, published_date)} for the links whose file name dates fall in the window."""
+        candidates = {}
         for link in pdf_links:
-            try:
-                title = link.split("/")[-1]
-                logging.debug(f"Processing PDF: {title}")
-                
-                # Extract date first to avoid processing PDFs without valid dates
-                published_date = extract_pdf_publish_date(title)
-                if not published_date:
-                    logging.debug(f"Discarding TOCondo PDF (no valid date): {title}")
-                    continue
-                
-                # Restrict to articles published between March 6, 2025 and today
-                start_date = datetime(2025, 3, 6, tzinfo=timezone.utc)
-                end_date = datetime.utcnow().replace(tzinfo=timezone.utc)
-                try:
-                    pub_dt = datetime.fromisoformat(published_date)
-                    pub_dt = normalize_datetime(pub_dt)
-                except Exception:
-                    continue
-                if not (start_date <= pub_dt <= end_date):
-                    logging.debug(f"Discarding TOCondo PDF (outside date range): {title}")
-                    continue
-                
-                content = process_pdf(link)
-                if not content.strip():
-                    logging.warning(f"Skipping blank PDF: {link}")
-                    continue
-                
-                # Check keyword matching
-                search_text = f"{title} {content}"
-                matched_keywords = get_matched_keywords(search_text, TOCONDO_KEYWORDS)
-                if not matched_keywords:
-                    logging.debug(f"Discarding TOCondo PDF (no tags): {title}")
-                    continue
-                
-                published_date = safe_get_published_date(published_date)
-                if not published_date:
+            title = link.split("/")[-1]
+
+            # Extract date first to avoid downloading PDFs without valid dates
+            published_date = extract_pdf_publish_date(title)
+            if not published_date:
+                count_discarded(self.name, "no_pdf_date")
+                logging.debug(f"Discarding TOCondo PDF (no valid date): {title}")
+                continue
+            if not date_accepted(self, published_date, ctx):
+                count_discarded(self.name, "outside_date_range")
+                logging.debug(f"Discarding TOCondo PDF (outside date range): {title}")
+                continue
+
+            candidates[link] = (title, published_date)
+        return candidates
+
+    def items(self, ctx):
+        pdf_links = self.discover_links() if self.links is None else self.links
+        if pdf_links is None:
+            return
+        candidates = self.candidates(pdf_links, ctx)
+
+        stored = stored_content_hashes(candidates)
+        rejected = load_rejected_links(self.name, [link for link in candidates if link not in stored], self.keywords)
+        if TOCONDO_RECHECK_STORED:
+            to_fetch = list(candidates)
+        else:
+            to_fetch = [link for link in candidates if link not in stored and link not in rejected]
+            count_discarded(self.name, "already_stored", len(stored))
+            count_discarded(self.name, "already_rejected", len(rejected))
+        logging.info(f"{len(candidates)} TOCondo PDFs in the date window, {len(stored)} already stored, "
+                     f"{len(rejected)} already rejected, {len(to_fetch)} to fetch")
+        if not to_fetch:
+            return
+
+        stats = {"pdfs": 0, "cached": 0, "pages": 0, "bytes": 0, "download_s": 0.0, "parse_s": 0.0,
+                 "failed": self.failed_links}
+        started = time.perf_counter()
+        for link, content in pipeline_pdf_texts(to_fetch, stats, self.parse_workers):
+            title, published_date = candidates[link]
+            if not content.strip():
+                count_discarded(self.name, "blank_pdf")
+                logging.warning(f"Skipping blank PDF: {link}")
+                continue
+            digest = content_hash(content)
+            if stored.get(link, rejected.get(link)) == digest:
+                count_discarded(self.name, "unchanged")
+                continue
+            yield {
+                "title": title,
+                "link": link,
+                "published_date": published_date,
+                "text": f"{title} {content}",
+                "content": content,
+                "reprocess": link in stored
+            }
+
+        logging.info(
+            f"TOCondo pipeline: {stats['pdfs']} PDFs ({stats['cached']} unchanged since cached, "
+            f"{stats['bytes'] / 1e6:.1f} MB downloaded) in "
+            f"{time.perf_counter() - started:.2f}s | download {stats['download_s']:.2f}s wall | "
+            f"parse {stats['pages']} pages in {stats['parse_s']:.2f}s summed over {self.parse_workers} worker(s)"
+        )
+
+    def rejected(self, item):
+        self.rejected_links[item["link"]] = content_hash(item.get("content"))
+
+    def finish(self, writer):
+        save_rejected_links(self.name, self.rejected_links, self.keywords)
+
+def fetch_tocondo_pdfs(dedup=None):
+    """Fetch TOCondo PDFs through the shared pipeline; returns the number stored."""
+    return run_source(TOCondoSource(), dedup)
+
+def get_process_context():
+    """Multiprocessing context for this module's worker processes.
+
+    Workers come from a forkserver (spawn where unavailable) rather than a
+    fork of this process, because other threads may be holding locks at
+    the moment of the fork. The server imports this module once, and each
+    worker is forked from it.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Import this module once in the server instead of once per worker
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def get_parse_executor(workers=None):
+    """Process pool of `workers` (TOCONDO_PARSE_WORKERS) for PDF parsing, or a single thread for 1.
+
+    Workers come from get_process_context.
+    """
+    workers = workers or TOCONDO_PARSE_WORKERS
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+
+def pipeline_pdf_texts(links, stats, parse_workers=None):
+    """Download and parse PDFs in two overlapping stages.
+
+    Downloads run on the fetch_urls thread pool; each finished download is
+    handed to a pool of parse_workers (TOCONDO_PARSE_WORKERS) processes for
+    text extraction. Yields (link, content) as soon as each PDF is parsed and
+    fills stats with PDF/page/byte counts, download wall time and summed
+    parse time. Links that fail are appended to stats["failed"] if present.
+
+    PDFs with cached text are requested conditionally; a 304 reuses the
+    cached text without downloading or parsing the PDF again.
+
+    If the caller stops iterating early, downloads not yet started and
+    parses not yet started are cancelled, and every spooled PDF that was
+    not handed back is removed as its download or parse finishes.
+    """
+    cached = {link: http_cache_get(link) for link in links}
+    cached = {link: entry for link, entry in cached.items() if entry and entry.get("text") is not None}
+    done = queue.Queue()
+    parse_executor = get_parse_executor(parse_workers)
+    failed = stats.get("failed", [])
+    stop = threading.Event()
+    # Held while handing a result to `done` or submitting a parse, so once
+    # stop is set under it nothing more reaches the consumer or the pool
+    handoff = threading.RLock()
+
+    def hand_off(link, future, response, path):
+        with handoff:
+            if not stop.is_set():
+                done.put((link, future, response, path))
+                return
+        if path:
+            remove_spooled_pdf(path)
+
+    def download(url, **kwargs):
+        if stop.is_set():
+            return None
+        result = download_pdf(url, **kwargs)
+        if result and result[1] and stop.is_set():
+            remove_spooled_pdf(result[1])
+            return None
+        return result
+
+    def download_stage():
+        submitted = 0
+        started = time.perf_counter()
+        try:
+            headers = {link: conditional_headers(entry) for link, entry in cached.items()}
+            for link, result in fetch_urls(links, timeout=15, headers=headers, fetch_func=download):
+                if stop.is_set():
+                    if result and result[1]:
+                        remove_spooled_pdf(result[1])
+                    break
+                if not result:
+                    failed.append(link)
+                    count_discarded("tocondo", "pdf_fetch_failed")
+                    logging.warning(f"Failed to fetch PDF: {link}")
                     continue
-                    
-                articles.append({
-                    "title": title,
-                    "link": link,
-                    "published_date": published_date,
-                    "scraped_date": datetime.utcnow().isoformat(),
-                    "tags": matched_keywords,
-                    "source": "tocondo",
-                    "subreddit": None,
-                    "upvotes": None,
-                    "comments": None,
-                    "content": content or None
-                })
+                response, path = result
+                if path is None:
+                    count_http_cache("hits")
+                    stats["cached"] += 1
+                    future = Future()
+                    future.set_result((cached[link]["text"], {"cached": True}))
+                    hand_off(link, future, None, None)
+                else:
+                    count_http_cache("misses")
+                    stats["bytes"] += os.path.getsize(path)
+                    with handoff:
+                        if stop.is_set():
+                            remove_spooled_pdf(path)
+                            break
+                        future = parse_executor.submit(parse_pdf, link, path)
+                        future.add_done_callback(
+                            lambda f, link=link, response=response, path=path: hand_off(link, f, response, path)
+                        )
+                submitted += 1
+        except Exception as e:
+            logging.error(f"PDF download stage failed: {e}")
+        finally:
+            stats["download_s"] = time.perf_counter() - started
+            hand_off(None, submitted, None, None)
 
+    downloader = threading.Thread(target=download_stage, daemon=True)
+    try:
+        downloader.start()
+        total = None
+        received = 0
+        while total is None or received < total:
+            link, item, response, path = done.get()
+            if link is None:
+                total = item
+                continue
+            received += 1
+            try:
+                content, metrics = item.result()
             except Exception as e:
-                logging.warning(f"Error processing PDF {link}: {e}")
+                failed.append(link)
+                count_discarded("tocondo", "pdf_parse_failed")
+                logging.warning(f"PDF processing failed for {link}: {e}")
+                continue
+            finally:
+                if path:
+                    remove_spooled_pdf(path)
+            if response is not None:
+                http_cache_put(link, response, text=content)
+                log_pdf_metrics(link, metrics)
+                observe_pdf_metrics(metrics)
+                stats["parse_s"] += metrics["seconds"]
+                stats["pages"] += metrics["pages"]
+            stats["pdfs"] += 1
+            yield link, content
+        downloader.join()
+    finally:
+        with handoff:
+            stop.set()
+        # Results handed off but never read; later ones are removed by hand_off
+        while not done.empty():
+            link, item, response, path = done.get()
+            if path:
+                remove_spooled_pdf(path)
+        parse_executor.shutdown(wait=False, cancel_futures=True)
 
-        count = save_scraped_data("tocondo", articles)
-        return count
-    except Exception as e:
-        logging.error(f"TOCondo scraping failed: {str(e)}")
-        return 0
+def download_pdf(url, headers=None, timeout=15):
+    """Stream a PDF into a temporary file without holding it in memory.
 
-def process_pdf(link):
-    """Process PDF with robust error handling and memory-efficient streaming."""
+    The download is rejected if Content-Length or the bytes received exceed
+    PDF_MAX_BYTES, or if the first KB has no %PDF signature. Returns
+    (response, path) with the spooled file path (the caller deletes it),
+    (response, None) for a 304, or None on failure or rejection.
+    """
+    response = robust_fetch_url(url, timeout=timeout, headers=headers, stream=True)
+    if response is None:
+        return None
+    with response:
+        if response.status_code == 304:
+            return response, None
+
+        length = response.headers.get("Content-Length", "")
+        if PDF_MAX_BYTES and length.isdigit() and int(length) > PDF_MAX_BYTES:
+            logging.warning(f"Skipping PDF over {PDF_MAX_BYTES} bytes (Content-Length {length}): {url}")
+            return None
+
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=PDF_SPOOL_DIR)
+        size = 0
+        head = b""
+        try:
+            with os.fdopen(fd, "wb") as pdf_file:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if len(head) < 1024:
+                        head += chunk[:1024 - len(head)]
+                        if len(head) >= 1024 and b"%PDF" not in head:
+                            break
+                    size += len(chunk)
+                    if PDF_MAX_BYTES and size > PDF_MAX_BYTES:
+                        logging.warning(f"Skipping PDF over {PDF_MAX_BYTES} bytes (streamed): {url}")
+                        remove_spooled_pdf(path)
+                        return None
+                    pdf_file.write(chunk)
+            count_downloaded(url, size)
+            if b"%PDF" not in head:
+                logging.warning(f"Skipping download without a %PDF signature: {url}")
+                remove_spooled_pdf(path)
+                return None
+            return response, path
+        except Exception as e:
+            logging.warning(f"PDF download failed for {url}: {e}")
+            remove_spooled_pdf(path)
+            return None
+
+def remove_spooled_pdf(path):
     try:
-        response = robust_fetch_url(link, timeout=15)
-        if not response:
+        os.remove(path)
+    except OSError:
+        pass
+
+def parse_pdf(link, data):
+    """Extract text from a PDF within the PDF_* extraction budget.
+
+    data is the PDF as bytes or the path of a spooled file, which PyPDF2
+    reads lazily so only the pages needed are loaded.
+
+    Pages are read in order until PDF_MAX_PAGES pages, PDF_MAX_CHARS characters
+    or PDF_MAX_SECONDS seconds are used, or PDF_STOP_AFTER_KEYWORDS TOCondo
+    keywords have matched (0 disables a limit). Limits are checked between
+    pages, so one slow page can still overrun the time limit.
+    Returns (content, metrics); used directly by parse workers.
+    """
+    import PyPDF2
+    started = time.perf_counter()
+    metrics = {"pages": 0, "total_pages": 0, "chars": 0, "seconds": 0.0, "stopped_by": None}
+    parts = []
+    with (io.BytesIO(data) if isinstance(data, bytes) else open(data, "rb")) as pdf_file:
+        try:
+            reader = PyPDF2.PdfReader(pdf_file)
+            metrics["total_pages"] = len(reader.pages)
+            found = set()
+            for page in reader.pages[:PDF_MAX_PAGES or None]:
+                text = page.extract_text()
+                metrics["pages"] += 1
+                if text:
+                    parts.append(text)
+                    metrics["chars"] += len(text)
+                if PDF_MAX_CHARS and metrics["chars"] >= PDF_MAX_CHARS:
+                    metrics["stopped_by"] = "chars"
+                    break
+                if PDF_MAX_SECONDS and time.perf_counter() - started >= PDF_MAX_SECONDS:
+                    metrics["stopped_by"] = "time"
+                    break
+                if PDF_STOP_AFTER_KEYWORDS and text:
+                    found |= TERM_MATCHER.scan(text)
+                    if len(TERM_MATCHER.select(found, TOCONDO_KEYWORDS)) >= PDF_STOP_AFTER_KEYWORDS:
+                        metrics["stopped_by"] = "keywords"
+                        break
+        except Exception as e:
+            logging.warning(f"PDF parsing failed for {link}: {e}")
+            parts = []
+
+    content = "\n".join(parts)
+    if PDF_MAX_CHARS:
+        content = content[:PDF_MAX_CHARS]
+    metrics["seconds"] = time.perf_counter() - started
+    return content, metrics
+
+def log_pdf_metrics(link, metrics):
+    logging.info(
+        f"PDF parse metrics: pages={metrics['pages']}/{metrics['total_pages']} "
+        f"chars={metrics['chars']} seconds={metrics['seconds']:.3f} "
+        f"stopped_by={metrics['stopped_by'] or 'none'} url={link}"
+    )
+
+def observe_pdf_metrics(metrics):
+    METRICS.observe("pdf_parse_seconds", metrics["seconds"])
+    METRICS.inc("pdf_pages_parsed_total", metrics["pages"])
+    if metrics["stopped_by"]:
+        METRICS.inc("pdf_parse_stopped_total", reason=metrics["stopped_by"])
+
+def extract_pdf_text(link, data):
+    """Extract text from a PDF given as bytes or a file path (see parse_pdf for limits)."""
+    content, metrics = parse_pdf(link, data)
+    observe_pdf_metrics(metrics)
+    return content
+
+def process_pdf(link, response=None):
+    """Process PDF with robust error handling and memory-efficient streaming.
+
+    The PDF is streamed to a temporary file by download_pdf. Pass response
+    to parse an already downloaded PDF instead of fetching link.
+    """
+    try:
+        if response is not None:
+            return extract_pdf_text(link, response.content)
+
+        result = download_pdf(link)
+        if not result:
             logging.warning(f"Failed to fetch PDF: {link}")
             return ""
-            
-        with io.BytesIO(response.content) as pdf_file:
-            try:
-                reader = PyPDF2.PdfReader(pdf_file)
-                content = "\n".join(page.extract_text() for page in reader.pages[:3] if page.extract_text())
-                return content
-            except Exception as e:
-                logging.warning(f"PDF parsing failed for {link}: {e}")
-                return ""
+        _, path = result
+        try:
+            return extract_pdf_text(link, path)
+        finally:
+            remove_spooled_pdf(path)
     except Exception as e:
         logging.warning(f"PDF processing failed for {link}: {e}")
         return ""
 
+# Pipes en_core_web_sm needs for lemmas; parser and ner are disabled when enriching
+LEMMA_PIPES = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer")
+
+def ensure_processed_indexes():
+    """Create the indexes used by the enrichment stage (once per process).
+
+    The claim indexes on RAW_COLLECTION are part of RAW_INDEXES.
+    """
+    if getattr(ensure_processed_indexes, "done", False):
+        return
+    ensure_raw_indexes()
+    try:
+        get_collection(PROCESSED_COLLECTION).create_index("link", unique=True, name="link_unique")
+        ensure_processed_indexes.done = True
+    except Exception as e:
+        logging.error(f"Could not create enrichment indexes: {e}")
+
+def claim_pending_articles(limit):
+    """Claim up to limit pending raw articles for enrichment and return them.
+
+    Claimed articles move to processing_status "processing" under a fresh
+    claim_token, so concurrent runs never enrich the same article, and each
+    claim counts one of their enrich_attempts. Claims older than
+    ENRICH_CLAIM_TIMEOUT_SECONDS are treated as abandoned (say the worker
+    crashed on them) and claimed again, unless that was the article's
+    ENRICH_MAX_ATTEMPTS-th attempt, which marks it failed. Articles released
+    after a failure wait until their retry_after.
+    """
+    collection = get_collection(RAW_COLLECTION)
+    now = datetime.utcnow()
+    stale = (now - timedelta(seconds=ENRICH_CLAIM_TIMEOUT_SECONDS)).isoformat()
+    collection.update_many(
+        {"processing_status": "processing", "claimed_at": {"$lt": stale},
+         "enrich_attempts": {"$gte": ENRICH_MAX_ATTEMPTS}},
+        {"$set": {"processing_status": "failed", "processing_error": "claim expired on the last attempt"},
+         "$unset": {"claim_token": "", "claimed_at": ""}}
+    )
+    claimable = {"$or": [
+        {"processing_status": "pending",
+         "$or": [{"retry_after": {"$exists": False}}, {"retry_after": {"$lte": now.isoformat()}}]},
+        {"processing_status": "processing", "claimed_at": {"$lt": stale}}
+    ]}
+    ids = [doc["_id"] for doc in collection.find(claimable, {"_id": 1}).limit(limit)]
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    collection.update_many(
+        {"_id": {"$in": ids}, **claimable},
+        {"$set": {"processing_status": "processing", "claim_token": token, "claimed_at": now.isoformat()},
+         "$inc": {"enrich_attempts": 1}}
+    )
+    return list(collection.find({"claim_token": token}))
+
+def enrichment_text(article):
+    return "\n".join(part for part in (article.get("title"), article.get("content")) if part)
+
+def enrich_documents(articles, n_process=None, batch_size=None):
+    """Lemmatize and score raw articles, returning processed_articles documents.
+
+    Texts go through nlp.pipe with the pipes lemmas do not need disabled,
+    spread over n_process worker processes (NLP_PROCESSES, capped so each
+    worker gets at least one batch of batch_size texts). VADER scores the
+    original text in this process while the workers lemmatize the next batch.
+    """
+    nlp = get_nlp()
+    analyzer = get_sentiment_analyzer()
+    batch_size = batch_size or NLP_PIPE_BATCH_SIZE
+    n_process = max(1, min(n_process or NLP_PROCESSES, len(articles) // batch_size))
+    disable = [name for name in nlp.pipe_names if name not in LEMMA_PIPES]
+    texts = [enrichment_text(article)[:nlp.max_length] for article in articles]
+    processed_at = datetime.utcnow().isoformat()
+
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+    enriched = []
+    for article, text, doc in zip(articles, texts, docs):
+        enriched.append({
+            "raw_id": article.get("_id"),
+            "link": article["link"],
+            "source": article.get("source"),
+            "title": article.get("title"),
+            "published_date": article.get("published_date"),
+            "tags": article.get("tags"),
+            "subreddit": article.get("subreddit"),
+            "canonical_id": article.get("canonical_id") or article["link"],
+            "lemmatized_text": lemmas_from_doc(doc),
+            "sentiment": analyzer.polarity_scores(text),
+            "processed_at": processed_at
+        })
+    return enriched
+
+def save_processed_articles(enriched, token):
+    """Upsert enriched documents into PROCESSED_COLLECTION keyed on link and
+    mark their raw articles processed.
+
+    Only raw articles still held under claim token are marked, so a run
+    whose claim expired cannot overwrite a newer claim's status.
+    """
+    for start in range(0, len(enriched), MONGO_BATCH_SIZE):
+        batch = enriched[start:start + MONGO_BATCH_SIZE]
+        get_collection(PROCESSED_COLLECTION).bulk_write(
+            [UpdateOne({"link": doc["link"]}, {"$set": doc}, upsert=True) for doc in batch],
+            ordered=False
+        )
+        get_collection(RAW_COLLECTION).update_many(
+            {"_id": {"$in": [doc["raw_id"] for doc in batch]}, "claim_token": token},
+            {
+                "$set": {"processing_status": "processed", "processed_at": batch[0]["processed_at"]},
+                "$unset": {"claim_token": "", "claimed_at": "", "processing_error": "", "retry_after": ""}
+            }
+        )
+
+def release_enrichment_claim(articles, token, error, count_attempt=True):
+    """Return claimed articles that failed to enrich to pending.
+
+    Released articles are not claimed again for ENRICH_RETRY_SECONDS.
+    Articles on their ENRICH_MAX_ATTEMPTS-th attempt are marked failed
+    instead. Without count_attempt (the failure was MongoDB's, not the
+    articles'), the attempt their claim counted is given back. Articles no
+    longer held under token are left alone.
+    """
+    collection = get_collection(RAW_COLLECTION)
+    claimed = {"_id": {"$in": [article["_id"] for article in articles]}, "claim_token": token}
+    release = {"$unset": {"claim_token": "", "claimed_at": ""}}
+    error = str(error)[:500]
+    retry_after = (datetime.utcnow() + timedelta(seconds=ENRICH_RETRY_SECONDS)).isoformat()
+    try:
+        if count_attempt:
+            collection.update_many(
+                {**claimed, "enrich_attempts": {"$gte": ENRICH_MAX_ATTEMPTS}},
+                {**release, "$set": {"processing_status": "failed", "processing_error": error}}
+            )
+        else:
+            release["$inc"] = {"enrich_attempts": -1}
+        collection.update_many(
+            claimed,
+            {**release, "$set": {"processing_status": "pending", "processing_error": error, "retry_after": retry_after}}
+        )
+    except Exception as e:
+        # The claims expire after ENRICH_CLAIM_TIMEOUT_SECONDS and are picked up again then
+        logging.error(f"Could not release {len(articles)} failed articles: {e}")
+
+def enrich_one_by_one(articles, token):
+    """Enrich and save articles one at a time after their batch failed, so
+    only the articles that fail themselves are released to retry.
+
+    Returns the number processed. A MongoDB error releases the remaining
+    articles (without counting the attempt) and is raised.
+    """
+    processed = 0
+    for position, article in enumerate(articles):
+        try:
+            save_processed_articles(enrich_documents([article], n_process=1), token)
+            processed += 1
+        except PyMongoError as e:
+            release_enrichment_claim(articles[position:], token, e, count_attempt=False)
+            raise
+        except Exception as e:
+            logging.warning(f"Enrichment failed for {article.get('link')}: {e}")
+            release_enrichment_claim([article], token, e)
+            ENRICH_STATS["failed"] += 1
+    return processed
+
+def enrich_pending_articles(max_docs=None, n_process=None):
+    """Enrich pending raw articles into PROCESSED_COLLECTION, ENRICH_CLAIM_SIZE at a time.
+
+    Returns the number of articles processed; throughput is logged in
+    documents per second and kept in ENRICH_STATS for the run summary.
+    When a batch fails its articles are retried one at a time, and articles
+    that keep failing go back to pending until ENRICH_MAX_ATTEMPTS (see
+    release_enrichment_claim). A MongoDB error releases the batch and ends
+    the run's enrichment. n_process is passed on to enrich_documents.
+    """
+    ensure_processed_indexes()
+    processed = 0
+    while (max_docs is None or processed < max_docs) and not SHUTDOWN.is_set():
+        limit = ENRICH_CLAIM_SIZE if max_docs is None else min(ENRICH_CLAIM_SIZE, max_docs - processed)
+        try:
+            articles = claim_pending_articles(limit)
+        except Exception as e:
+            logging.error(f"Could not claim pending articles: {e}")
+            break
+        if not articles:
+            break
+
+        # Load the models outside the timed section so docs/sec reflects processing only
+        get_nlp()
+        get_sentiment_analyzer()
+        token = articles[0]["claim_token"]
+        started = time.perf_counter()
+        try:
+            save_processed_articles(enrich_documents(articles, n_process=n_process), token)
+            done = len(articles)
+        except PyMongoError as e:
+            logging.error(f"Could not save {len(articles)} enriched articles: {e}")
+            release_enrichment_claim(articles, token, e, count_attempt=False)
+            break
+        except Exception as e:
+            logging.error(f"Enrichment failed for {len(articles)} articles, retrying them one at a time: {e}")
+            try:
+                done = enrich_one_by_one(articles, token)
+            except PyMongoError as e:
+                logging.error(f"Could not save enriched articles: {e}")
+                break
+        elapsed = time.perf_counter() - started
+        METRICS.observe("enrich_batch_seconds", elapsed)
+        processed += done
+        ENRICH_STATS["processed"] += done
+        ENRICH_STATS["seconds"] += elapsed
+        logging.info(f"Enriched {done} articles in {elapsed:.2f}s ({done / max(elapsed, 1e-9):.1f} docs/sec)")
+
+    if processed:
+        logging.info(f"Enrichment complete: {processed} articles at {enrichment_rate():.1f} docs/sec")
+    else:
+        logging.info("No pending articles to enrich.")
+    return processed
+
+def enrichment_rate():
+    return ENRICH_STATS["processed"] / ENRICH_STATS["seconds"] if ENRICH_STATS["seconds"] else 0.0
+
+def selected_sources():
+    """Instances of the registered sources named in SCRAPER_SOURCES (all of them by default)."""
+    names = SCRAPER_SOURCES or list(SOURCES)
+    for name in names:
+        if name not in SOURCES:
+            logging.warning(f"Unknown source in SCRAPER_SOURCES: {name}")
+    return [SOURCES[name]() for name in names if name in SOURCES]
+
 def run_reddit_tocondo_scrapers():
-    reddit_ok = fetch_reddit_posts()
-    tocondo_ok = fetch_tocondo_pdfs()
+    new_run_context()
+    dedup = load_dedup_index() if DEDUP_ENABLED else None
+    results = run_sources(selected_sources(), dedup)
+    evict_http_cache()
+    if ENRICH_AFTER_SCRAPE:
+        enrich_pending_articles()
 
-    total = SCRAPED_COUNT["reddit"] + SCRAPED_COUNT["tocondo"]
-    status = "SUCCESS" if reddit_ok or tocondo_ok else "FAILURE"
+    success = any(results.values())
+    status = "SUCCESS" if success else "FAILURE"
+    report_path = write_metrics_report()
+    report_line = f"Full metrics: {report_path}\n" if report_path else ""
 
     subject = f"[Scraper {status}] Reddit: {SCRAPED_COUNT['reddit']} | TOCondo: {SCRAPED_COUNT['tocondo']}"
+    other_sources = "".join(
+        f"{name} Articles Scraped: {SCRAPED_COUNT.get(name, 0)}\n"
+        for name in results if name not in ("reddit", "tocondo")
+    )
     body = f"""Reddit/TOCondo Scraping Run Completed
 
 Reddit Articles Scraped: {SCRAPED_COUNT['reddit']}
 TOCondo PDFs Scraped: {SCRAPED_COUNT['tocondo']}
+{other_sources}Reddit Writes: {WRITE_STATS['reddit']['inserted']} inserted, {WRITE_STATS['reddit']['updated']} updated, {WRITE_STATS['reddit']['unchanged']} unchanged
+TOCondo Writes: {WRITE_STATS['tocondo']['inserted']} inserted, {WRITE_STATS['tocondo']['updated']} updated, {WRITE_STATS['tocondo']['unchanged']} unchanged
+Near-duplicates: {DEDUP_STATS['duplicates']} of {DEDUP_STATS['checked']} articles ({DEDUP_STATS['comparisons']} comparisons)
+Enrichment: {ENRICH_STATS['processed']} processed, {ENRICH_STATS['failed']} failed ({enrichment_rate():.1f} docs/sec)
+HTTP Cache: {HTTP_CACHE_STATS['hits']} hits, {HTTP_CACHE_STATS['misses']} misses, {HTTP_CACHE_STATS['evictions']} evictions
 
+{metrics_summary()}
+{report_line}
 Overall Status: {status}
 Time: {datetime.utcnow().isoformat()} UTC
 """
     send_email(subject, body)
-    return reddit_ok or tocondo_ok
+    return success
+
+# --- Article queries ---
+
+# Fields the accessors return by default: no article text or processing bookkeeping
+ARTICLE_SUMMARY_FIELDS = {"title": 1, "link": 1, "published_date": 1, "scraped_date": 1, "source": 1,
+                          "subreddit": 1, "tags": 1, "upvotes": 1, "comments": 1}
+
+def month_bounds(month):
+    """(start, end) ISO dates of month "YYYY-MM", comparable with stored published_date strings."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start.date().isoformat(), end.date().isoformat()
+
+def encode_page_token(article):
+    """Opaque token for the (published_date, _id) position after article."""
+    doc_id = article["_id"]
+    position = [article.get("published_date"), str(doc_id), isinstance(doc_id, ObjectId)]
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+def decode_page_token(token):
+    published_date, doc_id, is_object_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    return published_date, ObjectId(doc_id) if is_object_id else doc_id
+
+def articles_page_query(query, after=None):
+    """query narrowed to the articles after the page token `after` in (published_date, _id) descending order."""
+    if not after:
+        return query
+    published_date, doc_id = decode_page_token(after)
+    # Added under $and so query's own fields (and a $text, which must stay top level) are left as they are
+    position = [
+        {"published_date": {"$lte": published_date}},
+        {"$or": [
+            {"published_date": {"$lt": published_date}},
+            {"published_date": published_date, "_id": {"$lt": doc_id}}
+        ]}
+    ]
+    return {**query, "$and": query.get("$and", []) + position}
+
+def find_articles(query, page_size=None, after=None, projection=None):
+    """One page of RAW_COLLECTION articles matching query, newest published first.
+
+    Returns (articles, next_token); pass next_token back as after for the
+    next page. It is None on the last page. Pages are keyset paginated on
+    (published_date, _id), so a deep page costs the same as the first,
+    unlike skip(). projection defaults to ARTICLE_SUMMARY_FIELDS. page_size
+    (QUERY_PAGE_SIZE by default) is capped at QUERY_MAX_PAGE_SIZE.
+    """
+    page_size = max(1, min(page_size or QUERY_PAGE_SIZE, QUERY_MAX_PAGE_SIZE))
+    projection = dict(ARTICLE_SUMMARY_FIELDS if projection is None else projection)
+    if any(projection.values()):
+        projection["published_date"] = 1
+    cursor = get_collection(RAW_COLLECTION).find(articles_page_query(query, after), projection).sort(
+        [("published_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+    ).limit(page_size + 1)
+    with METRICS.timer("query_seconds"):
+        articles = list(cursor)
+    next_token = encode_page_token(articles[page_size - 1]) if len(articles) > page_size else None
+    return articles[:page_size], next_token
+
+def date_range_query(query, since=None, until=None):
+    """query with published_date limited to [since, until) (ISO strings)."""
+    bounds = {}
+    if since:
+        bounds["$gte"] = since
+    if until:
+        bounds["$lt"] = until
+    return {**query, "published_date": bounds} if bounds else query
+
+def articles_by_tag(tag, month=None, page_size=None, after=None, projection=None):
+    """Articles tagged tag, optionally only those published in month "YYYY-MM"; see find_articles."""
+    since, until = month_bounds(month) if month else (None, None)
+    return find_articles(date_range_query({"tags": tag}, since, until), page_size, after, projection)
+
+def articles_by_source(source, since=None, until=None, page_size=None, after=None, projection=None):
+    """Articles from one source published in [since, until); see find_articles."""
+    return find_articles(date_range_query({"source": source}, since, until), page_size, after, projection)
+
+def search_articles(text, source=None, page_size=None, after=None, projection=None):
+    """Articles whose title or content match text (title_content_text index), newest first.
+
+    Words are ORed and stemmed as in MongoDB $text; quote a phrase to require it.
+    """
+    query = {"$text": {"$search": text}}
+    if source:
+        query["source"] = source
+    return find_articles(query, page_size, after, projection)
+
+def pending_articles(page_size=None, after=None, projection=None):
+    """Articles still waiting for enrichment (pending_scraped_date partial index); see find_articles."""
+    return find_articles({"processing_status": "pending"}, page_size, after, projection)
+
+# --- Work queue ---
+
+# Handlers for work unit kinds: func(payload, dedup, ctx) -> stored count, raising if the unit should be retried
+WORK_HANDLERS = {}
+
+def work_handler(kind):
+    """Decorator registering func(payload, dedup, ctx) as the handler for work units of kind."""
+    def register(func):
+        WORK_HANDLERS[kind] = func
+        return func
+    return register
+
+def run_unit_source(source, dedup, ctx):
+    """run_source for a work unit, raising (so the unit is retried) on a fatal error or failed writes."""
+    stored = run_source(source, dedup, ctx)
+    if source.error is not None:
+        raise RuntimeError(f"{source.name} failed: {source.error}")
+    if source.failed_writes:
+        raise RuntimeError(f"{source.failed_writes} {source.name} articles could not be saved")
+    return stored
+
+@work_handler("reddit_subreddit")
+def run_subreddit_unit(payload, dedup=None, ctx=None):
+    source = RedditSource(workers=1, subreddits=[payload["subreddit"]], discovery="new")
+    stored = run_unit_source(source, dedup, ctx)
+    if source.failed_subreddits:
+        raise RuntimeError(f"Could not read r/{payload['subreddit']}")
+    return stored
+
+@work_handler("reddit_search")
+def run_reddit_search_unit(payload, dedup=None, ctx=None):
+    source = RedditSource(workers=1, discovery="search", queries=[payload["query"]])
+    stored = run_unit_source(source, dedup, ctx)
+    if source.failed_queries:
+        raise RuntimeError(f"Reddit search failed for {payload['query'][:80]}")
+    return stored
+
+@work_handler("tocondo_pdfs")
+def run_tocondo_unit(payload, dedup=None, ctx=None):
+    # The queue's processes are the parallelism, so each parses on one thread
+    source = TOCondoSource(links=payload["links"], parse_workers=1)
+    stored = run_unit_source(source, dedup, ctx)
+    if source.failed_links:
+        raise RuntimeError(f"{len(source.failed_links)} of {len(payload['links'])} TOCondo PDFs failed")
+    return stored
+
+@work_handler("source")
+def run_source_unit(payload, dedup=None, ctx=None):
+    return run_unit_source(SOURCES[payload["source"]](), dedup, ctx)
+
+def ensure_work_queue_indexes():
+    """Create the indexes claim_work relies on (once per process)."""
+    if getattr(ensure_work_queue_indexes, "done", False):
+        return
+    try:
+        collection = get_collection(WORK_QUEUE_COLLECTION)
+        collection.create_index([("status", pymongo.ASCENDING), ("enqueued_at", pymongo.ASCENDING)],
+                                name="status_enqueued_at")
+        collection.create_index("batch", name="batch")
+        # Expires SharedRequestBudget counters
+        get_collection(SCRAPE_STATE_COLLECTION).create_index("expires_at", name="expires_at_ttl", expireAfterSeconds=0)
+        ensure_work_queue_indexes.done = True
+    except Exception as e:
+        logging.error(f"Could not create work queue indexes on {WORK_QUEUE_COLLECTION}: {e}")
+
+def enqueue_work(units, batch_id):
+    """Add (kind, key, payload) units to WORK_QUEUE_COLLECTION; returns how many were new.
+
+    A unit's _id is "batch_id:kind:key", so enqueueing a batch again (say
+    after the coordinator crashed half way) never adds a unit twice.
+    """
+    ensure_work_queue_indexes()
+    now = datetime.utcnow().isoformat()
+    operations = [
+        UpdateOne(
+            {"_id": f"{batch_id}:{kind}:{key}"},
+            {"$setOnInsert": {
+                "batch": batch_id,
+                "kind": kind,
+                "payload": payload,
+                "status": "queued",
+                "attempts": 0,
+                "enqueued_at": now,
+                "available_at": now
+            }},
+            upsert=True
+        )
+        for kind, key, payload in units
+    ]
+    if not operations:
+        return 0
+    return get_collection(WORK_QUEUE_COLLECTION).bulk_write(operations, ordered=False).upserted_count
+
+def scrape_work_units(ctx):
+    """(kind, key, payload) units covering one scrape of the selected sources.
+
+    Reddit becomes one unit per subreddit (and per search query, with
+    REDDIT_DISCOVERY search or both), and TOCondo one unit per WORK_PDF_BATCH
+    PDFs in the date window. Other sources run whole, as one unit each.
+    Every payload carries since, the batch's PUBLISHED_MAX_AGE_DAYS cutoff,
+    so a unit run late (or retried) still reads back to the same point. The
+    upper bound is the worker's own clock when it runs the unit.
+    """
+    since = ctx.recent_cutoff.replace(tzinfo=None).isoformat()
+    units = []
+    for name in SCRAPER_SOURCES or list(SOURCES):
+        if name == "reddit":
+            if REDDIT_DISCOVERY != "search":
+                units += [("reddit_subreddit", subreddit, {"subreddit": subreddit, "since": since})
+                          for subreddit in SUBREDDITS]
+            if REDDIT_DISCOVERY in ("search", "both"):
+                units += [("reddit_search", content_hash(query)[:16], {"query": query, "since": since})
+                          for query in reddit_search_queries(REDDIT_KEYWORDS)]
+        elif name == "tocondo":
+            source = TOCondoSource()
+            links = list(source.candidates(source.discover_links() or [], ctx))
+            for start in range(0, len(links), WORK_PDF_BATCH):
+                batch = links[start:start + WORK_PDF_BATCH]
+                units.append(("tocondo_pdfs", content_hash("\n".join(batch))[:16], {"links": batch, "since": since}))
+        elif name in SOURCES:
+            units.append(("source", name, {"source": name, "since": since}))
+        else:
+            logging.warning(f"Unknown source in SCRAPER_SOURCES: {name}")
+    return units
+
+def enqueue_scrape_batch(batch_id=None):
+    """Coordinator: enqueue the units for one scrape run; returns the batch id.
+
+    batch_id defaults to the run's start time. Passing an earlier batch's id
+    re-enqueues only what that batch is missing.
+    """
+    ctx = new_run_context()
+    batch_id = batch_id or ctx.now_iso
+    units = scrape_work_units(ctx)
+    added = enqueue_work(units, batch_id)
+    logging.info(f"Enqueued {added} new of {len(units)} work units for batch {batch_id}")
+    return batch_id
+
+def claim_work(owner):
+    """Lease the oldest claimable unit to owner and return it, or None.
+
+    Claimable means queued and due, or leased with an expired lease (its
+    worker died), and tried fewer than WORK_MAX_ATTEMPTS times. The claim is
+    a single find_one_and_update, so two workers never get the same unit.
+    The returned unit's lease token must accompany every later update.
+    """
+    now = datetime.utcnow()
+    now_iso = now.isoformat()
+    claimable = {
+        "attempts": {"$lt": WORK_MAX_ATTEMPTS},
+        "$or": [
+            {"status": "queued", "available_at": {"$lte": now_iso}},
+            {"status": "leased", "lease_expires": {"$lt": now_iso}}
+        ]
+    }
+    return get_collection(WORK_QUEUE_COLLECTION).find_one_and_update(
+        claimable,
+        {
+            "$set": {
+                "status": "leased",
+                "owner": owner,
+                "lease": uuid.uuid4().hex,
+                "leased_at": now_iso,
+                "lease_expires": (now + timedelta(seconds=WORK_LEASE_SECONDS)).isoformat()
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("enqueued_at", pymongo.ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def update_leased_work(unit, update):
+    """Apply update to unit only while its lease is still ours; returns False if the lease was lost."""
+    result = get_collection(WORK_QUEUE_COLLECTION).update_one(
+        {"_id": unit["_id"], "status": "leased", "lease": unit["lease"]}, update
+    )
+    if not result.matched_count:
+        logging.warning(f"Lost the lease on work unit {unit['_id']}; another worker may redo it")
+        return False
+    return True
+
+def renew_lease_until(unit, stop):
+    """Extend unit's lease every third of WORK_LEASE_SECONDS until stop is set."""
+    while not stop.wait(WORK_LEASE_SECONDS / 3):
+        expires = (datetime.utcnow() + timedelta(seconds=WORK_LEASE_SECONDS)).isoformat()
+        try:
+            if not update_leased_work(unit, {"$set": {"lease_expires": expires}}):
+                return
+        except Exception as e:
+            logging.warning(f"Could not renew the lease on work unit {unit['_id']}: {e}")
+
+def fail_work(unit, error):
+    """Requeue a failed unit with exponential backoff, or mark it failed after WORK_MAX_ATTEMPTS."""
+    fields = {"error": str(error)[:500], "finished_at": datetime.utcnow().isoformat()}
+    if unit["attempts"] >= WORK_MAX_ATTEMPTS:
+        fields["status"] = "failed"
+    else:
+        delay = WORK_RETRY_SECONDS * 2 ** (unit["attempts"] - 1)
+        fields["status"] = "queued"
+        fields["available_at"] = (datetime.utcnow() + timedelta(seconds=delay)).isoformat()
+    update_leased_work(unit, {"$set": fields, "$unset": {"lease": "", "lease_expires": ""}})
+    return fields["status"]
+
+def fail_abandoned_work():
+    """Mark units whose last allowed attempt's lease expired as failed; returns how many."""
+    now_iso = datetime.utcnow().isoformat()
+    result = get_collection(WORK_QUEUE_COLLECTION).update_many(
+        {"status": "leased", "lease_expires": {"$lt": now_iso}, "attempts": {"$gte": WORK_MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "lease expired on the last attempt", "finished_at": now_iso}}
+    )
+    return result.modified_count
+
+def run_work_unit(unit, dedup=None):
+    """Run one claimed unit with its lease kept alive; returns its final status."""
+    kind = unit["kind"]
+    started = time.perf_counter()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=renew_lease_until, args=(unit, stop), name="lease", daemon=True)
+    heartbeat.start()
+    try:
+        handler = WORK_HANDLERS.get(kind)
+        if handler is None:
+            raise ValueError(f"No handler for work unit kind {kind!r}")
+        since = unit["payload"].get("since")
+        ctx = make_run_context(recent_cutoff=datetime.fromisoformat(since) if since else None)
+        stored = handler(unit["payload"], dedup, ctx)
+        if SHUTDOWN.is_set():
+            raise RuntimeError("Stopped early for shutdown")
+        status = "done"
+        update_leased_work(unit, {
+            "$set": {"status": "done", "stored": stored, "finished_at": datetime.utcnow().isoformat()},
+            "$unset": {"lease": "", "lease_expires": "", "error": ""}
+        })
+    except Exception as e:
+        status = fail_work(unit, e)
+        logging.error(f"Work unit {unit['_id']} failed on attempt {unit['attempts']} ({status}): {e}")
+    finally:
+        stop.set()
+        heartbeat.join()
+    METRICS.inc("work_units_total", kind=kind, status=status)
+    METRICS.observe("work_unit_seconds", time.perf_counter() - started, kind=kind)
+    return status
+
+def queued_work_count():
+    return get_collection(WORK_QUEUE_COLLECTION).count_documents({"status": "queued"})
+
+def run_queue_worker(owner=None, idle_exit=True):
+    """Claim and run work units until SHUTDOWN; returns the number completed.
+
+    With idle_exit the worker also stops once no unit is queued, including
+    ones waiting out a retry delay; a unit leased by a worker that died is
+    claimed by the next worker run after its lease expires. Otherwise it
+    polls every WORK_POLL_SECONDS. The near-duplicate index is
+    loaded once per worker, so near-duplicates stored by other workers during
+    the same batch are not detected (exact duplicates still are, by link).
+    Reddit requests draw on a SharedRequestBudget, so all workers of every
+    host together stay within REDDIT_REQUESTS_PER_MINUTE.
+    """
+    global REDDIT_BUDGET
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    ensure_work_queue_indexes()
+    REDDIT_BUDGET = SharedRequestBudget("reddit", REDDIT_REQUESTS_PER_MINUTE, fallback_share=QUEUE_WORKERS)
+    dedup = load_dedup_index() if DEDUP_ENABLED else None
+    completed = 0
+    logging.info(f"Queue worker {owner} started")
+    while not SHUTDOWN.is_set():
+        unit = claim_work(owner)
+        if unit is None:
+            if fail_abandoned_work():
+                logging.warning("Marked work units abandoned on their last attempt as failed")
+            if idle_exit and not queued_work_count():
+                break
+            SHUTDOWN.wait(WORK_POLL_SECONDS)
+            continue
+        if run_work_unit(unit, dedup) == "done":
+            completed += 1
+    evict_http_cache()
+    logging.info(f"Queue worker {owner} finished {completed} work units\n{metrics_summary()}")
+    return completed
+
+def queue_worker_process():
+    """Entry point of a local worker process started by run_queue_workers."""
+    configure_logging()
+    signal.signal(signal.SIGTERM, lambda signum, frame: SHUTDOWN.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: SHUTDOWN.set())
+    run_queue_worker()
+
+def run_queue_workers(workers=None):
+    """Run `workers` (QUEUE_WORKERS) worker processes on this machine until the queue drains.
+
+    Processes come from get_process_context. SIGTERM is passed on to them,
+    and they stop after their current unit. Returns True if every worker
+    exited cleanly.
+    """
+    workers = workers or QUEUE_WORKERS
+    context = get_process_context()
+    processes = [context.Process(target=queue_worker_process, name=f"queue-worker-{i}") for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        SHUTDOWN.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, forward)
+    for process in processes:
+        process.join()
+    return all(process.exitcode == 0 for process in processes)
+
+def work_batch_summary(batch_id):
+    """{"units": {status: count}, "stored": total} for one batch."""
+    summary = {"units": {}, "stored": 0}
+    for unit in get_collection(WORK_QUEUE_COLLECTION).find({"batch": batch_id}, {"status": 1, "stored": 1}):
+        summary["units"][unit["status"]] = summary["units"].get(unit["status"], 0) + 1
+        summary["stored"] += unit.get("stored") or 0
+    return summary
+
+def run_queued_scrape(workers=None, batch_id=None):
+    """Enqueue a scrape batch and drain it with local worker processes; returns the batch summary.
+
+    In replay mode the in-memory store is first moved to its own process
+    (start_shared_memory_store) so that every worker sees the same queue and
+    collections.
+    """
+    if REPLAY_DIR and not REPLAY_STORE_ADDRESS:
+        start_shared_memory_store()
+    batch_id = enqueue_scrape_batch(batch_id)
+    started = time.perf_counter()
+    run_queue_workers(workers)
+    summary = work_batch_summary(batch_id)
+    logging.info(f"Batch {batch_id} finished in {time.perf_counter() - started:.2f}s with "
+                 f"{workers or QUEUE_WORKERS} worker(s): {summary['stored']} stored, units {summary['units']}")
+    if ENRICH_AFTER_SCRAPE:
+        enrich_pending_articles()
+    return summary
+
+# --- Daemon mode ---
+
+def parse_intervals(spec):
+    """Parse "name=seconds,..." into {name: seconds}, skipping malformed entries."""
+    intervals = {}
+    for part in spec.split(","):
+        name, _, seconds = part.partition("=")
+        try:
+            intervals[name.strip()] = int(seconds)
+        except ValueError:
+            if part.strip():
+                logging.warning(f"Ignoring malformed DAEMON_INTERVALS entry: {part}")
+    return intervals
+
+class ScheduledJob:
+    """A function the daemon runs every `interval` seconds, never twice at once."""
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = time.monotonic()
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_seconds = None
+        self.last_result = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            "interval_seconds": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "skipped_overlaps": self.skipped,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_seconds": self.last_seconds,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "next_run_in_seconds": max(0.0, round(self.next_run - time.monotonic(), 1))
+        }
+
+class ScraperDaemon:
+    """Runs each source, and enrichment, on its own interval in one long-lived process.
+
+    The Mongo client, HTTP session, host limiters, spaCy/VADER models and the
+    near-duplicate index stay loaded between runs. A job that is still
+    running when it comes due again is skipped, not started twice. SIGTERM
+    or SIGINT sets SHUTDOWN. No new jobs start after that, and running ones
+    stop at their next item and save what they have. A small HTTP server
+    on DAEMON_HTTP_HOST:DAEMON_HTTP_PORT serves /health (JSON, 503 when
+    stopping or a job has failed DAEMON_UNHEALTHY_FAILURES times in a row)
+    and /metrics (Prometheus text).
+
+    Enrichment runs in this process (n_process=1) whatever NLP_PROCESSES
+    says: spaCy's worker processes are forked, and forking while the other
+    jobs' threads hold locks can deadlock the children.
+    """
+
+    def __init__(self, source_names=None, intervals=None, enrich=None):
+        intervals = parse_intervals(DAEMON_INTERVALS) if intervals is None else intervals
+        names = (SCRAPER_SOURCES or list(SOURCES)) if source_names is None else source_names
+        self.jobs = []
+        for name in names:
+            if name not in SOURCES:
+                logging.warning(f"Unknown source in SCRAPER_SOURCES: {name}")
+                continue
+            interval = intervals.get(name, DAEMON_DEFAULT_INTERVAL_SECONDS)
+            self.jobs.append(ScheduledJob(name, interval, functools.partial(self.run_source_job, name)))
+        enrich = ENRICH_AFTER_SCRAPE if enrich is None else enrich
+        if enrich:
+            self.jobs.append(ScheduledJob(
+                "enrich", DAEMON_ENRICH_SECONDS, functools.partial(enrich_pending_articles, n_process=1)
+            ))
+        self.started = datetime.utcnow().isoformat()
+        self.dedup = None
+        self.dedup_loaded = 0.0
+        self.dedup_lock = threading.Lock()
+        self.server = None
+
+    def dedup_index(self, ctx=None):
+        """The shared NearDuplicateIndex, rebuilt from Mongo every DAEMON_DEDUP_REFRESH_SECONDS."""
+        if not DEDUP_ENABLED:
+            return None
+        with self.dedup_lock:
+            if self.dedup is None or time.monotonic() - self.dedup_loaded >= DAEMON_DEDUP_REFRESH_SECONDS:
+                self.dedup = load_dedup_index(ctx=ctx)
+                self.dedup_loaded = time.monotonic()
+            return self.dedup
+
+    def run_source_job(self, name):
+        # Jobs run concurrently, so each has its own RunContext rather than the process-wide current one
+        ctx = make_run_context()
+        try:
+            return run_source(SOURCES[name](), self.dedup_index(ctx), ctx)
+        finally:
+            evict_http_cache()
+
+    def run_job(self, job):
+        job.last_started = datetime.utcnow().isoformat()
+        started = time.perf_counter()
+        try:
+            job.last_result = job.func()
+            job.last_error = None
+            job.consecutive_failures = 0
+        except Exception as e:
+            job.failures += 1
+            job.consecutive_failures += 1
+            job.last_error = str(e)[:500]
+            METRICS.inc("daemon_job_failures_total", job=job.name)
+            logging.error(f"Daemon job {job.name} failed: {e}")
+        finally:
+            job.runs += 1
+            job.last_seconds = round(time.perf_counter() - started, 3)
+            job.last_finished = datetime.utcnow().isoformat()
+            METRICS.observe("daemon_job_seconds", job.last_seconds, job=job.name)
+            job.running = False
+            write_metrics_report()
+
+    def health(self):
+        unhealthy = [job.name for job in self.jobs if job.consecutive_failures >= DAEMON_UNHEALTHY_FAILURES]
+        status = "stopping" if SHUTDOWN.is_set() else "degraded" if unhealthy else "ok"
+        return status == "ok", {
+            "status": status,
+            "started": self.started,
+            "failing_jobs": unhealthy,
+            "jobs": {job.name: job.status() for job in self.jobs}
+        }
+
+    def start_server(self):
+        if not DAEMON_HTTP_PORT:
+            return
+        try:
+            self.server = ThreadingHTTPServer((DAEMON_HTTP_HOST, DAEMON_HTTP_PORT), DaemonRequestHandler)
+        except OSError as e:
+            logging.error(f"Could not start the health endpoint on {DAEMON_HTTP_HOST}:{DAEMON_HTTP_PORT}: {e}")
+            return
+        self.server.scraper_daemon = self
+        threading.Thread(target=self.server.serve_forever, name="daemon-http", daemon=True).start()
+        logging.info(f"Health and metrics at http://{DAEMON_HTTP_HOST}:{self.server.server_port}/health and /metrics")
+
+    def request_shutdown(self, signum=None, frame=None):
+        if not SHUTDOWN.is_set():
+            logging.info("Shutdown requested; waiting for running jobs to stop")
+        SHUTDOWN.set()
+
+    def run(self):
+        """Schedule jobs until SHUTDOWN, then wait for running jobs and stop the server."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.request_shutdown)
+            signal.signal(signal.SIGINT, self.request_shutdown)
+        self.start_server()
+        if any(job.name == "enrich" for job in self.jobs):
+            get_nlp()
+            get_sentiment_analyzer()
+        logging.info("Daemon started: " + ", ".join(f"{job.name} every {job.interval}s" for job in self.jobs))
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.jobs)), thread_name_prefix="job") as executor:
+            while not SHUTDOWN.is_set():
+                now = time.monotonic()
+                for job in self.jobs:
+                    if now < job.next_run:
+                        continue
+                    job.next_run = now + job.interval
+                    if job.running:
+                        job.skipped += 1
+                        METRICS.inc("daemon_overlap_skipped_total", job=job.name)
+                        logging.warning(f"Skipping {job.name}: the previous run is still going")
+                        continue
+                    job.running = True
+                    executor.submit(self.run_job, job)
+                next_due = min((job.next_run for job in self.jobs), default=now + 60)
+                SHUTDOWN.wait(max(0.05, next_due - time.monotonic()))
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        write_metrics_report()
+        logging.info("Daemon stopped.")
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Serves /health and /metrics for the ScraperDaemon in server.scraper_daemon."""
+
+    def do_GET(self):
+        if self.path == "/health":
+            healthy, body = self.server.scraper_daemon.health()
+            self.respond(200 if healthy else 503, "application/json", json.dumps(body))
+        elif self.path == "/metrics":
+            self.respond(200, "text/plain; version=0.0.4", prometheus_text(metrics_report()))
+        else:
+            self.respond(404, "text/plain", "not found\n")
+
+    def respond(self, status, content_type, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Daemon HTTP: {format % args}")
+
+IMPORT_SECONDS = time.perf_counter() - STARTUP_STARTED
 
 # Main Function
 if __name__ == "__main__":
     configure_logging()
+    logging.info(startup_report())
     validate_db_connection()
+    ensure_raw_indexes()
+
+    if "--daemon" in sys.argv[1:]:
+        ScraperDaemon().run()
+        sys.exit(0)
+
+    # One-off migration: delete duplicate links left by older versions, then build link_unique
+    if "--dedupe-links" in sys.argv[1:]:
+        deleted = dedupe_raw_links(get_collection(RAW_COLLECTION))
+        logging.warning(f"Deleted {deleted} duplicate-link documents from {RAW_COLLECTION}")
+        ensure_raw_indexes.done = False
+        ensure_raw_indexes()
+        sys.exit(0)
+
+    # Work queue: --enqueue (coordinator), --worker (drain the queue, on any host) or --queue [N] (both, N local workers)
+    if "--enqueue" in sys.argv[1:]:
+        enqueue_scrape_batch()
+        sys.exit(0)
+    if "--worker" in sys.argv[1:]:
+        signal.signal(signal.SIGTERM, lambda signum, frame: SHUTDOWN.set())
+        run_queue_worker()
+        sys.exit(0)
+    if "--queue" in sys.argv[1:]:
+        position = sys.argv.index("--queue") + 1
+        workers = int(sys.argv[position]) if sys.argv[position:position + 1] and sys.argv[position].isdigit() else None
+        summary = run_queued_scrape(workers)
+        sys.exit(1 if summary["units"].get("failed") else 0)
 
     logging.info("Starting GitHub-scheduled Reddit/TOCondo scraper job...")
     success = run_reddit_tocondo_scrapers()
@@ -755,3 +4099,4 @@ if __name__ == "__main__":
         logging.info("Job completed successfully.")
     else:
         logging.error("Job failed.")
+    logging.info(startup_report())
@@ -0,0 +1,126 @@
+"""Scaling benchmark: NearDuplicateIndex (MinHash/LSH + rapidfuzz) vs all-pairs rapidfuzz.
+
+Builds synthetic corpora where about 20% of articles are lightly edited
+copies (cross-posts) of an earlier one, and reports time per article,
+rapidfuzz comparisons and recall of the planted duplicates as the corpus grows.
+
+DEDUP_NUM_PERM / DEDUP_BANDS rows per band trade recall for work: bands of
+4 rows (128 / 32) compare about n**1.9 pairs, 8 rows (128 / 16) stay linear
+but miss looser cross-posts. The defaults (192 / 32, 6 rows) are checked to
+stay near-linear with every planted duplicate found; the run exits non-zero
+otherwise.
+
+Usage: python benchmarks/bench_dedup.py [sizes...]   (default: 500 1000 2000 4000 8000)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz
+
+import RedditTOCondoScraper as scraper
+
+DOMAIN_WORDS = (
+    "condo board fees special assessment reserve fund toronto ottawa mississauga "
+    "tenant landlord elevator parking locker leak insurance bylaw agm proxy vote "
+    "property manager declarant warranty tarion repair garage roof window noise "
+    "smoke pet rental airbnb short term owner unit building corporation lawyer"
+).split()
+VOCABULARY_SIZE = 5000
+# Beyond this size the all-pairs baseline is extrapolated instead of run
+PAIRWISE_LIMIT = 2000
+# Comparisons may grow at most this much faster than the corpus between two sizes
+MAX_GROWTH_OVER_LINEAR = 1.3
+
+def build_vocabulary(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(VOCABULARY_SIZE)}
+    return DOMAIN_WORDS + sorted(words)
+
+def build_corpus(size, seed=7):
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng)
+    # Zipf-like weights so common words (the domain terms first) dominate, as in real posts
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def text(count):
+        return " ".join(rng.choices(vocabulary, weights, k=count))
+
+    articles, planted = [], {}
+    for i in range(size):
+        link = f"https://example.com/{i}"
+        if articles and rng.random() < 0.2:
+            original = rng.choice(articles)
+            words = original["content"].split()
+            for _ in range(rng.randint(0, 3)):
+                words[rng.randrange(len(words))] = rng.choice(DOMAIN_WORDS)
+            article = {"title": original["title"] + rng.choice(["", "!", " (update)"]),
+                       "link": link, "content": " ".join(words)}
+            planted[link] = original["link"]
+        else:
+            article = {"title": text(8), "link": link, "content": text(rng.randint(40, 200))}
+        articles.append(article)
+    return articles, planted
+
+def run_index(articles):
+    index = scraper.NearDuplicateIndex()
+    for key in scraper.DEDUP_STATS:
+        scraper.DEDUP_STATS[key] = 0
+    batch = [dict(article) for article in articles]
+    index.assign(batch)
+    return {article["link"]: article["canonical_id"] for article in batch}, scraper.DEDUP_STATS["comparisons"]
+
+def run_pairwise(articles):
+    texts, canonical = [], {}
+    for article in articles:
+        text = scraper.dedup_text(article)
+        canonical[article["link"]] = article["link"]
+        for link, other in texts:
+            if fuzz.ratio(text, other, score_cutoff=scraper.DEDUP_THRESHOLD):
+                canonical[article["link"]] = canonical[link]
+                break
+        texts.append((article["link"], text))
+    return canonical
+
+def recall(canonical, planted):
+    found = sum(1 for link in planted if canonical[link] != link)
+    return found / len(planted) if planted else 1.0
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 1000, 2000, 4000, 8000]
+    print(f"{'articles':>8} {'lsh s':>8} {'us/art':>8} {'compares':>9} {'recall':>7} {'pairs s':>9} {'recall':>7}")
+    pairwise_rate = None
+    results = []
+    for size in sizes:
+        articles, planted = build_corpus(size)
+        started = time.perf_counter()
+        canonical, comparisons = run_index(articles)
+        lsh_seconds = time.perf_counter() - started
+
+        if size <= PAIRWISE_LIMIT:
+            started = time.perf_counter()
+            pairwise = run_pairwise(articles)
+            pair_seconds = time.perf_counter() - started
+            pairwise_rate = pair_seconds / (size * size)
+            pair_col = f"{pair_seconds:9.2f} {recall(pairwise, planted):7.3f}"
+        elif pairwise_rate is not None:
+            pair_col = f"{'~' + format(pairwise_rate * size * size, '.1f'):>9} {'-':>7}"
+        else:
+            pair_col = f"{'-':>9} {'-':>7}"
+
+        print(f"{size:8d} {lsh_seconds:8.2f} {lsh_seconds / size * 1e6:8.0f} {comparisons:9d} "
+              f"{recall(canonical, planted):7.3f} {pair_col}")
+        results.append((size, comparisons, recall(canonical, planted)))
+
+    failures = [f"recall {found:.3f} at {size} articles" for size, _, found in results if found < 1.0]
+    for (size, comparisons, _), (next_size, next_comparisons, _) in zip(results, results[1:]):
+        growth = (next_comparisons / max(comparisons, 1)) / (next_size / size)
+        if growth > MAX_GROWTH_OVER_LINEAR:
+            failures.append(f"comparisons grew {growth:.2f}x faster than the corpus from {size} to {next_size}")
+    assert not failures, "; ".join(failures)
+
+if __name__ == "__main__":
+    main()
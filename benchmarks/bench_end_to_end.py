@@ -0,0 +1,171 @@
+"""End-to-end benchmark: scraper stages replayed on synthetic fixtures at N x today's volume.
+
+Writes Reddit listings, a TOCondo home page and PDFs in the RECORD_DIR/REPLAY_DIR
+fixture layout, then runs each stage in a fresh subprocess with REPLAY_DIR set.
+So no network or MongoDB is needed, timings cover only that stage, and the
+reported peak RSS (ru_maxrss) is that stage's own. "baseline" is the RSS after
+import and loading the fixtures, for reference.
+
+Usage: python benchmarks/bench_end_to_end.py [scales...]   (default: 10 100)
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Today's volume: posts per subreddit inside the 30-day window, and PDFs on the TOCondo home page
+BASE_POSTS_PER_SUBREDDIT = 50
+BASE_PDFS = 12
+PDF_PAGES = 4
+PAGE_CHARS = 1500
+RELEVANT_FRACTION = 0.25
+STAGES = ["baseline", "get_matched_keywords", "fetch_reddit_posts", "process_pdf", "fetch_tocondo_pdfs"]
+FILLER = (
+    "my unit in the building has had a leak for months and the property manager keeps ignoring "
+    "emails about the fees reserve study board meeting parking locker elevator noise neighbours"
+).split()
+
+def make_pdf(pages_text):
+    """Minimal uncompressed PDF with one Helvetica text block per page."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages_text)))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages_text)} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages_text):
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        lines = " ".join(f"({text[j:j + 90]}) '" for j in range(0, len(text), 90))
+        stream = f"BT /F1 9 Tf 20 770 Td 11 TL {lines} ET".encode()
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def build_fixtures(directory, scale, seed=11):
+    """Write scale x today's volume of fixtures to directory; returns (post_count, pdf_links)."""
+    import RedditTOCondoScraper as scraper
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    scraper.write_fixture(os.path.join(directory, "manifest.json"),
+                          json.dumps({"recorded_at": now.isoformat()}).encode())
+    keywords = scraper.REDDIT_KEYWORDS
+    places = sorted(scraper.ONTARIO_TERMS)
+
+    def text(words):
+        return " ".join(rng.choice(FILLER) for _ in range(words))
+
+    posts_per_subreddit = BASE_POSTS_PER_SUBREDDIT * scale
+    window = scraper.PUBLISHED_MAX_AGE_DAYS * 86400 - 3600
+    total_posts = 0
+    for name in scraper.SUBREDDITS:
+        posts = []
+        for i in range(posts_per_subreddit):
+            title = text(10)
+            if rng.random() < RELEVANT_FRACTION:
+                title = f"{title} {rng.choice(keywords)} in {rng.choice(places)}"
+            posts.append({
+                "title": title,
+                "permalink": f"/r/{name}/comments/{i:x}/",
+                "created_utc": now.timestamp() - 60 - window * i / posts_per_subreddit,
+                "fullname": f"t3_{name}{i:x}",
+                "selftext": text(rng.randint(20, 200)),
+                "score": rng.randint(0, 500),
+                "num_comments": rng.randint(0, 100)
+            })
+        scraper.write_fixture(scraper.fixture_path(directory, "reddit", name), json.dumps(posts).encode())
+        total_posts += len(posts)
+
+    pdf_links = []
+    month = datetime(now.year, now.month, 1) - timedelta(days=1)
+    for i in range(BASE_PDFS * scale):
+        issue = month - timedelta(days=31 * (i % 12))
+        link = f"https://tocondonews.com/wp-content/uploads/{issue.strftime('%B-%Y')}-Toronto-Condo-News-{i}.pdf"
+        pages = [f"{text(PAGE_CHARS // 6)} {rng.choice(scraper.TOCONDO_KEYWORDS)} {text(20)}" for _ in range(PDF_PAGES)]
+        body = make_pdf(pages)
+        scraper.write_fixture(scraper.fixture_path(directory, "http", link, ".body"), body)
+        scraper.write_fixture(scraper.fixture_path(directory, "http", link),
+                              json.dumps({"url": link, "headers": {"Content-Type": "application/pdf"}}).encode())
+        pdf_links.append(link)
+
+    home = "https://tocondonews.com/"
+    page = "".join(f'<p><a href="{link}">Issue</a></p>' for link in pdf_links).encode()
+    scraper.write_fixture(scraper.fixture_path(directory, "http", home, ".body"), page)
+    scraper.write_fixture(scraper.fixture_path(directory, "http", home),
+                          json.dumps({"url": home, "headers": {"Content-Type": "text/html; charset=utf-8"}}).encode())
+    return total_posts, pdf_links
+
+def run_stage(stage, directory):
+    """Run one stage in this (fresh) process; returns its measurements."""
+    import RedditTOCondoScraper as scraper
+
+    scraper.new_run_context()
+    with open(os.path.join(directory, "pdf_links.json"), encoding="utf-8") as f:
+        pdf_links = json.load(f)
+    reddit = scraper.get_reddit()
+    posts = [post for name in scraper.SUBREDDITS for post in reddit.subreddit(name).new()]
+
+    items, stored = 0, None
+    started = time.perf_counter()
+    if stage == "get_matched_keywords":
+        for post in posts:
+            text = f"{post.title} {post.selftext}"
+            found = scraper.TERM_MATCHER.scan(text)
+            if scraper.is_relevant_location(text, found):
+                scraper.get_matched_keywords(text, scraper.REDDIT_KEYWORDS, found=found)
+        items = len(posts)
+    elif stage == "fetch_reddit_posts":
+        stored = scraper.fetch_reddit_posts()
+        items = len(posts)
+    elif stage == "process_pdf":
+        for link in pdf_links:
+            scraper.process_pdf(link)
+        items = len(pdf_links)
+    elif stage == "fetch_tocondo_pdfs":
+        stored = scraper.fetch_tocondo_pdfs()
+        items = len(pdf_links)
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "items": items, "stored": stored,
+            "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--stage":
+        print(json.dumps(run_stage(sys.argv[2], os.environ["REPLAY_DIR"])))
+        return
+
+    scales = [int(arg) for arg in sys.argv[1:]] or [10, 100]
+    print(f"{'scale':>5} {'stage':<22} {'items':>8} {'stored':>7} {'seconds':>8} {'items/s':>9} {'peak MB':>8}")
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            _, pdf_links = build_fixtures(directory, scale)
+            with open(os.path.join(directory, "pdf_links.json"), "w", encoding="utf-8") as f:
+                json.dump(pdf_links, f)
+            for stage in STAGES:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    env = dict(os.environ, REPLAY_DIR=directory, HTTP_CACHE_DIR=cache_dir,
+                               REDDIT_INCREMENTAL="false", DEDUP_ENABLED="false",
+                               REDDIT_MAX_POSTS_PER_SUBREDDIT=str(10 ** 9))
+                    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--stage", stage],
+                                            env=env, capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                rate = result["items"] / result["seconds"] if result["seconds"] else 0
+                stored = "" if result["stored"] is None else result["stored"]
+                print(f"{scale:>4}x {stage:<22} {result['items']:>8} {stored:>7} {result['seconds']:>8.2f} "
+                      f"{rate:>9.0f} {result['maxrss_mb']:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Micro-benchmark: precompiled TERM_MATCHER vs per-keyword substring tests.
+
+Usage: python benchmarks/bench_keyword_matching.py [num_posts] [words_per_post]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RedditTOCondoScraper as scraper
+
+FILLER = (
+    "my unit in the building has had a leak for months and the property manager "
+    "keeps ignoring emails about the fees special assessment reserve study board "
+    "meeting location parking locker elevator noise neighbours rent tenant owner"
+).split()
+
+def legacy_get_matched_keywords(text, keywords, max_tags=10):
+    text_lower = (text or "").lower()
+    matched = [kw for kw in keywords if kw.lower() in text_lower]
+    return matched[:max_tags]
+
+def legacy_is_relevant_location(text):
+    text_lower = text.lower()
+    return any(term.lower() in text_lower for term in scraper.ONTARIO_TERMS)
+
+def build_corpus(num_posts, words_per_post, seed=42):
+    rng = random.Random(seed)
+    terms = scraper.REDDIT_KEYWORDS + list(scraper.ONTARIO_TERMS)
+    corpus = []
+    for _ in range(num_posts):
+        words = [rng.choice(FILLER) for _ in range(words_per_post)]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randrange(len(words)), rng.choice(terms))
+        corpus.append(" ".join(words))
+    return corpus
+
+def run_legacy(corpus):
+    for text in corpus:
+        if legacy_is_relevant_location(text):
+            legacy_get_matched_keywords(text, scraper.REDDIT_KEYWORDS)
+
+def run_matcher(corpus):
+    for text in corpus:
+        found = scraper.TERM_MATCHER.scan(text)
+        if scraper.is_relevant_location(text, found):
+            scraper.get_matched_keywords(text, scraper.REDDIT_KEYWORDS, found=found)
+
+def main():
+    num_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    words_per_post = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+    corpus = build_corpus(num_posts, words_per_post)
+
+    for text in corpus:
+        assert legacy_is_relevant_location(text) == scraper.is_relevant_location(text)
+        assert legacy_get_matched_keywords(text, scraper.REDDIT_KEYWORDS) == \
+            scraper.get_matched_keywords(text, scraper.REDDIT_KEYWORDS)
+
+    chars = sum(len(text) for text in corpus)
+    print(f"Corpus: {num_posts} posts, {chars / num_posts:.0f} chars/post")
+    results = {}
+    for name, func in [("legacy", run_legacy), ("matcher", run_matcher)]:
+        best = min(timeit.repeat(lambda: func(corpus), number=1, repeat=5))
+        results[name] = best
+        print(f"{name:>8}: {best * 1000:8.1f} ms total, {best / num_posts * 1e6:8.1f} us/post")
+    print(f" speedup: {results['legacy'] / results['matcher']:.1f}x")
+
+if __name__ == "__main__":
+    main()
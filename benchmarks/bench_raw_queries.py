@@ -0,0 +1,161 @@
+"""Query benchmark: the article accessors on a seeded raw_articles, before and after RAW_INDEXES.
+
+Seeds a scratch database with synthetic articles (tags, sources, dates and
+processing status shaped like the scraper's), then times each query with
+only the _id and link indexes (the ad-hoc state) and again after
+ensure_raw_indexes. For each query it reports the median first-page time
+and the documents MongoDB examined (explain executionStats). The "page 20"
+row shows that keyset pagination keeps deep pages as cheap as the first.
+Text search needs its index, so it has no "before" time.
+
+Needs a MongoDB server; the data goes to BENCH_MONGO_DB (default
+scraper_query_bench) on BENCH_MONGO_URI, never the scraper's own database.
+
+Usage: python benchmarks/bench_raw_queries.py [documents] [--reuse]   (default: 1000000)
+       --reuse keeps an already seeded collection of the same size.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["MONGO_URI"] = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+os.environ["MONGO_DB"] = os.getenv("BENCH_MONGO_DB", "scraper_query_bench")
+os.environ.pop("REPLAY_DIR", None)
+
+import pymongo
+
+import RedditTOCondoScraper as scraper
+
+SEED_BATCH = 10000
+REPEATS = 5
+DEEP_PAGE = 20
+YEARS = 3
+FILLER = (
+    "my unit in the building has had a leak for months and the property manager keeps ignoring "
+    "emails about the fees reserve study board meeting parking locker elevator noise neighbours"
+).split()
+
+def build_articles(count, seed=5):
+    """Yield count synthetic raw articles; tags follow a Zipf-like popularity."""
+    rng = random.Random(seed)
+    tags = scraper.REDDIT_KEYWORDS + [tag for tag in scraper.TOCONDO_KEYWORDS if tag not in scraper.REDDIT_KEYWORDS]
+    weights = [1 / (rank + 1) for rank in range(len(tags))]
+    end = datetime(2026, 10, 1)
+    span = YEARS * 365 * 86400
+    for i in range(count):
+        source = "reddit" if rng.random() < 0.8 else "tocondo"
+        published = end - timedelta(seconds=rng.randrange(span))
+        status = rng.random()
+        yield {
+            "title": " ".join(rng.choice(FILLER) for _ in range(rng.randint(6, 12))),
+            "link": f"https://example.com/{source}/{i}",
+            "published_date": published.isoformat() + "+00:00",
+            "scraped_date": (published + timedelta(hours=rng.randint(1, 48))).isoformat(),
+            "tags": sorted(set(rng.choices(tags, weights, k=rng.randint(1, 4)))),
+            "source": source,
+            "subreddit": rng.choice(scraper.SUBREDDITS) if source == "reddit" else None,
+            "upvotes": rng.randint(0, 500) if source == "reddit" else None,
+            "comments": rng.randint(0, 100) if source == "reddit" else None,
+            "content": " ".join(rng.choice(FILLER) for _ in range(rng.randint(40, 160))),
+            "processing_status": "processed" if status < 0.97 else "pending" if status < 0.99 else "failed"
+        }
+
+def seed(collection, count):
+    collection.drop()
+    collection.create_index("link", unique=True, name="link_unique")
+    started = time.perf_counter()
+    batch = []
+    for article in build_articles(count):
+        batch.append(article)
+        if len(batch) == SEED_BATCH:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    return time.perf_counter() - started
+
+def drop_managed_indexes(collection):
+    for name in collection.index_information():
+        if name not in ("_id_", "link_unique"):
+            collection.drop_index(name)
+    scraper.ensure_raw_indexes.done = False
+
+def query_cases():
+    """(label, filter) pairs, built the way the accessors build them."""
+    tag = scraper.REDDIT_KEYWORDS[3]
+    month = "2025-06"
+    since = (datetime(2026, 10, 1) - timedelta(days=7)).date().isoformat()
+    return [
+        (f"tag {tag!r} in {month}", scraper.date_range_query({"tags": tag}, *scraper.month_bounds(month))),
+        (f"tag {tag!r}, page {DEEP_PAGE}", {"tags": tag}),
+        ("tocondo, last 7 days", scraper.date_range_query({"source": "tocondo"}, since)),
+        ("pending", {"processing_status": "pending"}),
+        ("text 'elevator'", {"$text": {"$search": "elevator"}}),
+    ]
+
+def time_page(query, deep):
+    """Seconds to fetch the first page, or page DEEP_PAGE when deep; returns (seconds, token used)."""
+    after = None
+    if deep:
+        for _ in range(DEEP_PAGE - 1):
+            _, after = scraper.find_articles(query, after=after)
+    started = time.perf_counter()
+    scraper.find_articles(query, after=after)
+    return time.perf_counter() - started, after
+
+def docs_examined(collection, query, after):
+    cursor = collection.find(scraper.articles_page_query(query, after), scraper.ARTICLE_SUMMARY_FIELDS).sort(
+        [("published_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+    ).limit(scraper.QUERY_PAGE_SIZE + 1)
+    try:
+        return cursor.explain()["executionStats"]["totalDocsExamined"]
+    except Exception:
+        return None
+
+def measure(collection, cases):
+    results = {}
+    for label, query in cases:
+        deep = label.endswith(f"page {DEEP_PAGE}")
+        try:
+            runs = [time_page(query, deep) for _ in range(REPEATS)]
+        except pymongo.errors.OperationFailure:
+            results[label] = None
+            continue
+        results[label] = (statistics.median(seconds for seconds, _ in runs), docs_examined(collection, query, runs[0][1]))
+    return results
+
+def cell(result):
+    if result is None:
+        return f"{'needs index':>21}"
+    seconds, examined = result
+    return f"{seconds * 1000:9.1f} {'-' if examined is None else examined:>11}"
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = int(args[0]) if args else 1000000
+    collection = scraper.get_collection(scraper.RAW_COLLECTION)
+    if "--reuse" in sys.argv and collection.estimated_document_count() == count:
+        print(f"Reusing {count} documents in {os.environ['MONGO_DB']}.{scraper.RAW_COLLECTION}")
+    else:
+        print(f"Seeded {count} documents in {seed(collection, count):.1f}s")
+
+    cases = query_cases()
+    drop_managed_indexes(collection)
+    before = measure(collection, cases)
+    started = time.perf_counter()
+    scraper.ensure_raw_indexes()
+    print(f"Built RAW_INDEXES in {time.perf_counter() - started:.1f}s")
+    after = measure(collection, cases)
+
+    print(f"{'query':<44} {'before ms':>9} {'examined':>11} {'after ms':>9} {'examined':>11} {'speedup':>8}")
+    for label, _ in cases:
+        speedup = f"{before[label][0] / after[label][0]:7.0f}x" if before[label] and after[label] else f"{'-':>8}"
+        print(f"{label:<44} {cell(before[label])} {cell(after[label])} {speedup}")
+
+if __name__ == "__main__":
+    main()
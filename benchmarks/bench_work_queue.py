@@ -0,0 +1,67 @@
+"""Work queue benchmark: one scrape batch drained by 1, 2, 4 and 8 local worker processes.
+
+Reuses bench_end_to_end's synthetic fixtures and replays them with
+REPLAY_LATENCY_SECONDS of simulated network time per HTTP response and per
+Reddit listing page, since a real scrape is dominated by waiting on Reddit
+and TOCondo. Each run is a fresh subprocess: it starts the shared in-memory
+store, enqueues the batch and times only the worker phase. Speedup is
+relative to the first worker count.
+
+Usage: python benchmarks/bench_work_queue.py [scale] [latency_seconds] [workers...]
+       (default: 4 0.2 1 2 4 8)
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def run_workers(workers):
+    """Enqueue and drain one batch in this (fresh) process; returns its measurements."""
+    import RedditTOCondoScraper as scraper
+
+    scraper.start_shared_memory_store()
+    batch_id = scraper.enqueue_scrape_batch()
+    started = time.perf_counter()
+    clean = scraper.run_queue_workers(workers)
+    seconds = time.perf_counter() - started
+    summary = scraper.work_batch_summary(batch_id)
+    return {"seconds": seconds, "clean": clean, "units": summary["units"], "stored": summary["stored"],
+            "raw": scraper.get_collection(scraper.RAW_COLLECTION).count_documents({})}
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        print(json.dumps(run_workers(int(sys.argv[2]))))
+        return
+
+    from bench_end_to_end import build_fixtures
+
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    latency = sys.argv[2] if len(sys.argv) > 2 else "0.2"
+    worker_counts = [int(arg) for arg in sys.argv[3:]] or [1, 2, 4, 8]
+    print(f"{'workers':>7} {'units':>6} {'stored':>7} {'seconds':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        build_fixtures(directory, scale)
+        first = None
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                env = dict(os.environ, REPLAY_DIR=directory, HTTP_CACHE_DIR=cache_dir,
+                           REPLAY_LATENCY_SECONDS=latency, TOCONDO_PARSE_WORKERS="1",
+                           REDDIT_INCREMENTAL="false", DEDUP_ENABLED="false", ENRICH_AFTER_SCRAPE="false",
+                           REDDIT_MAX_POSTS_PER_SUBREDDIT=str(10 ** 9), LOG_LEVEL="WARNING")
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", str(workers)],
+                                        env=env, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            first = first or result["seconds"]
+            units = sum(result["units"].values())
+            failed = f" ({result['units']['failed']} failed)" if result["units"].get("failed") else ""
+            print(f"{workers:>7} {units:>6} {result['stored']:>7} {result['seconds']:>8.2f} "
+                  f"{first / result['seconds']:>7.2f}x{failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""In-memory MongoDB stand-in used by RedditTOCondoScraper in replay mode.
+
+It covers the collection methods the scraper calls, so replays (and the
+benchmarks built on them) need no MongoDB server. Equality lookups on _id
+and on create_index fields use hash indexes. A MemoryStoreManager can serve
+one store to several local processes, such as queue workers.
+
+bulk_write takes pymongo's InsertOne, UpdateOne and UpdateMany, or the same
+as plain dicts (see write_request). Queries support the operators in
+MEMORY_OPERATORS and updates those in MEMORY_UPDATE_OPERATORS; any other
+raises ValueError rather than silently matching or changing nothing.
+"""
+import copy
+import multiprocessing
+import os
+import threading
+import uuid
+from multiprocessing.managers import BaseManager, BaseProxy
+
+import pymongo
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+MEMORY_COLLECTIONS = {}
+
+def get_memory_collection(name):
+    if name not in MEMORY_COLLECTIONS:
+        MEMORY_COLLECTIONS[name] = MemoryCollection(name)
+    return MEMORY_COLLECTIONS[name]
+
+class SharedCollectionProxy(BaseProxy):
+    """Client side of a MemoryCollection served by a MemoryStoreManager.
+
+    Every method runs in the store process; find builds its cursor here on
+    top of the remote matching(), so results arrive as copies.
+    """
+
+    _exposed_ = ("matching", "find_one", "count_documents", "insert_one", "update_one", "update_many",
+                 "bulk_write", "create_index", "find_one_and_update", "index_information", "drop_index",
+                 "delete_many")
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query, projection)
+
+    def bulk_write(self, requests, ordered=True):
+        # Sent as plain dicts, so the store process never unpickles the caller's operation classes
+        return self._callmethod("bulk_write", ([write_request(request) for request in requests], ordered))
+
+for _method in SharedCollectionProxy._exposed_:
+    if not hasattr(SharedCollectionProxy, _method):
+        setattr(SharedCollectionProxy, _method,
+                lambda self, *args, _method=_method, **kwargs: self._callmethod(_method, args, kwargs))
+
+class MemoryStoreManager(BaseManager):
+    """Serves the replay store to several local processes (e.g. queue workers)."""
+
+MemoryStoreManager.register("collection", callable=get_memory_collection, proxytype=SharedCollectionProxy)
+
+def start_shared_memory_store():
+    """Start a store process and point this process (and its children) at it.
+
+    Its address goes to the REPLAY_STORE_ADDRESS environment variable.
+    Returns the manager; the store lives until it is shut down or this
+    process exits.
+    """
+    manager = MemoryStoreManager(address=("127.0.0.1", 0), ctx=multiprocessing.get_context("spawn"))
+    manager.start()
+    host, port = manager.address
+    os.environ["REPLAY_STORE_ADDRESS"] = f"{host}:{port}"
+    os.environ["REPLAY_STORE_AUTHKEY"] = bytes(multiprocessing.current_process().authkey).hex()
+    get_shared_memory_collection.manager = manager
+    get_shared_memory_collection.proxies = {}
+    return manager
+
+def get_shared_memory_collection(name, address):
+    """Proxy for collection name in the store at address, "host:port" (connected once per process)."""
+    if not hasattr(get_shared_memory_collection, "manager"):
+        host, _, port = address.rpartition(":")
+        authkey = bytes.fromhex(os.environ["REPLAY_STORE_AUTHKEY"]) if os.getenv("REPLAY_STORE_AUTHKEY") else None
+        manager = MemoryStoreManager(address=(host, int(port)), authkey=authkey)
+        manager.connect()
+        get_shared_memory_collection.manager = manager
+        get_shared_memory_collection.proxies = {}
+    proxies = get_shared_memory_collection.proxies
+    if name not in proxies:
+        proxies[name] = get_shared_memory_collection.manager.collection(name)
+    return proxies[name]
+
+# Query operators the store understands; any other raises instead of silently not matching
+MEMORY_OPERATORS = ("$in", "$nin", "$ne", "$exists", "$not", "$lt", "$lte", "$gt", "$gte")
+# Update operators the store applies; any other raises
+MEMORY_UPDATE_OPERATORS = ("$set", "$setOnInsert", "$unset", "$inc")
+# Operators that test an array field as a whole rather than element by element
+MEMORY_WHOLE_VALUE_OPERATORS = ("$ne", "$nin", "$exists", "$not")
+
+def memory_compare(value, operator, operand):
+    if operator not in MEMORY_OPERATORS:
+        raise ValueError(f"Unsupported query operator {operator}")
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$exists":
+        return (value is not MemoryCollection.MISSING) == bool(operand)
+    if operator == "$not":
+        return not memory_condition_matches(value, operand)
+    if value is MemoryCollection.MISSING or value is None:
+        return False
+    try:
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+        if operator == "$gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        return False
+
+def memory_condition_matches(value, condition):
+    """Whether a field value (MemoryCollection.MISSING if absent) satisfies a query condition."""
+    # Array fields match if any element does, as with a multikey index
+    elements = value if isinstance(value, list) else ()
+    if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+        return all(
+            memory_compare(value, op, operand) or (
+                op not in MEMORY_WHOLE_VALUE_OPERATORS
+                and any(memory_compare(element, op, operand) for element in elements)
+            )
+            for op, operand in condition.items()
+        )
+    if condition is None:
+        return value is None or value is MemoryCollection.MISSING
+    return value == condition or condition in elements
+
+def memory_check_update(update):
+    unsupported = sorted(set(update) - set(MEMORY_UPDATE_OPERATORS))
+    if unsupported:
+        raise ValueError(f"Unsupported update operator {', '.join(unsupported)}")
+
+def memory_text_matches(doc, search):
+    """$text stand-in: any search word in any string field (Mongo only searches the text-indexed ones)."""
+    text = " ".join(value for value in doc.values() if isinstance(value, str)).lower()
+    return any(word in text for word in search.lower().split())
+
+def memory_matches(doc, query):
+    for key, condition in query.items():
+        if key == "$text":
+            if not memory_text_matches(doc, condition["$search"]):
+                return False
+        elif key == "$or":
+            if not any(memory_matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(memory_matches(doc, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported query operator {key}")
+        elif not memory_condition_matches(doc.get(key, MemoryCollection.MISSING), condition):
+            return False
+    return True
+
+def memory_project(doc, projection):
+    if not projection:
+        return dict(doc)
+    if any(projection.values()):
+        fields = {key for key, include in projection.items() if include}
+        if projection.get("_id", 1):
+            fields.add("_id")
+        return {key: value for key, value in doc.items() if key in fields}
+    return {key: value for key, value in doc.items() if key not in projection}
+
+class WriteRecorder:
+    """Stands in for pymongo's bulk builder to read one write operation.
+
+    pymongo operations hand their arguments to Collection.bulk_write through
+    _add_to_bulk(builder); recording those calls reads them without touching
+    the operations' private fields. Options the store does not implement
+    (collation, array filters, hints, sort), replaces and deletes raise
+    ValueError.
+    """
+
+    def __init__(self):
+        self.request = None
+
+    def add_insert(self, document):
+        self.request = {"document": document}
+
+    def add_update(self, selector, update, multi, upsert=False, **options):
+        unsupported = sorted(name for name, value in options.items() if value is not None)
+        if unsupported:
+            raise ValueError(f"Replay store updates do not support {', '.join(unsupported)}")
+        self.request = {"filter": selector, "update": update, "upsert": bool(upsert), "many": bool(multi)}
+
+    def add_replace(self, *args, **kwargs):
+        raise ValueError("Replay store bulk_write does not support ReplaceOne")
+
+    def add_delete(self, *args, **kwargs):
+        raise ValueError("Replay store bulk_write does not support DeleteOne or DeleteMany")
+
+def write_request(request):
+    """A write operation as a plain dict: {"document"} or {"filter", "update", "upsert", "many"}."""
+    if isinstance(request, dict):
+        return request
+    recorder = WriteRecorder()
+    request._add_to_bulk(recorder)
+    return recorder.request
+
+class MemoryResult:
+    def __init__(self, **counts):
+        self.matched_count = counts.get("matched_count", 0)
+        self.modified_count = counts.get("modified_count", 0)
+        self.upserted_count = counts.get("upserted_count", 0)
+        self.inserted_count = counts.get("inserted_count", 0)
+        self.deleted_count = counts.get("deleted_count", 0)
+        self.upserted_id = counts.get("upserted_id")
+        self.inserted_id = counts.get("inserted_id")
+
+def memory_sort(docs, sort_keys):
+    for key, direction in reversed(sort_keys or []):
+        docs.sort(key=lambda doc: (doc.get(key) is not None, doc.get(key)), reverse=direction == pymongo.DESCENDING)
+    return docs
+
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self.sort_keys = []
+        self.skip_count = 0
+        self.limit_count = 0
+
+    def sort(self, key, direction=pymongo.ASCENDING):
+        self.sort_keys = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count):
+        self.skip_count = count
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def __iter__(self):
+        docs = memory_sort(self.collection.matching(self.query), self.sort_keys)
+        docs = docs[self.skip_count:]
+        if self.limit_count:
+            docs = docs[:self.limit_count]
+        return iter([memory_project(doc, self.projection) for doc in docs])
+
+def memory_index_keys(value):
+    """Hash index keys for a field value: one per element for arrays (multikey)."""
+    values = value if isinstance(value, list) else [value]
+    return [value for value in values if not isinstance(value, (dict, list, set))]
+
+class MemoryCollection:
+    """Thread-safe in-memory stand-in for a pymongo Collection.
+
+    Indexes are hash indexes on the first field of the key. Text indexes
+    are only recorded by name; $text queries scan (see memory_text_matches).
+    """
+
+    MISSING = object()
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.indexes = {"_id": {}}
+        self.unique = {"_id"}
+        self.index_names = {"_id_": [("_id", 1)]}
+        self.lock = threading.RLock()
+
+    def create_index(self, key, unique=False, name=None, **kwargs):
+        keys = [(key, pymongo.ASCENDING)] if isinstance(key, str) else list(key)
+        field = keys[0][0]
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        with self.lock:
+            self.index_names[name] = keys
+            if any(direction == pymongo.TEXT for _, direction in keys):
+                return name
+            if field not in self.indexes:
+                self.indexes[field] = {}
+                for doc_id, doc in self.docs.items():
+                    for value in memory_index_keys(doc.get(field)):
+                        self.indexes[field].setdefault(value, set()).add(doc_id)
+            if unique:
+                self.unique.add(field)
+        return name
+
+    def index_information(self):
+        with self.lock:
+            return {name: {"key": keys} for name, keys in self.index_names.items()}
+
+    def drop_index(self, name):
+        with self.lock:
+            if name not in self.index_names:
+                raise OperationFailure(f"index not found with name [{name}]")
+            del self.index_names[name]
+
+    def _index_add(self, doc):
+        for field, index in self.indexes.items():
+            if field in self.unique and index.get(doc.get(field)) and field in doc:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}")
+        for field, index in self.indexes.items():
+            for value in memory_index_keys(doc.get(field)):
+                index.setdefault(value, set()).add(doc["_id"])
+
+    def _index_remove(self, doc):
+        for field, index in self.indexes.items():
+            for value in memory_index_keys(doc.get(field)):
+                index.get(value, set()).discard(doc["_id"])
+
+    def matching(self, query):
+        """Stored documents matching query (not copies)."""
+        query = query or {}
+        with self.lock:
+            candidates = None
+            for field, condition in query.items():
+                if field in self.indexes and not isinstance(condition, (dict, list)):
+                    candidates = self.indexes[field].get(condition, set())
+                    break
+                if field in self.indexes and isinstance(condition, dict) and list(condition) == ["$in"]:
+                    candidates = set().union(*(self.indexes[field].get(value, set()) for value in condition["$in"]))
+                    break
+            docs = self.docs.values() if candidates is None else [self.docs[doc_id] for doc_id in candidates]
+            return [doc for doc in docs if memory_matches(doc, query)]
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query, projection)
+
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query, projection).limit(1)), None)
+
+    def count_documents(self, query):
+        return len(self.matching(query))
+
+    def insert_one(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", uuid.uuid4().hex)
+        with self.lock:
+            self._index_add(doc)
+            self.docs[doc["_id"]] = doc
+        return MemoryResult(inserted_id=doc["_id"], inserted_count=1)
+
+    def delete_many(self, query):
+        with self.lock:
+            docs = self.matching(query)
+            for doc in docs:
+                self._index_remove(doc)
+                del self.docs[doc["_id"]]
+        return MemoryResult(deleted_count=len(docs))
+
+    def _apply(self, doc, update, inserting):
+        memory_check_update(update)
+        before = copy.deepcopy(doc)
+        for key, value in update.get("$set", {}).items():
+            doc[key] = copy.deepcopy(value)
+        if inserting:
+            for key, value in update.get("$setOnInsert", {}).items():
+                doc[key] = copy.deepcopy(value)
+        for key in update.get("$unset", {}):
+            doc.pop(key, None)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        return doc != before
+
+    def _update(self, query, update, upsert, many):
+        with self.lock:
+            docs = self.matching(query)
+            if not many:
+                docs = docs[:1]
+            if not docs:
+                if not upsert:
+                    return MemoryResult()
+                doc = {key: value for key, value in query.items()
+                       if not key.startswith("$") and not isinstance(value, dict)}
+                self._apply(doc, update, inserting=True)
+                return MemoryResult(upserted_id=self.insert_one(doc).inserted_id, upserted_count=1)
+            modified = 0
+            for doc in docs:
+                modified += self._apply_indexed(doc, update)
+            return MemoryResult(matched_count=len(docs), modified_count=modified)
+
+    def _apply_indexed(self, doc, update):
+        """Apply update to a stored doc and reindex it; a unique index violation leaves it unchanged."""
+        memory_check_update(update)
+        before = copy.deepcopy(doc)
+        self._index_remove(doc)
+        changed = self._apply(doc, update, inserting=False)
+        try:
+            self._index_add(doc)
+        except DuplicateKeyError:
+            doc.clear()
+            doc.update(before)
+            self._index_add(doc)
+            raise
+        return changed
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    def find_one_and_update(self, query, update, projection=None, sort=None,
+                            return_document=ReturnDocument.BEFORE, upsert=False):
+        with self.lock:
+            docs = memory_sort(self.matching(query), sort)
+            if not docs:
+                if upsert:
+                    self._update(query, update, upsert=True, many=False)
+                    return self.find_one(query, projection) if return_document == ReturnDocument.AFTER else None
+                return None
+            doc = docs[0]
+            before = copy.deepcopy(doc)
+            self._apply_indexed(doc, update)
+            return memory_project(doc if return_document == ReturnDocument.AFTER else before, projection)
+
+    def bulk_write(self, requests, ordered=True):
+        """Apply write operations (see write_request) in order.
+
+        Duplicate key errors are collected as MongoDB reports them and
+        raised together as a BulkWriteError once the batch is done (or, when
+        ordered, at the first one).
+        """
+        totals = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+                  "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        for index, request in enumerate(map(write_request, requests)):
+            try:
+                if "document" in request:
+                    self.insert_one(request["document"])
+                    totals["nInserted"] += 1
+                    continue
+                result = self._update(request["filter"], request["update"], request["upsert"], request["many"])
+            except DuplicateKeyError as e:
+                totals["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e), "op": request})
+                if ordered:
+                    break
+                continue
+            totals["nMatched"] += result.matched_count
+            totals["nModified"] += result.modified_count
+            if result.upserted_id is not None:
+                totals["nUpserted"] += 1
+                totals["upserted"].append({"index": index, "_id": result.upserted_id})
+        if totals["writeErrors"]:
+            raise BulkWriteError(totals)
+        return MemoryResult(matched_count=totals["nMatched"], modified_count=totals["nModified"],
+                            upserted_count=totals["nUpserted"], inserted_count=totals["nInserted"])
+
@@ -0,0 +1,39 @@
+"""Shared fixtures: the scraper in replay mode, with an empty in-memory store for every test."""
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Replay mode keeps the tests off the network and MongoDB
+os.environ["REPLAY_DIR"] = tempfile.mkdtemp(prefix="scraper-replay-")
+os.environ["HTTP_CACHE_DIR"] = ""
+os.environ["DEDUP_ENABLED"] = "false"
+for name in ("RECORD_DIR", "REPLAY_STORE_ADDRESS", "REPLAY_STORE_AUTHKEY"):
+    os.environ.pop(name, None)
+
+import RedditTOCondoScraper as scraper  # noqa: E402
+import replay_store  # noqa: E402
+
+RUN_AT = datetime(2026, 5, 15, 12, 0, tzinfo=timezone.utc)
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    replay_store.MEMORY_COLLECTIONS.clear()
+    for func in (scraper.ensure_raw_indexes, scraper.ensure_processed_indexes, scraper.ensure_work_queue_indexes):
+        func.done = False
+    yield
+    replay_store.MEMORY_COLLECTIONS.clear()
+
+@pytest.fixture
+def ctx():
+    """A current RunContext fixed at RUN_AT."""
+    return scraper.new_run_context(now=RUN_AT)
+
+@pytest.fixture
+def raw():
+    return scraper.get_collection(scraper.RAW_COLLECTION)
@@ -0,0 +1,99 @@
+"""Claiming, saving and releasing raw articles in the enrichment stage."""
+import pytest
+
+import RedditTOCondoScraper as scraper
+
+def fake_enrich(articles, n_process=None, batch_size=None):
+    """enrich_documents without the NLP models; fails on articles whose content is "bad"."""
+    if any(article.get("content") == "bad" for article in articles):
+        raise RuntimeError("cannot enrich")
+    return [{"raw_id": article["_id"], "link": article["link"], "processed_at": "2026-05-15T12:00:00"}
+            for article in articles]
+
+@pytest.fixture(autouse=True)
+def no_models(monkeypatch):
+    monkeypatch.setattr(scraper, "enrich_documents", fake_enrich)
+    monkeypatch.setattr(scraper, "get_nlp", lambda: None)
+    monkeypatch.setattr(scraper, "get_sentiment_analyzer", lambda: None)
+
+def add_pending(raw, count, content="ok", prefix="l"):
+    for i in range(count):
+        raw.insert_one({"link": f"{prefix}{i}", "title": "t", "content": content, "processing_status": "pending"})
+
+def statuses(raw):
+    return {doc["link"]: doc["processing_status"] for doc in raw.find({}, {"link": 1, "processing_status": 1})}
+
+def test_pending_articles_are_processed(raw):
+    add_pending(raw, 5)
+    assert scraper.enrich_pending_articles() == 5
+    assert set(statuses(raw).values()) == {"processed"}
+    assert scraper.get_collection(scraper.PROCESSED_COLLECTION).count_documents({}) == 5
+
+def expire_retry_delays(raw):
+    raw.update_many({"retry_after": {"$exists": True}}, {"$unset": {"retry_after": ""}})
+
+def test_failing_article_is_retried_alone_then_failed(raw, monkeypatch):
+    monkeypatch.setattr(scraper, "ENRICH_MAX_ATTEMPTS", 2)
+    add_pending(raw, 3)
+    raw.update_one({"link": "l1"}, {"$set": {"content": "bad"}})
+
+    assert scraper.enrich_pending_articles() == 2
+    bad = raw.find_one({"link": "l1"})
+    assert (bad["processing_status"], bad["enrich_attempts"]) == ("pending", 1)
+    assert bad["retry_after"] > "2000"
+    # Waiting out the retry delay: nothing is claimable before it passes
+    assert scraper.enrich_pending_articles() == 0
+
+    expire_retry_delays(raw)
+    assert scraper.enrich_pending_articles() == 0
+    bad = raw.find_one({"link": "l1"})
+    assert (bad["processing_status"], bad["enrich_attempts"]) == ("failed", 2)
+    assert statuses(raw) == {"l0": "processed", "l1": "failed", "l2": "processed"}
+
+def test_stale_claims_count_attempts_and_fail_at_the_cap(raw, monkeypatch):
+    monkeypatch.setattr(scraper, "ENRICH_MAX_ATTEMPTS", 2)
+    add_pending(raw, 1)
+    for attempt in (1, 2):
+        claimed = scraper.claim_pending_articles(10)
+        assert [article["enrich_attempts"] for article in claimed] == [attempt]
+        # The worker dies holding the claim, which then goes stale
+        raw.update_one({"link": "l0"}, {"$set": {"claimed_at": "2000-01-01T00:00:00"}})
+
+    assert scraper.claim_pending_articles(10) == []
+    article = raw.find_one({"link": "l0"})
+    assert article["processing_status"] == "failed"
+    assert "claim_token" not in article
+
+def test_mongo_errors_release_the_batch_without_counting_an_attempt(raw, monkeypatch):
+    add_pending(raw, 3)
+
+    def unavailable(enriched, token):
+        raise scraper.PyMongoError("not primary")
+
+    monkeypatch.setattr(scraper, "save_processed_articles", unavailable)
+    assert scraper.enrich_pending_articles() == 0
+    assert [(doc["processing_status"], doc["enrich_attempts"]) for doc in raw.find({})] == [("pending", 0)] * 3
+
+def test_an_expired_claim_cannot_mark_a_newer_claim_processed(raw):
+    add_pending(raw, 1)
+    old_token = scraper.claim_pending_articles(10)[0]["claim_token"]
+    raw.update_one({"link": "l0"}, {"$set": {"claimed_at": "2000-01-01T00:00:00"}})
+    article = scraper.claim_pending_articles(10)[0]
+
+    scraper.save_processed_articles(fake_enrich([article]), old_token)
+    assert raw.find_one({"link": "l0"})["processing_status"] == "processing"
+    scraper.save_processed_articles(fake_enrich([article]), article["claim_token"])
+    assert raw.find_one({"link": "l0"})["processing_status"] == "processed"
+
+def test_daemon_enriches_in_its_own_process(raw, monkeypatch):
+    calls = []
+    def recording_enrich(articles, n_process=None, batch_size=None):
+        calls.append(n_process)
+        return fake_enrich(articles)
+    monkeypatch.setattr(scraper, "enrich_documents", recording_enrich)
+    monkeypatch.setattr(scraper, "NLP_PROCESSES", 4)
+    add_pending(raw, 3)
+    daemon = scraper.ScraperDaemon(source_names=[], intervals={}, enrich=True)
+    [job] = daemon.jobs
+    assert job.func() == 3
+    assert calls == [1]
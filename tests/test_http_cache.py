@@ -0,0 +1,29 @@
+"""HTTP cache eviction."""
+import os
+
+import pytest
+
+import RedditTOCondoScraper as scraper
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Three 100-byte entries in tmp_path, least recently used first, with room for two."""
+    monkeypatch.setattr(scraper, "HTTP_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(scraper, "HTTP_CACHE_MAX_BYTES", 250)
+    monkeypatch.setattr(scraper, "HTTP_CACHE_STATS", {"hits": 0, "misses": 0, "evictions": 0})
+    for age, key in enumerate(["new", "mid", "old"]):
+        (tmp_path / f"{key}.json").write_bytes(b"{}")
+        (tmp_path / f"{key}.body").write_bytes(b"x" * 98)
+        os.utime(tmp_path / f"{key}.json", (1_800_000_000 - age, 1_800_000_000 - age))
+    return tmp_path
+
+def test_least_recently_used_entries_are_evicted(cache):
+    scraper.evict_http_cache()
+    assert sorted(os.listdir(cache)) == ["mid.body", "mid.json", "new.body", "new.json"]
+    assert scraper.HTTP_CACHE_STATS["evictions"] == 1
+
+def test_queue_worker_evicts_at_the_end_even_without_work(cache, monkeypatch):
+    # Restored afterwards: the worker swaps in a SharedRequestBudget
+    monkeypatch.setattr(scraper, "REDDIT_BUDGET", scraper.REDDIT_BUDGET)
+    assert scraper.run_queue_worker(owner="test") == 0
+    assert not (cache / "old.json").exists()
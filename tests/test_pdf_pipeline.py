@@ -0,0 +1,67 @@
+"""The TOCondo download/parse pipeline, with downloads and parsing faked."""
+import os
+import threading
+import time
+
+import pytest
+
+import RedditTOCondoScraper as scraper
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """Fake download_pdf spooling into tmp_path, and parse_pdf returning the link.
+
+    Returns (tmp_path, release): downloads after the first wait for release.
+    """
+    monkeypatch.setattr(scraper, "PDF_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(scraper, "http_cache_put", lambda *args, **kwargs: None)
+    release = threading.Event()
+
+    def download_pdf(url, headers=None, timeout=15):
+        if not url.endswith("/0"):
+            release.wait(5)
+        path = tmp_path / f"{url.rsplit('/', 1)[1]}.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        return FakeResponse(), str(path)
+
+    def parse_pdf(link, path):
+        with open(path, "rb"):
+            pass
+        return link, {"seconds": 0.0, "pages": 1, "chars": len(link)}
+
+    monkeypatch.setattr(scraper, "download_pdf", download_pdf)
+    monkeypatch.setattr(scraper, "parse_pdf", parse_pdf)
+    monkeypatch.setattr(scraper, "log_pdf_metrics", lambda link, metrics: None)
+    monkeypatch.setattr(scraper, "observe_pdf_metrics", lambda metrics: None)
+    return tmp_path, release
+
+def wait_until_empty(directory, timeout=5):
+    deadline = time.monotonic() + timeout
+    while os.listdir(directory) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return os.listdir(directory)
+
+def test_every_pdf_is_parsed_and_its_spool_file_removed(spool):
+    spool, release = spool
+    release.set()
+    links = [f"https://example.com/{i}" for i in range(6)]
+    stats = {"pdfs": 0, "cached": 0, "pages": 0, "bytes": 0, "download_s": 0.0, "parse_s": 0.0}
+    parsed = dict(scraper.pipeline_pdf_texts(links, stats, parse_workers=1))
+    assert parsed == {link: link for link in links}
+    assert (stats["pdfs"], stats["pages"]) == (6, 6)
+    assert wait_until_empty(spool) == []
+
+def test_stopping_early_removes_spooled_pdfs_not_handed_off(spool):
+    spool, release = spool
+    links = [f"https://example.com/{i}" for i in range(20)]
+    stats = {"pdfs": 0, "cached": 0, "pages": 0, "bytes": 0, "download_s": 0.0, "parse_s": 0.0}
+    pipeline = scraper.pipeline_pdf_texts(links, stats, parse_workers=1)
+    assert next(pipeline) == (links[0], links[0])
+    pipeline.close()
+    # Downloads in flight when the consumer stopped now finish
+    release.set()
+    assert wait_until_empty(spool) == []
@@ -0,0 +1,41 @@
+"""Raw collection indexes and the opt-in duplicate-link migration."""
+import collections
+
+import pytest
+
+import RedditTOCondoScraper as scraper
+import replay_store
+
+class GroupingCollection(replay_store.MemoryCollection):
+    """MemoryCollection with just the aggregate pipeline duplicate_raw_links runs."""
+
+    def aggregate(self, pipeline, **kwargs):
+        groups = collections.defaultdict(list)
+        for doc in self.find({}, {"link": 1}):
+            groups[doc["link"]].append(doc["_id"])
+        return iter([{"_id": link, "ids": ids, "count": len(ids)} for link, ids in groups.items() if len(ids) > 1])
+
+@pytest.fixture
+def raw(monkeypatch):
+    collection = GroupingCollection(scraper.RAW_COLLECTION)
+    monkeypatch.setattr(scraper, "get_collection", lambda name: collection)
+    for link, scraped_date, status in [("a", "2026-05-02", "pending"), ("a", "2026-05-03", "processed"),
+                                       ("a", "2026-05-01", "pending"), ("b", "2026-05-01", "pending")]:
+        collection.insert_one({"link": link, "scraped_date": scraped_date, "processing_status": status})
+    return collection
+
+def test_duplicates_are_logged_and_left_alone(raw, caplog):
+    scraper.ensure_raw_indexes()
+    assert raw.count_documents({}) == 4
+    indexes = raw.index_information()
+    assert "link_unique" not in indexes
+    assert "scraped_date" in indexes
+    assert "1 links appear more than once" in caplog.text
+
+def test_dedupe_links_keeps_the_processed_copy_then_builds_the_index(raw):
+    assert scraper.dedupe_raw_links(raw) == 2
+    assert sorted((doc["link"], doc["scraped_date"]) for doc in raw.find({})) == [
+        ("a", "2026-05-03"), ("b", "2026-05-01")
+    ]
+    scraper.ensure_raw_indexes()
+    assert "link_unique" in raw.index_information()
@@ -0,0 +1,72 @@
+"""Advancing and clamping the per-subreddit Reddit checkpoints."""
+from types import SimpleNamespace
+
+import pytest
+
+import RedditTOCondoScraper as scraper
+from conftest import RUN_AT
+
+NOW = RUN_AT.timestamp()
+
+def post(name, created_utc):
+    return SimpleNamespace(fullname=name, created_utc=created_utc, permalink=f"/r/condo/{name}",
+                           title=name, selftext="", score=1, num_comments=0)
+
+class FakeReddit:
+    """praw.Reddit whose /new listing is `listing`; raises after `fail_after` posts if set."""
+
+    def __init__(self, listing, fail_after=None):
+        self.listing = listing
+        self.fail_after = fail_after
+
+    def subreddit(self, name):
+        return self
+
+    def new(self, limit=None):
+        for i, item in enumerate(self.listing):
+            if i == self.fail_after:
+                raise RuntimeError("503 Service Unavailable")
+            yield item
+
+@pytest.fixture
+def reddit(monkeypatch):
+    fake = FakeReddit([])
+    monkeypatch.setattr(scraper, "get_reddit", lambda: fake)
+    return fake
+
+def scan(reddit, listing, checkpoint, ctx, **kwargs):
+    reddit.listing = listing
+    for name, value in kwargs.items():
+        setattr(reddit, name, value)
+    source = scraper.RedditSource(subreddits=["condo"])
+    links = [item["title"] for item in source.subreddit_items("condo", checkpoint, ctx)]
+    return links, source
+
+def test_checkpoint_advances_to_the_newest_post_and_the_next_scan_stops_there(reddit, ctx):
+    listing = [post("t3_c", NOW - 100), post("t3_b", NOW - 200), post("t3_a", NOW - 300)]
+    links, source = scan(reddit, listing, None, ctx)
+    assert links == ["t3_c", "t3_b", "t3_a"]
+    assert source.new_checkpoints == {"condo": {"last_created_utc": NOW - 100, "last_fullname": "t3_c"}}
+
+    source.finish(SimpleNamespace(failed=0))
+    checkpoint = scraper.load_reddit_checkpoints()["condo"]
+    links, source = scan(reddit, [post("t3_d", NOW - 50)] + listing, checkpoint, ctx)
+    assert links == ["t3_d"]
+    assert source.new_checkpoints["condo"]["last_fullname"] == "t3_d"
+
+def test_posts_created_during_the_run_are_read_but_not_checkpointed(reddit, ctx):
+    listing = [post("t3_late", NOW + 30), post("t3_c", NOW - 100)]
+    links, source = scan(reddit, listing, None, ctx)
+    assert links == ["t3_late", "t3_c"]
+    assert source.new_checkpoints["condo"]["last_fullname"] == "t3_c"
+
+def test_failed_listing_or_failed_save_keeps_the_old_checkpoint(reddit, ctx):
+    listing = [post("t3_c", NOW - 100), post("t3_b", NOW - 200)]
+    links, source = scan(reddit, listing, None, ctx, fail_after=1)
+    assert links == ["t3_c"]
+    assert source.failed_subreddits == ["condo"]
+    assert source.new_checkpoints == {}
+
+    links, source = scan(reddit, listing, None, ctx, fail_after=None)
+    source.finish(SimpleNamespace(failed=1))
+    assert scraper.load_reddit_checkpoints() == {}
@@ -0,0 +1,116 @@
+"""The in-memory MongoDB stand-in used in replay mode."""
+import os
+
+import pytest
+from pymongo import InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import RedditTOCondoScraper as scraper
+import replay_store
+
+@pytest.fixture
+def collection():
+    collection = replay_store.get_memory_collection("test")
+    collection.create_index("link", unique=True, name="link_unique")
+    for i, (status, tags) in enumerate([("pending", ["a"]), ("processed", ["a", "b"]), ("failed", [])]):
+        collection.insert_one({"_id": i, "link": f"l{i}", "status": status, "tags": tags, "n": i})
+    collection.insert_one({"_id": 3, "link": "l3", "n": 3})
+    return collection
+
+def ids(collection, query):
+    return sorted(doc["_id"] for doc in collection.find(query))
+
+QUERIES = {
+    "$in": ({"status": {"$in": ["pending", "failed"]}}, [0, 2]),
+    "$nin": ({"status": {"$nin": ["pending", "failed"]}}, [1, 3]),
+    "$ne": ({"status": {"$ne": "pending"}}, [1, 2, 3]),
+    "$exists": ({"status": {"$exists": False}}, [3]),
+    "$not": ({"n": {"$not": {"$gt": 1}}}, [0, 1]),
+    "$lt": ({"n": {"$lt": 1}}, [0]),
+    "$lte": ({"n": {"$lte": 1}}, [0, 1]),
+    "$gt": ({"n": {"$gt": 2}}, [3]),
+    "$gte": ({"n": {"$gte": 2}}, [2, 3]),
+}
+
+def test_every_supported_operator_is_covered():
+    assert sorted(QUERIES) == sorted(replay_store.MEMORY_OPERATORS)
+
+@pytest.mark.parametrize("operator", sorted(QUERIES))
+def test_query_operator(collection, operator):
+    query, expected = QUERIES[operator]
+    assert ids(collection, query) == expected
+
+def test_arrays_match_element_by_element_and_or_combines(collection):
+    assert ids(collection, {"tags": "b"}) == [1]
+    assert ids(collection, {"$or": [{"tags": "b"}, {"n": {"$gte": 3}}]}) == [1, 3]
+    assert ids(collection, {"$or": [{"status": "pending", "n": 0}, {"status": "failed"}]}) == [0, 2]
+
+@pytest.mark.parametrize("query", [
+    {"link": {"$regex": "^l"}},
+    {"tags": {"$elemMatch": {"$eq": "a"}}},
+    {"$nor": [{"n": 1}]},
+    {"n": {"$not": {"$mod": [2, 0]}}},
+])
+def test_unsupported_query_operators_raise(collection, query):
+    with pytest.raises(ValueError):
+        list(collection.find(query))
+
+def test_unsupported_update_operators_raise(collection):
+    with pytest.raises(ValueError):
+        collection.update_one({"_id": 0}, {"$push": {"tags": "c"}})
+    assert collection.find_one({"_id": 0})["tags"] == ["a"]
+
+def test_bulk_write_applies_pymongo_operations(collection):
+    result = collection.bulk_write([
+        InsertOne({"_id": 10, "link": "l10"}),
+        UpdateOne({"link": "l0"}, {"$set": {"status": "processed"}, "$inc": {"n": 5}}),
+        UpdateOne({"link": "l11"}, {"$set": {"status": "pending"}, "$setOnInsert": {"n": 11}}, upsert=True),
+        UpdateMany({"status": "processed"}, {"$unset": {"tags": ""}}),
+    ])
+    assert (result.inserted_count, result.matched_count, result.modified_count, result.upserted_count) == (1, 3, 3, 1)
+    assert collection.find_one({"link": "l0"}, {"_id": 0}) == {"link": "l0", "status": "processed", "n": 5}
+    assert collection.find_one({"link": "l11"}, {"_id": 0, "status": 1, "n": 1}) == {"status": "pending", "n": 11}
+
+def test_bulk_write_reports_duplicate_keys_like_mongodb(collection):
+    operations = [InsertOne({"link": "l0"}), UpdateOne({"link": "l12"}, {"$set": {"n": 12}}, upsert=True)]
+    with pytest.raises(BulkWriteError) as error:
+        collection.bulk_write(operations, ordered=False)
+    details = error.value.details
+    assert [(e["index"], e["code"]) for e in details["writeErrors"]] == [(0, 11000)]
+    assert (details["nInserted"], details["nUpserted"]) == (0, 1)
+
+    with pytest.raises(BulkWriteError) as error:
+        collection.bulk_write([InsertOne({"link": "l1"}), InsertOne({"link": "l13"})], ordered=True)
+    assert error.value.details["nInserted"] == 0
+    assert collection.find_one({"link": "l13"}) is None
+
+@pytest.mark.parametrize("operation", [
+    UpdateOne({"link": "l0"}, {"$set": {"tags.$[t]": "c"}}, array_filters=[{"t": "a"}]),
+    UpdateOne({"link": "l0"}, {"$set": {"n": 1}}, hint="link_unique"),
+    ReplaceOne({"link": "l0"}, {"link": "l0"}),
+])
+def test_unsupported_write_options_raise(collection, operation):
+    with pytest.raises(ValueError):
+        collection.bulk_write([operation])
+
+def test_scraper_writes_go_through_plain_pymongo_operations():
+    assert scraper.UpdateOne is UpdateOne
+
+def test_shared_store_serves_one_collection_to_every_client(monkeypatch):
+    monkeypatch.delenv("REPLAY_STORE_ADDRESS", raising=False)
+    monkeypatch.delenv("REPLAY_STORE_AUTHKEY", raising=False)
+    manager = replay_store.start_shared_memory_store()
+    try:
+        address = os.environ["REPLAY_STORE_ADDRESS"]
+        shared = replay_store.get_shared_memory_collection("shared", address)
+        shared.create_index("link", unique=True, name="link_unique")
+        shared.bulk_write([UpdateOne({"link": "a"}, {"$set": {"n": 1}}, upsert=True)])
+        with pytest.raises(BulkWriteError):
+            shared.bulk_write([InsertOne({"link": "a"})])
+        assert [doc["n"] for doc in shared.find({"link": "a"})] == [1]
+        # The store lives in its own process, not in this one
+        assert "shared" not in replay_store.MEMORY_COLLECTIONS
+    finally:
+        manager.shutdown()
+        del replay_store.get_shared_memory_collection.manager
+        del replay_store.get_shared_memory_collection.proxies
@@ -0,0 +1,67 @@
+"""Counting stored and failed articles in save_scraped_data."""
+import threading
+
+import pytest
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+import RedditTOCondoScraper as scraper
+
+def articles(prefix, count):
+    return [{"link": f"{prefix}{i}", "title": "t", "content": "c"} for i in range(count)]
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(scraper, "SCRAPED_COUNT", {"reddit": 0, "tocondo": 0})
+    monkeypatch.setattr(scraper, "WRITE_STATS", {
+        "reddit": {"inserted": 0, "updated": 0, "unchanged": 0},
+        "tocondo": {"inserted": 0, "updated": 0, "unchanged": 0}
+    })
+
+def test_new_updated_and_unchanged_articles_are_counted(raw, ctx):
+    assert scraper.save_scraped_data("reddit", articles("a", 3), ctx=ctx) == 3
+    changed = articles("a", 3)
+    changed[0]["content"] = "changed"
+    assert scraper.save_scraped_data("reddit", changed + articles("b", 1), ctx=ctx) == 4
+    assert scraper.SCRAPED_COUNT["reddit"] == 4
+    assert scraper.WRITE_STATS["reddit"] == {"inserted": 4, "updated": 1, "unchanged": 2}
+
+def test_failed_batches_are_counted_and_the_rest_still_written(raw, ctx, monkeypatch):
+    bulk_write = raw.bulk_write
+    calls = []
+
+    def flaky_bulk_write(requests, ordered=True):
+        calls.append(len(requests))
+        if len(calls) == 2:
+            # First article upserted, second rejected
+            bulk_write(requests[:1], ordered)
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key"}],
+                                  "writeConcernErrors": [], "nUpserted": 1, "nMatched": 0, "nModified": 0})
+        if len(calls) == 3:
+            bulk_write(requests, ordered)
+            raise BulkWriteError({"writeErrors": [],
+                                  "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}],
+                                  "nUpserted": 2, "nMatched": 0, "nModified": 0})
+        if len(calls) == 4:
+            raise ServerSelectionTimeoutError("no primary")
+        return bulk_write(requests, ordered)
+
+    monkeypatch.setattr(raw, "bulk_write", flaky_bulk_write)
+    monkeypatch.setattr(scraper, "get_collection", lambda name: raw)
+    with pytest.raises(scraper.ArticleSaveError) as error:
+        scraper.save_scraped_data("tocondo", articles("p", 10), batch_size=2, ctx=ctx)
+    assert calls == [2, 2, 2, 2, 2]
+    # Batches 1 and 5 saved, one article of batch 2; batch 3 unconfirmed, batch 4 failed
+    assert (error.value.stored, error.value.failed) == (5, 5)
+    assert scraper.SCRAPED_COUNT["tocondo"] == 5
+    assert scraper.WRITE_STATS["tocondo"]["inserted"] == 5
+
+def test_concurrent_writers_count_every_article(raw, ctx):
+    threads = [threading.Thread(target=scraper.save_scraped_data, args=("reddit", articles(f"t{n}-", 50)),
+                                kwargs={"batch_size": 5, "ctx": ctx})
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scraper.SCRAPED_COUNT["reddit"] == 400
+    assert scraper.WRITE_STATS["reddit"]["inserted"] == 400
@@ -0,0 +1,117 @@
+"""Work queue leases and the Reddit request budget shared by queue workers."""
+import pytest
+
+import RedditTOCondoScraper as scraper
+
+class FakeClock:
+    """time.time and time.sleep for one process, starting at a minute boundary."""
+
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scraper.time, "time", clock.time)
+    monkeypatch.setattr(scraper.time, "sleep", clock.sleep)
+    return clock
+
+def test_shared_budget_is_shared_between_workers(clock):
+    # Two workers (two budget objects) share the one per-minute allowance
+    workers = [scraper.SharedRequestBudget("reddit", 10), scraper.SharedRequestBudget("reddit", 10)]
+    for i in range(10):
+        workers[i % 2].acquire()
+    assert clock.slept == []
+    workers[0].acquire()
+    assert len(clock.slept) == 1
+    assert int(clock.now // 60) == int(1_800_000_000 // 60) + 1
+
+def test_shared_budget_counters_expire(clock):
+    scraper.ensure_work_queue_indexes()
+    scraper.SharedRequestBudget("reddit", 10).acquire()
+    counter = scraper.get_collection(scraper.SCRAPE_STATE_COLLECTION).find_one()
+    assert counter["_id"].startswith("budget:reddit:")
+    assert counter["expires_at"].timestamp() > clock.now
+
+def test_shared_budget_falls_back_to_a_share_of_the_rate(clock, monkeypatch):
+    def unavailable(name):
+        raise scraper.pymongo.errors.ServerSelectionTimeoutError("no MongoDB")
+    monkeypatch.setattr(scraper, "get_collection", unavailable)
+    budget = scraper.SharedRequestBudget("reddit", 90, fallback_share=3)
+    assert budget.fallback.interval == pytest.approx(60 / 30)
+    budget.acquire()
+
+@pytest.fixture
+def handler(monkeypatch):
+    """A "test" work kind whose units fail while their payload says so; returns the payloads run."""
+    ran = []
+
+    def run(payload, dedup, ctx):
+        ran.append(payload["n"])
+        if payload.get("fail"):
+            raise RuntimeError("source unavailable")
+        return payload["n"]
+
+    monkeypatch.setitem(scraper.WORK_HANDLERS, "test", run)
+    monkeypatch.setattr(scraper, "REDDIT_BUDGET", scraper.REDDIT_BUDGET)
+    return ran
+
+def queue():
+    return scraper.get_collection(scraper.WORK_QUEUE_COLLECTION)
+
+def make_due(unit_id, **fields):
+    """Move a unit's retry delay or lease into the past."""
+    queue().update_one({"_id": unit_id}, {"$set": {"available_at": "2000-01-01T00:00:00", **fields}})
+
+def test_enqueue_is_idempotent_and_workers_drain_the_queue(handler):
+    units = [("test", str(n), {"n": n}) for n in range(3)]
+    assert scraper.enqueue_work(units, "b1") == 3
+    assert scraper.enqueue_work(units, "b1") == 0
+    assert scraper.run_queue_worker(owner="w1") == 3
+    assert sorted(handler) == [0, 1, 2]
+    assert {(doc["status"], doc["attempts"]) for doc in queue().find({})} == {("done", 1)}
+
+def test_failed_unit_is_retried_after_a_delay_then_failed_at_the_cap(handler, monkeypatch):
+    monkeypatch.setattr(scraper, "WORK_MAX_ATTEMPTS", 2)
+    scraper.enqueue_work([("test", "0", {"n": 0, "fail": True})], "b1")
+    unit_id = "b1:test:0"
+
+    assert scraper.run_work_unit(scraper.claim_work("w1")) == "queued"
+    unit = queue().find_one({"_id": unit_id})
+    assert unit["attempts"] == 1 and unit["available_at"] > unit["finished_at"]
+    assert scraper.claim_work("w1") is None
+
+    make_due(unit_id)
+    assert scraper.run_work_unit(scraper.claim_work("w1")) == "failed"
+    assert queue().find_one({"_id": unit_id})["status"] == "failed"
+    make_due(unit_id, status="queued")
+    assert scraper.claim_work("w1") is None
+    assert handler == [0, 0]
+
+def test_expired_lease_is_taken_over_and_the_old_owner_loses_it(handler):
+    scraper.enqueue_work([("test", "0", {"n": 0})], "b1")
+    first = scraper.claim_work("w1")
+    assert scraper.claim_work("w2") is None
+
+    queue().update_one({"_id": first["_id"]}, {"$set": {"lease_expires": "2000-01-01T00:00:00"}})
+    second = scraper.claim_work("w2")
+    assert (second["owner"], second["attempts"]) == ("w2", 2)
+    assert not scraper.update_leased_work(first, {"$set": {"status": "done"}})
+    assert scraper.run_work_unit(second) == "done"
+
+def test_lease_expired_on_the_last_attempt_is_marked_failed(handler, monkeypatch):
+    monkeypatch.setattr(scraper, "WORK_MAX_ATTEMPTS", 1)
+    scraper.enqueue_work([("test", "0", {"n": 0})], "b1")
+    unit = scraper.claim_work("w1")
+    queue().update_one({"_id": unit["_id"]}, {"$set": {"lease_expires": "2000-01-01T00:00:00"}})
+    assert scraper.claim_work("w2") is None
+    assert scraper.fail_abandoned_work() == 1
+    assert queue().find_one({"_id": unit["_id"]})["status"] == "failed"